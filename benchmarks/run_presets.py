@@ -0,0 +1,315 @@
+"""Benchmark LTXVideoGenerator across PRESETS and custom shape grids
+
+By default every preset runs through the deterministic CPU stand-in pipeline
+(src/models/fake.py), which measures the wrapper's own overhead: frame
+packing, encode, lazy decode and queueing. Use --backend real on a GPU pod to
+benchmark the actual model.
+
+Examples:
+  # All presets on the fake pipeline
+  python -m benchmarks.run_presets
+
+  # Custom grid: resolutions x frames x steps
+  python -m benchmarks.run_presets --grid 512x512,704x480 --frames 25,65 --steps 4,8
+
+  # Store the results as the baseline, then compare later runs against it
+  python -m benchmarks.run_presets --save-baseline
+  python -m benchmarks.run_presets --fail-on-regression
+
+  # Real model, one preset
+  python -m benchmarks.run_presets --backend real --presets fast-test
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+
+from src.api.worker import GenerationWorker
+from src.models.ltx import DEFAULT_MODEL, PRESETS, LTXVideoGenerator
+from src.models.timing import StageTimer, peak_memory, reset_peak_memory
+
+BENCH_DIR = Path(__file__).parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+DEFAULT_RESULTS_DIR = BENCH_DIR / "results"
+
+
+class RssSampler:
+    """Samples this process's resident set size on a background thread
+
+    ru_maxrss only ever grows, so it can't attribute a peak to a single case.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._page_size = os.sysconf("SC_PAGE_SIZE")
+
+    def _rss(self) -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self._page_size
+        except OSError:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = self._rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+
+def preset_cases(names: list, backend: str) -> list:
+    cases = []
+    for name in names:
+        preset = PRESETS[name]
+        cases.append({
+            "case": name,
+            "width": preset["width"],
+            "height": preset["height"],
+            "num_frames": preset["num_frames"],
+            "num_inference_steps": preset["num_inference_steps"],
+            "guidance_scale": preset["guidance_scale"],
+            "model": "fake" if backend == "fake" else preset.get("model", DEFAULT_MODEL),
+            "enhance_prompt": backend == "real" and preset.get("enhance_prompt", False),
+            "use_film_template": preset.get("use_film_template", False),
+            "segment_frames": preset.get("segment_frames"),
+            "overlap_frames": preset.get("overlap_frames", 17),
+        })
+    return cases
+
+
+def grid_cases(resolutions: list, frames: list, steps: list, backend: str, model: str) -> list:
+    cases = []
+    for resolution, num_frames, num_steps in itertools.product(resolutions, frames, steps):
+        width, height = (int(v) for v in resolution.lower().split("x"))
+        cases.append({
+            "case": f"{width}x{height}x{num_frames}@{num_steps}",
+            "width": width,
+            "height": height,
+            "num_frames": num_frames,
+            "num_inference_steps": num_steps,
+            "guidance_scale": 7.5,
+            "model": "fake" if backend == "fake" else model,
+            "enhance_prompt": False,
+            "use_film_template": False,
+        })
+    return cases
+
+
+def run_case(generator: LTXVideoGenerator, case: dict, output_dir: Path, decode: bool) -> dict:
+    """Render one case and return its wall time, stage breakdown and peak memory"""
+    trace = StageTimer()
+    output_path = output_dir / f"{case['case']}.mp4"
+    reset_peak_memory()
+
+    render = generator.generate
+    if case.get("segment_frames") and case["num_frames"] > case["segment_frames"]:
+        render = partial(
+            generator.generate_long,
+            segment_frames=case["segment_frames"],
+            overlap_frames=case["overlap_frames"],
+        )
+
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        video = render(
+            prompt="A colorful letter A bouncing happily",
+            width=case["width"],
+            height=case["height"],
+            num_frames=case["num_frames"],
+            num_inference_steps=case["num_inference_steps"],
+            guidance_scale=case["guidance_scale"],
+            seed=42,
+            enhance_prompt=case["enhance_prompt"],
+            use_film_template=case["use_film_template"],
+            output_path=str(output_path),
+            model=case["model"],
+            trace=trace,
+        )
+        del video
+        if decode:
+            from src.models.video import GeneratedVideo
+
+            with trace.stage("decode"):
+                for _ in GeneratedVideo(str(output_path)).iter_frames():
+                    pass
+        wall = time.perf_counter() - start
+
+    result = {
+        "wall_s": round(wall, 4),
+        "s_per_frame": round(wall / case["num_frames"], 5),
+        "stages": trace.to_dict(),
+        "peak_rss_bytes": rss.peak,
+        "output_bytes": output_path.stat().st_size,
+    }
+    vram = peak_memory().get("peak_vram_bytes")
+    if vram is not None:
+        result["peak_vram_bytes"] = vram
+    output_path.unlink(missing_ok=True)
+    return result
+
+
+def measure_queue_overhead(samples: int = 50) -> dict:
+    """Submit-to-start latency of GenerationWorker with an empty handler"""
+    latencies = []
+    started = threading.Event()
+
+    def handler(batch):
+        latencies.append(time.perf_counter() - batch[0][1])
+        started.set()
+
+    worker = GenerationWorker(handler, max_queue_size=samples).start()
+    for i in range(samples):
+        started.clear()
+        worker.submit(str(i), time.perf_counter())
+        started.wait(5)
+    worker.stop(timeout=5)
+    return {
+        "median_ms": round(statistics.median(latencies) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+    }
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """Wall-time ratio against the baseline for every case present in both"""
+    base = {r["case"]: r for r in baseline.get("results", [])}
+    rows = []
+    for r in results:
+        if r["case"] not in base:
+            continue
+        ratio = r["wall_s"] / max(base[r["case"]]["wall_s"], 1e-9)
+        status = "ok"
+        if ratio > 1 + tolerance:
+            status = "regression"
+        elif ratio < 1 - tolerance:
+            status = "improved"
+        rows.append({
+            "case": r["case"],
+            "baseline_wall_s": base[r["case"]]["wall_s"],
+            "wall_s": r["wall_s"],
+            "ratio": round(ratio, 3),
+            "status": status,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark PRESETS and shape grids through LTXVideoGenerator",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Examples:")[1],
+    )
+    parser.add_argument("--backend", choices=["fake", "real"], default="fake")
+    parser.add_argument("--presets", nargs="*", choices=list(PRESETS.keys()),
+                        help="Presets to run (default: all, unless --grid is given)")
+    parser.add_argument("--grid", help="Comma-separated resolutions, e.g. 512x512,704x480")
+    parser.add_argument("--frames", default="25,65", help="Frame counts for --grid")
+    parser.add_argument("--steps", default="8", help="Step counts for --grid")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Model for --grid on real backend")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case (median is kept)")
+    parser.add_argument("--step-seconds", type=float, default=0.0,
+                        help="Fake backend: simulated seconds per denoising step")
+    parser.add_argument("--decode", action="store_true", help="Also time decoding the output")
+    parser.add_argument("--output", help="Results JSON path (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON to compare")
+    parser.add_argument("--save-baseline", action="store_true", help="Write results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed wall-time drift")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="Exit non-zero if any case regressed beyond the tolerance")
+    args = parser.parse_args()
+
+    cases = []
+    if args.grid:
+        cases += grid_cases(
+            args.grid.split(","),
+            [int(f) for f in args.frames.split(",")],
+            [int(s) for s in args.steps.split(",")],
+            args.backend,
+            args.model,
+        )
+    if args.presets or not args.grid:
+        cases += preset_cases(args.presets or list(PRESETS.keys()), args.backend)
+
+    if args.backend == "fake":
+        generator = LTXVideoGenerator(model="fake", device="cpu", use_prompt_enhancement=False)
+        generator.load()
+        generator.pipeline.step_seconds = args.step_seconds
+    else:
+        generator = LTXVideoGenerator(
+            use_prompt_enhancement=any(c["enhance_prompt"] for c in cases)
+        )
+        generator.load()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for case in cases:
+            print(f"Benchmarking {case['case']} ({args.repeat}x)...")
+            runs = [run_case(generator, case, Path(tmp), args.decode) for _ in range(args.repeat)]
+            best = sorted(runs, key=lambda r: r["wall_s"])[len(runs) // 2]
+            results.append({**case, **best, "runs": [r["wall_s"] for r in runs]})
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "backend": args.backend,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "queue_overhead": measure_queue_overhead(),
+        },
+        "results": results,
+    }
+
+    baseline_path = Path(args.baseline)
+    comparison = []
+    if baseline_path.exists() and not args.save_baseline:
+        comparison = compare(results, json.loads(baseline_path.read_text()), args.tolerance)
+        report["comparison"] = comparison
+
+    output = Path(args.output) if args.output else (
+        DEFAULT_RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2))
+        print(f"Baseline saved to {baseline_path}")
+
+    print(f"\n{'case':<28} {'wall s':>9} {'s/frame':>9} {'peak RSS MB':>12}")
+    for r in results:
+        print(f"{r['case']:<28} {r['wall_s']:>9.3f} {r['s_per_frame']:>9.4f} "
+              f"{r['peak_rss_bytes'] / 1024**2:>12.0f}")
+    if comparison:
+        print(f"\n{'case':<28} {'baseline':>9} {'now':>9} {'ratio':>7}  status")
+        for row in comparison:
+            print(f"{row['case']:<28} {row['baseline_wall_s']:>9.3f} {row['wall_s']:>9.3f} "
+                  f"{row['ratio']:>7.3f}  {row['status']}")
+    print(f"\nResults written to {output}")
+
+    if args.fail_on_regression and any(row["status"] == "regression" for row in comparison):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
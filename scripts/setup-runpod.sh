@@ -19,17 +19,17 @@ echo ""
 
 # Install uv if not present
 if ! command -v uv &> /dev/null; then
-    echo "[1/5] Installing uv package manager..."
+    echo "[1/6] Installing uv package manager..."
     curl -LsSf https://astral.sh/uv/install.sh | sh
     export PATH="$HOME/.local/bin:$PATH"
 else
-    echo "[1/5] uv already installed"
+    echo "[1/6] uv already installed"
 fi
 
 cd "$REPO_DIR"
 
 # Create venv and install deps (LTX-2 requires Python 3.12+)
-echo "[2/5] Setting up Python 3.12 environment..."
+echo "[2/6] Setting up Python 3.12 environment..."
 uv venv --python 3.12
 source .venv/bin/activate
 uv pip install huggingface-hub transformers accelerate bitsandbytes
@@ -39,12 +39,12 @@ mkdir -p "$MODEL_DIR"
 
 # Clone LTX-2 repo and install its packages
 if [ ! -d "$MODEL_DIR/LTX-2" ]; then
-    echo "[3/5] Cloning LTX-2 repository..."
+    echo "[3/6] Cloning LTX-2 repository..."
     git clone https://github.com/Lightricks/LTX-2.git "$MODEL_DIR/LTX-2"
 fi
 
 # Install LTX-2 packages (ltx-core and ltx-pipelines)
-echo "[3/5] Installing LTX-2 packages..."
+echo "[3/6] Installing LTX-2 packages..."
 cd "$MODEL_DIR/LTX-2"
 uv sync
 cd "$REPO_DIR"
@@ -53,7 +53,7 @@ uv pip install -e "$MODEL_DIR/LTX-2/packages/ltx-core"
 uv pip install -e "$MODEL_DIR/LTX-2/packages/ltx-pipelines"
 
 # Download full model from HuggingFace
-echo "[4/5] Downloading LTX-2 full model (43GB)..."
+echo "[4/6] Downloading LTX-2 full model (43GB)..."
 python -c "
 from huggingface_hub import hf_hub_download
 import os
@@ -72,7 +72,7 @@ print('Full model downloaded!')
 "
 
 # Download Gemma for prompt enhancement
-echo "[5/5] Downloading Gemma for prompt enhancement (7.4GB)..."
+echo "[5/6] Downloading Gemma for prompt enhancement (7.4GB)..."
 python -c "
 from huggingface_hub import snapshot_download
 import os
@@ -88,6 +88,15 @@ snapshot_download(
 print('Gemma downloaded!')
 "
 
+# Copy weights off the network volume; model loads then memory-map local disk.
+# Set MAGIMA_STAGING_DIR to choose the directory, or to "off" to skip this.
+if [ "${MAGIMA_STAGING_DIR:-}" != "off" ]; then
+    echo "[6/6] Staging weights to local disk..."
+    python -m src.models.staging
+else
+    echo "[6/6] Weight staging disabled"
+fi
+
 echo ""
 echo "=== Setup complete! ==="
 echo ""
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Incremental download of finished videos from the API server
+
+Fetches /outputs/manifest and downloads only files that are missing locally
+or whose SHA-256 differs, several at a time. Interrupted downloads resume
+from their .part file with a Range request, and every file is checked
+against the manifest hash before it is moved into place.
+
+Usage:
+    python scripts/sync_outputs.py http://<RUNPOD_IP>:8000 ~/Code/MAGIMA-CLOUD-AI/outputs
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+CHUNK_SIZE = 1024 * 1024
+
+# Local hashes by (size, mtime), so unchanged files are not re-read on every sync
+STATE_FILE = ".sync-state.json"
+
+
+def fetch_manifest(server: str) -> list:
+    with urllib.request.urlopen(f"{server}/outputs/manifest", timeout=60) as response:
+        return json.load(response)["files"]
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def local_hash(path: Path, state: dict, name: str):
+    """SHA-256 of a local file, from the state file when it hasn't changed"""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    known = state.get(name)
+    if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+        return known["sha256"]
+    digest = sha256_file(path)
+    state[name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+    return digest
+
+
+def download(server: str, entry: dict, dest: Path) -> int:
+    """Fetch one file, resuming a partial download; returns bytes transferred"""
+    target = dest / entry["name"]
+    part = target.with_name(target.name + ".part")
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    offset = part.stat().st_size if part.exists() else 0
+    if offset > entry["size"]:
+        part.unlink()
+        offset = 0
+    request = urllib.request.Request(f"{server}{entry['url']}")
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+
+    transferred = 0
+    with urllib.request.urlopen(request, timeout=60) as response:
+        # A server that ignores Range sends the whole file with 200
+        mode = "ab" if offset and response.status == 206 else "wb"
+        with open(part, mode) as f:
+            for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                f.write(chunk)
+                transferred += len(chunk)
+
+    if sha256_file(part) != entry["sha256"]:
+        part.unlink()
+        raise IOError(f"{entry['name']}: checksum mismatch, discarded")
+    os.replace(part, target)
+    return transferred
+
+
+def sync(server: str, dest: str, jobs: int = 4, dry_run: bool = False) -> dict:
+    server = server.rstrip("/")
+    dest = Path(dest).expanduser()
+    dest.mkdir(parents=True, exist_ok=True)
+    state_path = dest / STATE_FILE
+    state = json.loads(state_path.read_text()) if state_path.exists() else {}
+
+    manifest = fetch_manifest(server)
+    wanted = [
+        entry for entry in manifest
+        if local_hash(dest / entry["name"], state, entry["name"]) != entry["sha256"]
+    ]
+    total = sum(entry["size"] for entry in wanted)
+    print(f"{len(manifest)} files on server, {len(wanted)} new or changed ({total / 1024**2:.1f} MB)")
+    if dry_run or not wanted:
+        for entry in wanted:
+            print(f"  {entry['name']}")
+        state_path.write_text(json.dumps(state, indent=2))
+        return {"files": len(manifest), "fetched": 0, "failed": 0, "bytes": 0}
+
+    started = time.perf_counter()
+    transferred, failed = 0, 0
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(download, server, entry, dest): entry for entry in wanted}
+        for future, entry in futures.items():
+            try:
+                transferred += future.result()
+                local_hash(dest / entry["name"], state, entry["name"])
+                print(f"  {entry['name']} ({entry['size'] / 1024**2:.1f} MB)")
+            except Exception as e:
+                failed += 1
+                print(f"  {entry['name']} failed: {e}")
+
+    state_path.write_text(json.dumps(state, indent=2))
+    elapsed = time.perf_counter() - started
+    rate = transferred / 1024**2 / elapsed if elapsed > 0 else 0.0
+    print(f"Fetched {len(wanted) - failed} files, {transferred / 1024**2:.1f} MB in {elapsed:.1f}s ({rate:.1f} MB/s)")
+    return {"files": len(manifest), "fetched": len(wanted) - failed, "failed": failed, "bytes": transferred}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download new or changed videos from the API server")
+    parser.add_argument("server", help="API base URL, e.g. http://203.57.40.79:8000")
+    parser.add_argument("dest", help="Local directory to sync into")
+    parser.add_argument("--jobs", type=int, default=4, help="Parallel downloads (default 4)")
+    parser.add_argument("--dry-run", action="store_true", help="Only list what would be fetched")
+    args = parser.parse_args()
+
+    result = sync(args.server, args.dest, jobs=args.jobs, dry_run=args.dry_run)
+    sys.exit(1 if result["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
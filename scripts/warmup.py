@@ -4,7 +4,12 @@ Warmup script for LTX-2 Video Generator
 
 First inference is always slow due to model loading and CUDA compilation.
 Run this script after starting a pod to warm up the GPU before generating real content.
+
+Prints a JSON startup profile at the end (per-component import, weight read,
+device transfer and first-call timings); pass --json PATH to also save it.
 """
+import argparse
+import json
 import sys
 import time
 from pathlib import Path
@@ -14,7 +19,7 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 
-def warmup():
+def warmup(json_path: str = None, enhance: bool = False):
     """Run minimal generation to warm up GPU and model"""
     print("=" * 50)
     print("LTX-2 Model Warmup")
@@ -28,9 +33,11 @@ def warmup():
 
     from src.models.ltx import LTXVideoGenerator
 
-    # Initialize without prompt enhancement for faster warmup
+    import_time = time.time() - start_time
+
+    # Initialize without prompt enhancement for faster warmup, unless asked
     print("Loading model (this may take a minute)...")
-    generator = LTXVideoGenerator(use_prompt_enhancement=False)
+    generator = LTXVideoGenerator(use_prompt_enhancement=enhance)
     generator.load()
 
     load_time = time.time() - start_time
@@ -41,14 +48,15 @@ def warmup():
     print("Running warmup generation (256x256, 9 frames)...")
     gen_start = time.time()
 
-    frames = generator.generate(
-        prompt="test warmup",
-        width=256,
-        height=256,
-        num_frames=9,
-        num_inference_steps=4,
-        enhance_prompt=False,
-    )
+    with generator.startup_profile.stage("warmup.first_call"):
+        generator.generate(
+            prompt="test warmup",
+            width=256,
+            height=256,
+            num_frames=9,
+            num_inference_steps=4,
+            enhance_prompt=False,
+        )
 
     gen_time = time.time() - gen_start
     total_time = time.time() - start_time
@@ -67,6 +75,26 @@ def warmup():
     print("  python -m src.pipelines.generate -p 'A colorful letter bouncing'")
     print("")
 
+    profile = {
+        "wrapper_import_s": round(import_time, 4),
+        "load_s": round(load_time, 4),
+        "first_call_s": round(gen_time, 4),
+        "time_to_first_video_s": round(total_time, 4),
+        "stages": generator.startup_profile.to_dict(),
+        "models": generator.registry.stats(),
+    }
+    print(json.dumps(profile, indent=2))
+    if json_path:
+        Path(json_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(json_path).write_text(json.dumps(profile, indent=2))
+        print(f"Startup profile saved to {json_path}")
+    return profile
+
 
 if __name__ == "__main__":
-    warmup()
+    parser = argparse.ArgumentParser(description="Warm up the GPU and profile cold start")
+    parser.add_argument("--json", help="Also write the startup profile to this file")
+    parser.add_argument("--enhance", action="store_true",
+                        help="Load Gemma too, so the profile covers the full cold start")
+    args = parser.parse_args()
+    warmup(json_path=args.json, enhance=args.enhance)
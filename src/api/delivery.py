@@ -0,0 +1,213 @@
+"""Serving finished videos: byte-range file responses and a hashed output manifest"""
+import asyncio
+import hashlib
+import os
+import threading
+from email.utils import formatdate
+from pathlib import Path
+from typing import Optional
+
+from starlette.responses import Response
+
+# Read size of the fallback copy path, and of hashing
+CHUNK_SIZE = 1024 * 1024
+
+# Files listed in the manifest; anything else under outputs (databases, caches) is internal
+MANIFEST_SUFFIXES = (".mp4",)
+
+# Top-level directories under outputs that hold server-internal copies of videos:
+# the render cache, rendition ladders and preemption checkpoints
+MANIFEST_EXCLUDE = ("cache", "renditions", "checkpoints")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[tuple]:
+    """(start, end) of a single `bytes=` range, end inclusive
+
+    Returns None when the whole file should be sent: no header, a unit other
+    than bytes, or several ranges (allowed by RFC 9110, and clients that
+    resume or seek only ever ask for one). Raises ValueError when the range
+    can't be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start, end = max(size - int(last), 0), size - 1
+    except ValueError:
+        return None
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        raise ValueError(f"Range {header} not satisfiable for {size} bytes")
+    return start, end
+
+
+def file_etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+class RangeFileResponse(Response):
+    """A file response that honours Range requests and avoids copying when it can
+
+    Sends 206 with Content-Range for a satisfiable single range, 416 for an
+    unsatisfiable one, and the whole file otherwise (also when If-Range no
+    longer matches). When the ASGI server offers the `zerocopysend` extension
+    the kernel copies the file straight to the socket with sendfile(2);
+    otherwise the file is streamed with pread in CHUNK_SIZE pieces off the
+    event loop.
+    """
+
+    def __init__(self, path: str, headers, media_type: str = "video/mp4", filename: str = None):
+        self.path = Path(path)
+        stat = self.path.stat()
+        self.size = stat.st_size
+        etag = file_etag(stat)
+        response_headers = {
+            "accept-ranges": "bytes",
+            "etag": etag,
+            "last-modified": formatdate(stat.st_mtime, usegmt=True),
+        }
+        if filename:
+            response_headers["content-disposition"] = f'inline; filename="{filename}"'
+
+        self.start, self.end = 0, self.size - 1
+        status_code = 200
+        if_range = headers.get("if-range")
+        if if_range is None or if_range == etag:
+            try:
+                byte_range = parse_range(headers.get("range"), self.size)
+            except ValueError:
+                byte_range = None
+                status_code = 416
+                response_headers["content-range"] = f"bytes */{self.size}"
+            if byte_range is not None:
+                self.start, self.end = byte_range
+                status_code = 206
+                response_headers["content-range"] = f"bytes {self.start}-{self.end}/{self.size}"
+
+        super().__init__(status_code=status_code, headers=response_headers, media_type=media_type)
+        self.headers["content-length"] = str(self.length)
+
+    @property
+    def length(self) -> int:
+        return 0 if self.status_code == 416 else self.end - self.start + 1
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope.get("method") == "HEAD" or not self.length:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        with open(self.path, "rb") as f:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": self.start,
+                    "count": self.length,
+                })
+                return
+
+            fd = f.fileno()
+            offset, remaining = self.start, self.length
+            while remaining:
+                chunk = await asyncio.to_thread(os.pread, fd, min(CHUNK_SIZE, remaining), offset)
+                if not chunk:
+                    break  # Truncated underneath us; the client sees a short body
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining:
+                await send({"type": "http.response.body", "body": b""})
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class OutputIndex:
+    """Sizes and SHA-256 hashes of the finished videos under an output directory
+
+    Hashes are kept per (size, mtime), so each version of a file is read
+    once, whether by `add` when a job finishes or by the first manifest
+    request that sees it.
+    """
+
+    def __init__(self, root: str = "outputs", exclude: tuple = MANIFEST_EXCLUDE, suffixes: tuple = MANIFEST_SUFFIXES):
+        self.root = Path(root)
+        self.exclude = exclude
+        self.suffixes = suffixes
+        self._hashes = {}  # name -> (size, mtime_ns, sha256)
+        self._lock = threading.Lock()
+
+    def add(self, path: str) -> Optional[dict]:
+        """Manifest entry of one file, hashing it if it is new or changed"""
+        path = Path(path)
+        try:
+            stat = path.stat()
+            name = path.resolve().relative_to(self.root.resolve()).as_posix()
+        except (FileNotFoundError, ValueError):
+            return None
+
+        with self._lock:
+            known = self._hashes.get(name)
+        if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+            digest = known[2]
+        else:
+            digest = sha256_file(path)
+            with self._lock:
+                self._hashes[name] = (stat.st_size, stat.st_mtime_ns, digest)
+        return {"name": name, "size": stat.st_size, "mtime": stat.st_mtime, "sha256": digest}
+
+    def manifest(self, skip: set = frozenset()) -> list:
+        """Entries for every finished video, by name; `skip` names files still being written
+
+        Hidden files and directories are renders in progress and never listed.
+        """
+        entries = []
+        # os.walk, unlike rglob, shrugs off directories removed while it runs
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            directory = Path(dirpath)
+            top = directory == self.root
+            dirnames[:] = sorted(
+                d for d in dirnames if not d.startswith(".") and not (top and d in self.exclude)
+            )
+            for filename in sorted(filenames):
+                path = directory / filename
+                name = path.relative_to(self.root).as_posix()
+                if filename.startswith(".") or path.suffix not in self.suffixes or name in skip:
+                    continue
+                try:
+                    entry = self.add(path)
+                except FileNotFoundError:
+                    # Renamed or deleted while it was hashed
+                    continue
+                if entry is not None:
+                    entries.append(entry)
+        entries.sort(key=lambda entry: entry["name"])
+
+        names = {entry["name"] for entry in entries}
+        with self._lock:
+            for name in list(self._hashes):
+                if name not in names:
+                    del self._hashes[name]
+        return entries
+
+    def resolve(self, name: str) -> Optional[Path]:
+        """Path of a manifest entry, refusing anything outside the output directory"""
+        path = (self.root / name).resolve()
+        root = self.root.resolve()
+        if root not in path.parents:
+            return None
+        parts = path.relative_to(root).parts
+        if parts[0] in self.exclude or any(part.startswith(".") for part in parts):
+            return None
+        return path if path.is_file() and path.suffix in self.suffixes else None
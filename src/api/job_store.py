@@ -0,0 +1,278 @@
+"""Job record storage for the API server"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_JOB_DB_PATH = Path("outputs") / "jobs.sqlite"
+
+# Statuses a job can be left in when the server dies mid-render
+ACTIVE_STATUSES = ("queued", "processing")
+
+# Fields stored in their own columns; everything else goes in the JSON `data` blob
+CORE_FIELDS = ("status", "video_path", "error", "created_at", "updated_at")
+
+# A process holds a lease on the active jobs it queued; leases it stops renewing
+# for this long are taken over by another process sharing the database
+DEFAULT_LEASE_SECONDS = 60.0
+
+
+class JobStore:
+    """Job records keyed by job ID
+
+    Records are plain dicts with at least `status`, `video_path`, `error`,
+    `created_at` and `updated_at`; any other fields are kept as-is.
+    """
+
+    def create(self, job_id: str, status: str, **fields) -> dict:
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        raise NotImplementedError
+
+    def delete(self, job_id: str):
+        raise NotImplementedError
+
+    def list(self, status: str = None, limit: int = 100) -> list:
+        """Most recently created records first, optionally filtered by status"""
+        raise NotImplementedError
+
+    def purge(self, older_than: float) -> int:
+        """Delete finished records created more than `older_than` seconds ago"""
+        raise NotImplementedError
+
+    def claim_interrupted(self) -> list:
+        """Take over records left queued or processing by a process that is gone, oldest first"""
+        raise NotImplementedError
+
+    def renew_leases(self):
+        """Extend this process's lease on its active jobs"""
+
+    def release_leases(self):
+        """Give up this process's active jobs, so another process can take them over now"""
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+
+
+class MemoryJobStore(JobStore):
+    """Process-local store, for tests and single-shot runs"""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id: str, status: str, **fields) -> dict:
+        now = time.time()
+        job = {"video_path": None, "error": None, **fields, "status": status,
+               "created_at": now, "updated_at": now}
+        with self._lock:
+            self._jobs[job_id] = job
+        return {"job_id": job_id, **job}
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return {"job_id": job_id, **job} if job is not None else None
+
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        with self._lock:
+            if job_id not in self._jobs:
+                return None
+            self._jobs[job_id].update(fields, updated_at=time.time())
+            return {"job_id": job_id, **self._jobs[job_id]}
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def list(self, status: str = None, limit: int = 100) -> list:
+        with self._lock:
+            jobs = [
+                {"job_id": job_id, **job}
+                for job_id, job in self._jobs.items()
+                if status is None or job["status"] == status
+            ]
+        jobs.sort(key=lambda job: job["created_at"], reverse=True)
+        return jobs if limit < 0 else jobs[:limit]
+
+    def purge(self, older_than: float) -> int:
+        cutoff = time.time() - older_than
+        with self._lock:
+            stale = [
+                job_id for job_id, job in self._jobs.items()
+                if job["created_at"] < cutoff and job["status"] not in ACTIVE_STATUSES
+            ]
+            for job_id in stale:
+                del self._jobs[job_id]
+        return len(stale)
+
+    def claim_interrupted(self) -> list:
+        # Nothing outlives the process, and no other process sees these jobs
+        return []
+
+
+class SQLiteJobStore(JobStore):
+    """SQLite-backed store in WAL mode, safe to share between server processes
+
+    Lookups by job ID use the primary key and listings use indexes on
+    (status, created_at) and created_at, so polling stays O(1)-ish however
+    many historical jobs accumulate. Each job is owned by the process that
+    created it, under a lease the owner renews; only jobs whose lease has
+    run out are handed to `claim_interrupted`, so processes sharing the
+    database never re-queue each other's live jobs.
+    """
+
+    def __init__(self, path: str = None, lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        self.path = Path(path or DEFAULT_JOB_DB_PATH)
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " video_path TEXT,"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " data TEXT NOT NULL DEFAULT '{}')"
+        )
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        # Added after the first release; rows from before have no owner and count as orphaned
+        for column in ("owner TEXT", "lease_until REAL"):
+            if column.split()[0] not in columns:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created_at)")
+        self._db.commit()
+
+    def create(self, job_id: str, status: str, **fields) -> dict:
+        now = time.time()
+        extra = {k: v for k, v in fields.items() if k not in CORE_FIELDS}
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (job_id, status, video_path, error, created_at, updated_at, data, owner, lease_until)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, status, fields.get("video_path"), fields.get("error"), now, now,
+                 json.dumps(extra), self.owner, now + self.lease_seconds),
+            )
+            self._db.commit()
+        return self.get(job_id)
+
+    def claim_interrupted(self) -> list:
+        now = time.time()
+        placeholders = ", ".join("?" for _ in ACTIVE_STATUSES)
+        expired = f"status IN ({placeholders}) AND (lease_until IS NULL OR lease_until < ?)"
+        claimed = []
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT job_id FROM jobs WHERE {expired} ORDER BY created_at", (*ACTIVE_STATUSES, now)
+            ).fetchall()
+            for row in rows:
+                # Conditional, so when two processes race for a job only one gets it
+                cur = self._db.execute(
+                    f"UPDATE jobs SET owner = ?, lease_until = ? WHERE job_id = ? AND {expired}",
+                    (self.owner, now + self.lease_seconds, row["job_id"], *ACTIVE_STATUSES, now),
+                )
+                if cur.rowcount:
+                    claimed.append(row["job_id"])
+            self._db.commit()
+        return [job for job in map(self.get, claimed) if job is not None]
+
+    def renew_leases(self):
+        self._set_leases(time.time() + self.lease_seconds)
+
+    def release_leases(self):
+        self._set_leases(0.0)
+
+    def _set_leases(self, lease_until: float):
+        placeholders = ", ".join("?" for _ in ACTIVE_STATUSES)
+        with self._lock:
+            self._db.execute(
+                f"UPDATE jobs SET lease_until = ? WHERE owner = ? AND status IN ({placeholders})",
+                (lease_until, self.owner, *ACTIVE_STATUSES),
+            )
+            self._db.commit()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        core = {k: v for k, v in fields.items() if k in CORE_FIELDS}
+        core["updated_at"] = time.time()
+        extra = {k: v for k, v in fields.items() if k not in CORE_FIELDS}
+        assignments = ", ".join(f"{k} = ?" for k in core)
+        params = list(core.values())
+        if extra:
+            # One json_set per field, so a field is replaced whole (None included),
+            # as dict.update does in the memory store; json_patch would drop None
+            # fields and merge nested dicts into their stale values
+            assignments += ", data = json_set(data" + ", ?, json(?)" * len(extra) + ")"
+            for key, value in extra.items():
+                params.extend((f'$."{key}"', json.dumps(value)))
+        with self._lock:
+            cur = self._db.execute(
+                f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*params, job_id)
+            )
+            self._db.commit()
+        if cur.rowcount == 0:
+            return None
+        return self.get(job_id)
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+            self._db.commit()
+
+    def list(self, status: str = None, limit: int = 100) -> list:
+        with self._lock:
+            if status is None:
+                rows = self._db.execute(
+                    "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+                ).fetchall()
+            else:
+                rows = self._db.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?",
+                    (status, limit),
+                ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def purge(self, older_than: float) -> int:
+        cutoff = time.time() - older_than
+        placeholders = ", ".join("?" for _ in ACTIVE_STATUSES)
+        with self._lock:
+            cur = self._db.execute(
+                f"DELETE FROM jobs WHERE created_at < ? AND status NOT IN ({placeholders})",
+                (cutoff, *ACTIVE_STATUSES),
+            )
+            self._db.commit()
+        return cur.rowcount
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        job = json.loads(row["data"])
+        job.update({k: row[k] for k in ("job_id", *CORE_FIELDS)})
+        return job
+
+
+def open_job_store(path: str = None, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> JobStore:
+    """SQLite store at `path`; the special path "memory" gives an in-memory store"""
+    if path == "memory":
+        return MemoryJobStore()
+    return SQLiteJobStore(path, lease_seconds=lease_seconds)
@@ -0,0 +1,143 @@
+"""Prometheus metrics in the text exposition format
+
+Small in-process counters, gauges and histograms, so the server does not need
+the prometheus_client dependency for a single /metrics endpoint.
+"""
+import threading
+
+# Seconds; spans prompt templating (microseconds) to 1080p renders (minutes)
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    return "{" + inner + "}"
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> list:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self._values = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> list:
+        return [f"{self.name}{_format_labels(dict(k))} {v}" for k, v in self._values.items()]
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self._values = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def _samples(self) -> list:
+        return [f"{self.name}{_format_labels(dict(k))} {v}" for k, v in self._values.items()]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def _samples(self) -> list:
+        lines = []
+        for key, series in self._series.items():
+            labels = dict(key)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': bound})} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def add(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+STAGE_SECONDS = METRICS.add(Histogram(
+    "magima_stage_seconds", "Seconds spent per job in each generation stage"
+))
+JOB_SECONDS = METRICS.add(Histogram(
+    "magima_job_seconds", "End-to-end seconds from submission to finished job"
+))
+JOBS_TOTAL = METRICS.add(Counter(
+    "magima_jobs_total", "Jobs finished, by final status"
+))
+QUEUE_DEPTH = METRICS.add(Gauge(
+    "magima_queue_depth", "Jobs waiting for the generation worker"
+))
+PEAK_MEMORY_BYTES = METRICS.add(Gauge(
+    "magima_peak_memory_bytes", "Peak memory of the most recent batch, by kind"
+))
+PROMPT_CACHE = METRICS.add(Gauge(
+    "magima_prompt_cache", "Gemma prompt cache counters, by kind"
+))
+EMBEDDING_CACHE = METRICS.add(Gauge(
+    "magima_embedding_cache", "Text embedding cache counters, by kind"
+))
+COST_PREDICTION_RATIO = METRICS.add(Histogram(
+    "magima_cost_prediction_ratio",
+    "Actual over predicted render cost, by kind (vram, seconds)",
+    buckets=(0.5, 0.75, 0.9, 1.0, 1.1, 1.25, 1.5, 2, 4),
+))
+ADMISSIONS_TOTAL = METRICS.add(Counter(
+    "magima_admissions_total", "Admission decisions on new requests, by action"
+))
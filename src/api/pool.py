@@ -0,0 +1,451 @@
+"""Generation worker processes, one per device, fed from one shared job queue"""
+import multiprocessing
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional
+
+from src.api.worker import JobQueue
+from src.models.ltx import RenderCancelled, StopSignal
+from src.models.video import GeneratedVideo
+
+# Seconds to wait before restarting a worker that crashed n times in a row
+RESTART_BACKOFF = (1, 5, 15, 60)
+
+# A worker that loads and stays up this long resets its crash count
+STABLE_SECONDS = 60.0
+
+
+class WorkerCrashed(Exception):
+    """Raised when a worker process exits while it is loading or rendering"""
+
+
+class RemoteError(Exception):
+    """An exception raised inside a worker process, re-raised in the server"""
+
+
+@dataclass(frozen=True)
+class DeviceSpec:
+    device: str
+    model: Optional[str] = None
+    capacity_gb: Optional[float] = None
+
+
+def parse_devices(value: Optional[str]) -> list:
+    """DeviceSpecs from "cuda:0=ltx-2-19b-distilled-fp8@80,cuda:1,cpu=fake"
+
+    Each comma-separated entry is `device[=model][@capacity_gb]`: the model the
+    worker loads at startup (default: the server's default model) and the
+    device's memory, which the cost model otherwise only knows for one device.
+    The same device may appear more than once, e.g. several CPU fake workers.
+    """
+    specs = []
+    for entry in (value or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        entry, _, capacity = entry.partition("@")
+        device, _, model = entry.partition("=")
+        specs.append(DeviceSpec(
+            device=device.strip(),
+            model=model.strip() or None,
+            capacity_gb=float(capacity) if capacity else None,
+        ))
+    return specs
+
+
+def serve_generator(spec: DeviceSpec, options: dict, conn):
+    """Worker process main loop: load a generator on one device and serve calls
+
+    Messages from the server are ("call", method, kwargs, preview),
+    ("interrupt", mode) and ("stop",). Replies are ("ready", info) once, then
+    per call any number of ("progress", step, total, latents) followed by
+    ("result", paths, stages, peak_memory) or ("error", type_name, message,
+    stages, peak_memory). Latents are reduced to preview size here so only a
+    few KB cross the pipe. Interrupts are read between denoising steps, and
+    ignored when they arrive after the call they were meant for.
+    """
+    from src.models.ltx import LTXVideoGenerator
+    from src.models.preview import preview_latents
+    from src.models.timing import StageTimer, peak_memory, reset_peak_memory
+
+    try:
+        generator = LTXVideoGenerator(model=spec.model, device=spec.device, **options)
+        generator.load()
+    except Exception as e:
+        conn.send(("error", type(e).__name__, str(e), {}, {}))
+        return
+    conn.send(("ready", {"model": generator.model, "startup_profile": generator.startup_profile.to_dict()}))
+    stopping = threading.Event()
+
+    while not stopping.is_set():
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message[0] == "stop":
+            return
+        if message[0] == "interrupt":
+            continue
+        _, method, kwargs, preview = message
+        signal = StopSignal()
+        trace = StageTimer()
+        reset_peak_memory()
+
+        def progress(step: int, total: int, latents=None):
+            while conn.poll():
+                message = conn.recv()
+                if message[0] == "stop":
+                    # Checkpointed jobs resume when the server is back
+                    stopping.set()
+                signal.interrupt("preempt" if message[0] == "stop" else message[1])
+            every, width, height, frames = preview
+            if latents is not None and every and step % every == 0:
+                latents = preview_latents(latents, width, height, frames)
+            else:
+                latents = None
+            conn.send(("progress", step, total, latents))
+
+        try:
+            if method == "generate_long":
+                videos = [getattr(generator, method)(trace=trace, progress=progress, should_stop=signal, **kwargs)]
+                paths = [kwargs["output_path"]]
+            else:
+                videos = getattr(generator, method)(trace=trace, progress=progress, should_stop=signal, **kwargs)
+                paths = kwargs["output_paths"]
+            # Written here so only paths go back over the pipe, never frames
+            with trace.stage("disk_write"):
+                for video, path in zip(videos, paths):
+                    generator.save_video(video, path)
+        except Exception as e:
+            if isinstance(e, RenderCancelled):
+                generator.release_memory()
+            conn.send(("error", type(e).__name__, str(e), trace.to_dict(), peak_memory()))
+            continue
+        conn.send(("result", paths, trace.to_dict(), peak_memory()))
+
+
+class RemoteGenerator:
+    """Proxy for an LTXVideoGenerator running in its own process
+
+    Has the `generate_batch`, `generate_long` and `save_video` signatures the
+    server uses, so a batch handler runs unchanged against either. Stage
+    timings are merged into the caller's `trace`, progress callbacks are
+    replayed on the calling thread, and results come back as GeneratedVideos
+    already written to their output paths.
+    """
+
+    def __init__(self, spec: DeviceSpec, options: dict = None, preview_every: int = 0):
+        self.spec = spec
+        self.options = options or {}
+        self.preview_every = preview_every
+        self.model = spec.model
+        self.startup_profile = {}
+        self.needs_restart = False
+        self.last_peak_memory = {}
+        self.process = None
+        self._conn = None
+        self._send_lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process is not None else None
+
+    def start(self):
+        """Spawn the worker process and wait for its model to load"""
+        # spawn, not fork: CUDA can't be re-initialized in a forked child
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=serve_generator,
+            args=(self.spec, self.options, child_conn),
+            name=f"generator-{self.spec.device}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        message = self._recv()
+        if message[0] != "ready":
+            self.stop()
+            raise RemoteError(f"{message[1]}: {message[2]}")
+        self.model = message[1]["model"]
+        self.startup_profile = message[1]["startup_profile"]
+        self.needs_restart = False
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        if self.process is None or self.process.pid is None:
+            return
+        try:
+            with self._send_lock:
+                self._conn.send(("stop",))
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+        self._conn.close()
+
+    def generate_batch(self, trace=None, progress: Callable = None, should_stop: Callable = None, **kwargs) -> list:
+        frames = kwargs.get("num_frames", 121)
+        return self._call("generate_batch", kwargs, trace, progress, frames, should_stop)
+
+    def generate_long(
+        self, trace=None, progress: Callable = None, should_stop: Callable = None, **kwargs
+    ) -> GeneratedVideo:
+        frames = kwargs.get("segment_frames", 121)
+        return self._call("generate_long", kwargs, trace, progress, frames, should_stop)[0]
+
+    def save_video(self, frames, output_path: str, fps: int = 24):
+        """Results are written by the worker; this only moves them if asked to"""
+        return frames.save(output_path)
+
+    def peak_memory(self) -> dict:
+        """Peak memory of the worker process during its last call"""
+        return self.last_peak_memory
+
+    def _call(self, method: str, kwargs: dict, trace, progress, frames: int, should_stop=None) -> list:
+        """Run one call in the worker, relaying `should_stop` to it as the steps come in"""
+        preview = (self.preview_every if progress else 0, kwargs.get("width"), kwargs.get("height"), frames)
+        sent_stop = None
+        try:
+            with self._send_lock:
+                self._conn.send(("call", method, kwargs, preview))
+        except (BrokenPipeError, OSError):
+            self.needs_restart = True
+            raise WorkerCrashed(f"Worker on {self.spec.device} is not running")
+
+        while True:
+            message = self._recv()
+            if message[0] == "progress":
+                if progress is not None:
+                    progress(message[1], message[2], message[3])
+                stop = should_stop() if should_stop is not None else None
+                if stop is not None and stop != sent_stop:
+                    with self._send_lock:
+                        self._conn.send(("interrupt", stop))
+                    sent_stop = stop
+                continue
+            stages, self.last_peak_memory = message[-2], message[-1]
+            if trace is not None:
+                for name, seconds in stages.items():
+                    trace.record(name, seconds)
+            if message[0] == "result":
+                self.model = kwargs.get("model") or self.model
+                return [GeneratedVideo(path) for path in message[1]]
+            if message[1] == "RenderCancelled":
+                raise RenderCancelled(preempt=message[2] == str(RenderCancelled(preempt=True)))
+            error = RemoteError(f"{message[1]}: {message[2]}")
+            if message[1] == "OutOfMemoryError" or "out of memory" in message[2].lower():
+                # A fresh CUDA context is the only sure way to get fragmented memory back
+                self.needs_restart = True
+            raise error
+
+    def _recv(self):
+        while not self._conn.poll(0.5):
+            if not self.process.is_alive():
+                self.needs_restart = True
+                raise WorkerCrashed(
+                    f"Worker on {self.spec.device} exited with code {self.process.exitcode}"
+                )
+        try:
+            return self._conn.recv()
+        except (EOFError, OSError):
+            self.needs_restart = True
+            raise WorkerCrashed(f"Worker on {self.spec.device} closed its pipe")
+
+
+class WorkerSlot:
+    """One device: its worker process and what it is running"""
+
+    def __init__(self, spec: DeviceSpec, remote: RemoteGenerator):
+        self.spec = spec
+        self.remote = remote
+        self.current_jobs: list = []
+        self.started: Optional[float] = None
+        self.restarts = 0
+        self.crashes = 0
+        self.up_since: Optional[float] = None
+
+    @property
+    def model(self) -> Optional[str]:
+        """The model the worker last ran, which is resident on its device"""
+        return self.remote.model
+
+    def stats(self) -> dict:
+        return {
+            "device": self.spec.device,
+            "model": self.model,
+            "capacity_gb": self.spec.capacity_gb,
+            "pid": self.remote.pid,
+            "alive": self.remote.alive,
+            "restarts": self.restarts,
+            "current_jobs": self.current_jobs,
+        }
+
+
+class WorkerPool:
+    """Dispatches queued jobs to one worker process per device
+
+    A drop-in for GenerationWorker: the same submit/position/ETA interface, but
+    the handler is called as `handler(batch, generator)` with the slot's
+    RemoteGenerator. Each slot thread takes the next batch it can run:
+    jobs `accept(payload, spec)` rejects (e.g. too large for the device) are
+    left for other slots, except on the largest device, which takes anything
+    so no job waits forever. Among the next few jobs, one whose
+    `model_of(payload)` is already loaded on the slot goes first, saving a
+    model swap. Crashed workers, and workers that ran out of memory, are
+    restarted with backoff while the other devices keep serving.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[list, RemoteGenerator], None],
+        devices: list,
+        generator_options: dict = None,
+        max_queue_size: int = 16,
+        batch_key: Optional[Callable[[Any], Hashable]] = None,
+        max_batch_size: int = 1,
+        batch_window: float = 0.0,
+        model_of: Optional[Callable[[Any], str]] = None,
+        accept: Optional[Callable[[Any, DeviceSpec], bool]] = None,
+        preview_every: int = 0,
+        scheduler=None,
+    ):
+        if not devices:
+            raise ValueError("WorkerPool needs at least one device")
+        self.handler = handler
+        self.queue = JobQueue(max_queue_size, scheduler)
+        self.batch_key = batch_key or id
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.model_of = model_of
+        self.accept = accept
+        self.slots = [
+            WorkerSlot(spec, RemoteGenerator(spec, generator_options, preview_every))
+            for spec in devices
+        ]
+        self._largest = max(self.slots, key=lambda slot: slot.spec.capacity_gb or 0)
+        self._durations = deque(maxlen=20)
+        self._stop = threading.Event()
+        self._threads: list = []
+
+    def start(self):
+        """Start one dispatcher thread per device; each spawns its worker process"""
+        if any(thread.is_alive() for thread in self._threads):
+            return self
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._run, args=(slot,), name=f"dispatch-{slot.spec.device}", daemon=True)
+            for slot in self.slots
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop dispatching, then stop the worker processes"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        for slot in self.slots:
+            slot.remote.stop()
+
+    def submit(self, job_id: str, payload: Any) -> int:
+        """Queue a job, raising QueueFull when there is no room"""
+        return self.queue.put(job_id, payload)
+
+    @property
+    def current_jobs(self) -> list:
+        return [job_id for slot in self.slots for job_id in slot.current_jobs]
+
+    def position(self, job_id: str) -> Optional[int]:
+        """0 while the job is running, 1+ while waiting, None otherwise"""
+        if job_id in self.current_jobs:
+            return 0
+        return self.queue.position(job_id)
+
+    @property
+    def average_duration(self) -> float:
+        """Mean wall time of recent batches (60s until one has finished)"""
+        if not self._durations:
+            return 60.0
+        return sum(self._durations) / len(self._durations)
+
+    def estimated_wait(self, position: int) -> float:
+        """Rough seconds until a job at `position` starts, with all live devices draining the queue"""
+        live = max(1, sum(slot.remote.alive for slot in self.slots))
+        wait = position * self.average_duration / live
+        running = [slot.started for slot in self.slots if slot.started is not None]
+        if running:
+            elapsed = time.monotonic() - min(running)
+            wait -= min(elapsed, self.average_duration) / live
+        return max(wait, 0.0)
+
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait before retrying"""
+        return max(1, int(self.average_duration / len(self.slots)))
+
+    def stats(self) -> list:
+        return [slot.stats() for slot in self.slots]
+
+    def _accepts(self, slot: WorkerSlot, payload: Any) -> bool:
+        return slot is self._largest or self.accept is None or self.accept(payload, slot.spec)
+
+    def _prefers(self, slot: WorkerSlot, payload: Any) -> bool:
+        return self.model_of is not None and self.model_of(payload) == slot.model
+
+    def _ensure_running(self, slot: WorkerSlot) -> bool:
+        remote = slot.remote
+        if remote.alive and not remote.needs_restart:
+            if slot.crashes and time.monotonic() - slot.up_since > STABLE_SECONDS:
+                slot.crashes = 0
+            return True
+
+        if remote.process is not None:
+            remote.stop()
+            slot.restarts += 1
+            slot.crashes += 1
+            delay = RESTART_BACKOFF[min(slot.crashes, len(RESTART_BACKOFF)) - 1]
+            print(f"Worker on {slot.spec.device} is down; restarting in {delay}s")
+            if self._stop.wait(delay):
+                return False
+        try:
+            remote.start()
+        except Exception as e:
+            print(f"Worker on {slot.spec.device} failed to start: {e}")
+            return False
+        slot.up_since = time.monotonic()
+        print(f"Worker on {slot.spec.device} ready (pid {remote.pid}, model {remote.model})")
+        return True
+
+    def _run(self, slot: WorkerSlot):
+        while not self._stop.is_set():
+            if not self._ensure_running(slot):
+                continue
+            batch = self.queue.get_batch(
+                self.batch_key,
+                self.max_batch_size,
+                self.batch_window,
+                timeout=0.5,
+                prefer=lambda payload: self._prefers(slot, payload),
+                accept=lambda payload: self._accepts(slot, payload),
+            )
+            if not batch:
+                continue
+            slot.current_jobs = [job_id for job_id, _ in batch]
+            slot.started = time.monotonic()
+            try:
+                self.handler(batch, slot.remote)
+            except Exception as e:
+                print(f"Worker on {slot.spec.device}: batch {slot.current_jobs} raised {e}")
+            finally:
+                self._durations.append(time.monotonic() - slot.started)
+                slot.current_jobs = []
+                slot.started = None
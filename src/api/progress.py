@@ -0,0 +1,62 @@
+"""Fan-out of job progress events from the worker thread to streaming clients"""
+import asyncio
+import threading
+
+TERMINAL_EVENTS = ("completed", "failed", "cancelled")
+
+
+class ProgressHub:
+    """Per-job publish/subscribe bridge between threads and the event loop
+
+    The generation worker publishes plain dict events from its own thread;
+    each SSE or WebSocket client owns an asyncio.Queue that events are handed
+    to with `call_soon_threadsafe`. The latest step event per job is kept so
+    a client that connects mid-render starts with the current progress.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # job_id -> [(loop, queue, previews)]
+        self._latest = {}
+
+    def subscribe(self, job_id: str, previews: bool = False) -> asyncio.Queue:
+        """Register a client on the running event loop; call `unsubscribe` when done"""
+        queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers.setdefault(job_id, []).append((loop, queue, previews))
+            latest = self._latest.get(job_id)
+        if latest is not None:
+            queue.put_nowait(latest)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        with self._lock:
+            remaining = [s for s in self._subscribers.get(job_id, []) if s[1] is not queue]
+            if remaining:
+                self._subscribers[job_id] = remaining
+            else:
+                self._subscribers.pop(job_id, None)
+
+    def wants_previews(self, job_id: str) -> bool:
+        """Whether any client of this job asked for preview frames"""
+        with self._lock:
+            return any(previews for _, _, previews in self._subscribers.get(job_id, []))
+
+    def publish(self, job_id: str, event: dict):
+        """Deliver an event to every client of `job_id`; safe from any thread"""
+        with self._lock:
+            if event["type"] == "step":
+                self._latest[job_id] = event
+            elif event["type"] in TERMINAL_EVENTS:
+                self._latest.pop(job_id, None)
+            subscribers = list(self._subscribers.get(job_id, []))
+
+        for loop, queue, previews in subscribers:
+            if event["type"] == "preview" and not previews:
+                continue
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The client's loop has closed; it will unsubscribe itself
+                pass
@@ -0,0 +1,110 @@
+"""Content-addressed store of finished renders"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_RENDER_CACHE_DIR = Path("outputs") / "cache"
+
+# Bytes hashed from each end of a checkpoint; hashing all 27-43 GB is too slow
+FINGERPRINT_SAMPLE_BYTES = 4 * 1024 * 1024
+
+
+def checkpoint_fingerprint(path: str) -> str:
+    """Cheap content hash of a checkpoint: its size plus its first and last bytes"""
+    path = Path(path)
+    h = hashlib.sha256()
+    if not path.is_file():
+        # Hub model IDs or directories: fall back to the name
+        h.update(str(path).encode("utf-8"))
+        return h.hexdigest()[:16]
+
+    size = path.stat().st_size
+    h.update(str(size).encode("utf-8"))
+    with open(path, "rb") as f:
+        h.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+        if size > FINGERPRINT_SAMPLE_BYTES:
+            f.seek(max(size - FINGERPRINT_SAMPLE_BYTES, FINGERPRINT_SAMPLE_BYTES))
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+def render_key(checkpoint: str, **params) -> str:
+    """Content address of a render: every input that changes the output pixels"""
+    payload = json.dumps({"checkpoint": checkpoint, **params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """Finished videos stored by render key, evicted least-recently-used by size
+
+    Entries are hard links to the job's own output where possible, and a hit
+    is linked back out to the new job's own output, so evicting a cache entry
+    never deletes a file a job record still points at.
+    """
+
+    def __init__(self, root: str = None, max_bytes: int = 50 * 1024**3):
+        self.root = Path(root or DEFAULT_RENDER_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, key: str) -> Path:
+        return self.root / f"{key}.mp4"
+
+    def lookup(self, key: str) -> Optional[Path]:
+        """Path of a cached render, refreshing its LRU position"""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def check_out(self, key: str, target: str) -> Optional[Path]:
+        """Link a cached render to `target` for a new job, or None on a miss"""
+        target = Path(target)
+        with self._lock:
+            # Under the lock, so the entry can't be evicted between lookup and link
+            path = self.lookup(key)
+            if path is None:
+                return None
+            _link_or_copy(path, target)
+        return target
+
+    def store(self, key: str, video_path: str) -> Path:
+        """Add a finished render to the cache and evict down to the size bound"""
+        target = self.path_for(key)
+        with self._lock:
+            _link_or_copy(video_path, target)
+            self._evict()
+        return target
+
+    def size(self) -> int:
+        return sum(p.stat().st_size for p in self.root.glob("*.mp4"))
+
+    def _evict(self):
+        entries = []
+        for p in self.root.glob("*.mp4"):
+            st = p.stat()
+            entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+
+
+def _link_or_copy(source, target: Path):
+    """Hard-link `source` to `target`, copying across filesystems; replaces `target` atomically"""
+    tmp = target.with_suffix(".tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
@@ -0,0 +1,343 @@
+"""Rendition ladder: re-encodes of finished videos for phones and TVs, off the GPU worker"""
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+# MAGIMA_RENDITIONS=default uses this ladder
+DEFAULT_LADDER = "1080p@5000k,720p@2800k,480p@1200k,hls,poster"
+
+# HLS segment length; MP4 rungs put a keyframe at every segment boundary
+HLS_SEGMENT_SECONDS = 2
+
+# Written beside a finished ladder, so a later video with the same key reuses it
+INDEX_FILE = "renditions.json"
+
+
+@dataclass(frozen=True)
+class Rendition:
+    name: str
+    # "mp4", "hls" (the MP4 rungs as an HLS master playlist) or "poster" (a JPEG)
+    kind: str
+    # Short side in pixels, for MP4 rungs
+    height: Optional[int] = None
+    # Target kbit/s; without one a rung is encoded at constant quality
+    kbps: Optional[int] = None
+
+
+def parse_ladder(value: Optional[str]) -> list:
+    """Renditions from "1080p@5000k,720p@2800k,480p,hls,poster"
+
+    Entries are `<short side>p[@<kbit/s>k]` MP4 rungs, "hls" and "poster";
+    "default" means DEFAULT_LADDER. Empty or "off" disables renditions.
+    """
+    if not value or value.lower() in ("0", "off", "none"):
+        return []
+    if value.lower() in ("1", "default"):
+        value = DEFAULT_LADDER
+    ladder = []
+    for entry in value.split(","):
+        entry = entry.strip().lower()
+        if not entry:
+            continue
+        if entry in ("hls", "poster"):
+            ladder.append(Rendition(entry, entry))
+            continue
+        size, _, rate = entry.partition("@")
+        if not size.endswith("p") or not size[:-1].isdigit() or (rate and not rate.rstrip("k").isdigit()):
+            raise ValueError(f"Bad rendition {entry!r} (expected e.g. 720p@2800k, hls or poster)")
+        ladder.append(Rendition(size, "mp4", height=int(size[:-1]), kbps=int(rate.rstrip("k")) if rate else None))
+    return ladder
+
+
+def probe_video(source: str) -> dict:
+    """Width, height, fps and duration of a video"""
+    import imageio_ffmpeg
+
+    reader = imageio_ffmpeg.read_frames(source)
+    try:
+        meta = next(reader)
+    finally:
+        reader.close()
+    width, height = meta["size"]
+    return {"width": width, "height": height, "fps": meta.get("fps") or 24, "seconds": meta.get("duration") or 0.0}
+
+
+def encode_rendition(rendition: Rendition, source: str, out_dir: str, info: dict, threads: int = 2, rungs: list = ()) -> dict:
+    """Write one rendition of `source` under `out_dir` (runs in a pool process)
+
+    Files are written under a temporary name and renamed into place, so a
+    rendition that is listed is complete. `rungs` are the finished MP4
+    records an "hls" rendition segments.
+    """
+    import imageio_ffmpeg
+
+    ffmpeg = [imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-v", "error"]
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+
+    if rendition.kind == "mp4":
+        portrait = info["height"] > info["width"]
+        scale = f"scale={rendition.height}:-2" if portrait else f"scale=-2:{rendition.height}"
+        gop = str(max(1, round(info["fps"] * HLS_SEGMENT_SECONDS)))
+        if rendition.kbps:
+            rate = ["-b:v", f"{rendition.kbps}k", "-maxrate", f"{rendition.kbps}k", "-bufsize", f"{rendition.kbps * 2}k"]
+        else:
+            rate = ["-crf", "23"]
+        path = out_dir / f"{rendition.name}.mp4"
+        partial = out_dir / f"{rendition.name}.mp4.partial"
+        subprocess.run(
+            ffmpeg + ["-i", source, "-vf", scale, "-c:v", "libx264", "-preset", "veryfast", *rate,
+                      "-g", gop, "-keyint_min", gop, "-sc_threshold", "0", "-pix_fmt", "yuv420p",
+                      "-movflags", "+faststart", "-an", "-threads", str(threads), "-f", "mp4", str(partial)],
+            check=True, capture_output=True,
+        )
+        os.replace(partial, path)
+        probed = probe_video(str(path))
+        record = {"file": path.name, "bytes": path.stat().st_size, "width": probed["width"], "height": probed["height"]}
+        if rendition.kbps:
+            record["kbps"] = rendition.kbps
+
+    elif rendition.kind == "poster":
+        path = out_dir / "poster.jpg"
+        partial = out_dir / "poster.jpg.partial"
+        subprocess.run(
+            ffmpeg + ["-i", source, "-vf", "thumbnail", "-frames:v", "1", "-q:v", "3", "-f", "image2", str(partial)],
+            check=True, capture_output=True,
+        )
+        os.replace(partial, path)
+        record = {"file": path.name, "bytes": path.stat().st_size, "width": info["width"], "height": info["height"]}
+
+    elif rendition.kind == "hls":
+        if not rungs:
+            raise ValueError("no MP4 rungs to segment")
+        final = out_dir / "hls"
+        partial = out_dir / "hls.partial"
+        shutil.rmtree(partial, ignore_errors=True)
+        partial.mkdir()
+        variants = []
+        for rung in sorted(rungs, key=lambda r: -r["height"]):
+            name = Path(rung["file"]).stem
+            subprocess.run(
+                ffmpeg + ["-i", str(out_dir / rung["file"]), "-c", "copy", "-f", "hls",
+                          "-hls_time", str(HLS_SEGMENT_SECONDS), "-hls_playlist_type", "vod",
+                          "-hls_segment_filename", str(partial / f"{name}_%03d.ts"), str(partial / f"{name}.m3u8")],
+                check=True, capture_output=True,
+            )
+            bandwidth = rung["bytes"] * 8 / info["seconds"] if info["seconds"] else (rung.get("kbps") or 0) * 1000
+            variants.append(
+                f"#EXT-X-STREAM-INF:BANDWIDTH={int(bandwidth)},RESOLUTION={rung['width']}x{rung['height']}\n{name}.m3u8\n"
+            )
+        (partial / "master.m3u8").write_text("#EXTM3U\n#EXT-X-VERSION:3\n" + "".join(variants))
+        shutil.rmtree(final, ignore_errors=True)
+        os.replace(partial, final)
+        size = sum(p.stat().st_size for p in final.iterdir())
+        record = {"file": "hls/master.m3u8", "bytes": size, "variants": len(variants)}
+
+    else:
+        raise ValueError(f"Unknown rendition kind: {rendition.kind}")
+
+    record["seconds"] = round(time.perf_counter() - started, 2)
+    return record
+
+
+class RenditionEncoder:
+    """Encodes a rendition ladder for finished videos in a pool of CPU processes
+
+    `submit` returns at once, so the GPU worker goes on to the next job while
+    the ladder encodes. Each MP4 rung and the poster is its own task; HLS
+    segments the finished rungs once all of them are done. Rungs larger than
+    the source are skipped rather than upscaled. `on_update(job_id,
+    renditions)` gets the job's full rendition map, name -> record with a
+    `status` of pending, ready, failed or skipped, every time one changes.
+
+    A ladder is encoded once per key, into `root/<key>`: jobs submitted with
+    the key of a ladder that is encoding share its updates, and those with
+    the key of a finished one get its records without any encoding.
+    """
+
+    def __init__(
+        self,
+        ladder: list,
+        root: str = "outputs/renditions",
+        workers: int = 2,
+        threads: int = 2,
+        on_update: Optional[Callable[[str, dict], None]] = None,
+    ):
+        self.ladder = list(ladder)
+        self.root = Path(root)
+        self.workers = workers
+        self.threads = threads
+        self.on_update = on_update
+        self._pool = None
+        self._jobs = {}  # key -> {name: record}, while any rendition is pending
+        self._subscribers = {}  # key -> job IDs waiting on that ladder
+        self._hls_started = set()  # (key, name)
+        self._counts = {"ready": 0, "failed": 0, "skipped": 0, "reused": 0}
+        self._lock = threading.Lock()
+        # Held from a state change until its update is published, so updates
+        # reach on_update in order and a stale map never overwrites a newer one
+        self._update_lock = threading.Lock()
+
+    def submit(self, job_id: str, source: str, key: str = None):
+        """Start encoding the ladder for one video, or attach the job to its key's ladder
+
+        `key` names the ladder (a render cache key; the job ID by default).
+        `on_update` gets the job's map before any work starts.
+        """
+        key = key or job_id
+        with self._update_lock:
+            with self._lock:
+                if key in self._jobs:
+                    self._subscribers[key].append(job_id)
+                    renditions, start = self._jobs[key], False
+                else:
+                    renditions = self._finished(key)
+                    start = renditions is None
+                    if start:
+                        renditions = {r.name: {"kind": r.kind, "status": "pending"} for r in self.ladder}
+                        self._jobs[key] = renditions
+                        self._subscribers[key] = [job_id]
+                    else:
+                        self._counts["reused"] += 1
+                snapshot = {k: dict(v) for k, v in renditions.items()}
+            self._publish([job_id], snapshot)
+        if not start:
+            return
+        with self._lock:
+            if self._pool is None:
+                # Spawned, so workers don't inherit the server's CUDA context
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            future = self._pool.submit(probe_video, source)
+        future.add_done_callback(lambda f: self._fan_out(key, source, f))
+
+    def pending(self) -> int:
+        """Ladders still encoding"""
+        with self._lock:
+            return len(self._jobs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pending_jobs": len(self._jobs), "workers": self.workers, **self._counts}
+
+    def stop(self, wait: bool = False):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _finished(self, key: str) -> Optional[dict]:
+        """Records of a finished ladder for `key` with nothing failed or missing, if there is one"""
+        try:
+            renditions = json.loads((self.root / key / INDEX_FILE).read_text())
+        except (OSError, ValueError):
+            return None
+        if any(
+            r.name not in renditions or renditions[r.name].get("status") not in ("ready", "skipped")
+            for r in self.ladder
+        ):
+            return None
+        return {r.name: renditions[r.name] for r in self.ladder}
+
+    def _fan_out(self, key: str, source: str, future):
+        try:
+            info = future.result()
+        except Exception as e:
+            for rendition in self.ladder:
+                self._record(key, rendition.name, {"status": "failed", "error": f"probe failed: {e}"})
+            return
+        short_side = min(info["width"], info["height"])
+        out_dir = str(self.root / key)
+        # The poster is cheap and the first thing a client shows, so it goes first
+        for rendition in sorted(self.ladder, key=lambda r: r.kind != "poster"):
+            if rendition.kind == "hls":
+                continue
+            if rendition.kind == "mp4" and rendition.height > short_side:
+                self._record(key, rendition.name, {"status": "skipped"}, info, out_dir)
+                continue
+            self._start(key, rendition, source, out_dir, info)
+        self._maybe_start_hls(key, source, out_dir, info)
+
+    def _start(self, key: str, rendition: Rendition, source: str, out_dir: str, info: dict, rungs: list = ()):
+        with self._lock:
+            if self._pool is None:
+                return
+            future = self._pool.submit(encode_rendition, rendition, source, out_dir, info, self.threads, list(rungs))
+
+        def landed(f):
+            try:
+                record = {"status": "ready", **f.result()}
+            except Exception as e:
+                stderr = getattr(e, "stderr", None)
+                record = {"status": "failed", "error": (stderr.decode(errors="replace").strip() if stderr else str(e))[-500:]}
+            self._record(key, rendition.name, record, info, out_dir, source)
+
+        future.add_done_callback(landed)
+
+    def _record(self, key: str, name: str, record: dict, info: dict = None, out_dir: str = None, source: str = None):
+        with self._update_lock:
+            with self._lock:
+                renditions = self._jobs.get(key)
+                if renditions is None:
+                    return
+                renditions[name] = {"kind": renditions[name]["kind"], **record}
+                self._counts[record["status"]] = self._counts.get(record["status"], 0) + 1
+                snapshot = {k: dict(v) for k, v in renditions.items()}
+                subscribers = list(self._subscribers[key])
+                if all(r["status"] != "pending" for r in renditions.values()):
+                    del self._jobs[key]
+                    del self._subscribers[key]
+                    self._hls_started -= {(key, r.name) for r in self.ladder}
+                    self._write_index(key, snapshot)
+            self._publish(subscribers, snapshot)
+        if info is not None and record["status"] != "pending":
+            self._maybe_start_hls(key, source, out_dir, info)
+
+    def _write_index(self, key: str, renditions: dict):
+        path = self.root / key / INDEX_FILE
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            partial = path.with_name(INDEX_FILE + ".partial")
+            partial.write_text(json.dumps(renditions))
+            os.replace(partial, path)
+        except OSError as e:
+            print(f"Renditions: could not write the index for {key}: {e}")
+
+    def _publish(self, job_ids: list, renditions: dict):
+        if self.on_update is None:
+            return
+        for job_id in job_ids:
+            try:
+                self.on_update(job_id, renditions)
+            except Exception as e:
+                print(f"Renditions: update for {job_id} failed: {e}")
+
+    def _maybe_start_hls(self, key: str, source: str, out_dir: str, info: dict):
+        """Segment the MP4 rungs once none is pending"""
+        with self._lock:
+            renditions = self._jobs.get(key)
+            if renditions is None:
+                return
+            rungs = [r for r in renditions.values() if r["kind"] == "mp4"]
+            hls = [
+                name for name, r in renditions.items()
+                if r["kind"] == "hls" and r["status"] == "pending" and (key, name) not in self._hls_started
+            ]
+            if not hls or any(r["status"] == "pending" for r in rungs):
+                return
+            self._hls_started.update((key, name) for name in hls)
+            ready = [dict(r) for r in rungs if r["status"] == "ready"]
+        for name in hls:
+            rendition = next(r for r in self.ladder if r.name == name)
+            if not ready:
+                self._record(key, name, {"status": "skipped"})
+                continue
+            self._start(key, rendition, source, out_dir, info, ready)
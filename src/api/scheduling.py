@@ -0,0 +1,109 @@
+"""Job ordering by priority class, deadline and per-client fair share"""
+import math
+import threading
+import time
+from typing import Any, Callable, Optional
+
+# Lower runs first
+PRIORITY_CLASSES = {"interactive": 0, "standard": 1, "batch": 2}
+
+# Pixel counts a render can step down to, largest first (those of the PRESETS
+# resolutions); the requested aspect ratio is kept
+RESOLUTION_LADDER = ((1920, 1088), (1280, 736), (768, 512))
+
+# Rendered widths and heights are multiples of this
+SIZE_MULTIPLE = 32
+
+# Step counts a render can step down to
+STEP_LADDER = (20, 12)
+
+# The distilled checkpoint always runs this many steps
+DISTILLED_MODEL = "ltx-2-19b-distilled-fp8"
+DISTILLED_STEPS = 8
+
+
+class FairScheduler:
+    """Sort key for queued jobs: priority class, earliest deadline, then least recent usage
+
+    Within a class, jobs with a deadline run earliest-deadline-first, ahead
+    of jobs without one. Ties go to the client that has used the least
+    render time recently (usage decays with `half_life` seconds), then to
+    the oldest job. A job is promoted one class for every `aging_seconds`
+    it waits, so batch work can't starve behind a stream of interactive
+    requests.
+    """
+
+    def __init__(
+        self,
+        priority_of: Callable[[Any], str],
+        deadline_of: Callable[[Any], Optional[float]],
+        client_of: Callable[[Any], str],
+        half_life: float = 600.0,
+        aging_seconds: float = 900.0,
+    ):
+        self.priority_of = priority_of
+        self.deadline_of = deadline_of
+        self.client_of = client_of
+        self.half_life = half_life
+        self.aging_seconds = aging_seconds
+        self._usage = {}  # client -> (seconds, as of)
+        self._lock = threading.Lock()
+
+    def key(self, payload: Any, waited: float, now: Optional[float] = None) -> tuple:
+        """((class, deadline), usage); jobs with equal first parts are interchangeable
+
+        Keys compared with each other should share `now`, or usage decaying
+        between calls reorders one client's jobs.
+        """
+        rank = PRIORITY_CLASSES.get(self.priority_of(payload), PRIORITY_CLASSES["standard"])
+        if self.aging_seconds:
+            rank = max(0, rank - int(waited // self.aging_seconds))
+        deadline = self.deadline_of(payload)
+        return (rank, deadline if deadline is not None else math.inf), self.usage(self.client_of(payload), now)
+
+    def usage(self, client: str, now: Optional[float] = None) -> float:
+        """Decayed render seconds charged to `client` as of `now` (default: the current time)"""
+        with self._lock:
+            seconds, as_of = self._usage.get(client, (0.0, 0.0))
+        return seconds * 0.5 ** (((now or time.time()) - as_of) / self.half_life)
+
+    def charge(self, client: str, seconds: float):
+        with self._lock:
+            current, as_of = self._usage.get(client, (0.0, 0.0))
+            now = time.time()
+            self._usage[client] = (current * 0.5 ** ((now - as_of) / self.half_life) + seconds, now)
+
+    def stats(self) -> dict:
+        with self._lock:
+            clients = list(self._usage)
+        return {client: round(self.usage(client), 1) for client in clients}
+
+
+def downgrade_candidates(width: int, height: int, steps: int, model: str, models: tuple = ()) -> list:
+    """Cheaper settings to try, least degraded first, as request overrides
+
+    Fewer steps are tried before lower resolutions, and the distilled model
+    (when it is in `models`) comes last. Lower resolutions have the pixel
+    count of each smaller ladder rung in the requested aspect ratio.
+    """
+    shapes = [(width, height)]
+    for w, h in RESOLUTION_LADDER:
+        shape = scale_to_area(width, height, w * h)
+        if shape[0] * shape[1] < shapes[-1][0] * shapes[-1][1]:
+            shapes.append(shape)
+    step_counts = [steps] + [s for s in STEP_LADDER if s < steps]
+
+    candidates = []
+    for w, h in shapes:
+        for s in step_counts:
+            candidates.append({"width": w, "height": h, "num_inference_steps": s, "model": model})
+    if DISTILLED_MODEL in models and model != DISTILLED_MODEL:
+        for w, h in shapes:
+            candidates.append({"width": w, "height": h, "num_inference_steps": DISTILLED_STEPS, "model": DISTILLED_MODEL})
+    return candidates[1:]
+
+
+def scale_to_area(width: int, height: int, area: int) -> tuple:
+    """(width, height) with about `area` pixels and the aspect ratio of `width` x `height`"""
+    scale = math.sqrt(area / (width * height))
+    return tuple(max(SIZE_MULTIPLE, round(side * scale / SIZE_MULTIPLE) * SIZE_MULTIPLE) for side in (width, height))
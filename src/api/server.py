@@ -1,19 +1,143 @@
 """FastAPI server for video generation"""
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
+import asyncio
+import base64
+import json
+import os
+import threading
+import time
 import uuid
 from pathlib import Path
 
-from src.models.ltx import LTXVideoGenerator
+from src.api.delivery import OutputIndex, RangeFileResponse
+from src.api.job_store import ACTIVE_STATUSES, open_job_store
+from src.api.metrics import (
+    ADMISSIONS_TOTAL,
+    COST_PREDICTION_RATIO,
+    EMBEDDING_CACHE,
+    JOB_SECONDS,
+    JOBS_TOTAL,
+    METRICS,
+    PEAK_MEMORY_BYTES,
+    PROMPT_CACHE,
+    QUEUE_DEPTH,
+    STAGE_SECONDS,
+)
+from src.api.pool import DeviceSpec, RemoteGenerator, WorkerPool, parse_devices
+from src.api.progress import TERMINAL_EVENTS, ProgressHub
+from src.api.render_cache import RenderCache, checkpoint_fingerprint, render_key
+from src.api.renditions import RenditionEncoder, parse_ladder
+from src.api.scheduling import PRIORITY_CLASSES, FairScheduler, downgrade_candidates
+from src.api.stages import StagePipeline
+from src.api.worker import GenerationWorker, QueueFull
+from src.models.cost_model import CostModel, is_out_of_memory, parse_policy
+from src.models.long_video import fit_overlap, plan_segments
+from src.models.ltx import DEFAULT_MODEL, GENERATION_KINDS, MODEL_VARIANTS, LTXVideoGenerator, RenderCancelled, StopSignal
+from src.models.preview import encode_jpeg, latent_preview
+from src.models.timing import StageTimer, peak_memory, reset_peak_memory
 
 app = FastAPI(title="Magima Kids Video Generation API")
 
+
+def env_float(name: str) -> Optional[float]:
+    value = os.environ.get(name)
+    return float(value) if value else None
+
+
+# Maximum number of jobs waiting behind the running one
+MAX_QUEUE_SIZE = int(os.environ.get("MAGIMA_MAX_QUEUE_SIZE", "16"))
+
+# Same-shape jobs arriving within BATCH_WINDOW seconds share one pipeline call
+MAX_BATCH_SIZE = int(os.environ.get("MAGIMA_MAX_BATCH_SIZE", "4"))
+BATCH_WINDOW = float(os.environ.get("MAGIMA_BATCH_WINDOW", "0.5"))
+
+# Size bound of the content-addressed render cache under outputs/cache
+RENDER_CACHE_GB = float(os.environ.get("MAGIMA_RENDER_CACHE_GB", "50"))
+
+# Job records older than this are purged (queued/processing jobs are kept)
+JOB_TTL_SECONDS = float(os.environ.get("MAGIMA_JOB_TTL_DAYS", "7")) * 86400
+
+# Each server process renews a lease on its queued and processing jobs; another
+# process sharing the job DB re-queues them once the lease is this many seconds stale
+JOB_LEASE_SECONDS = float(os.environ.get("MAGIMA_JOB_LEASE_SECONDS", "60"))
+
+# Requests predicted not to fit in VRAM try these fallbacks in order
+# ("reroute", "downgrade"); when none applies, or the policy is empty, they are rejected
+ADMISSION_POLICY = parse_policy(os.environ.get("MAGIMA_ADMISSION_POLICY", ""))
+
+# Streaming clients that ask for previews get one every PREVIEW_EVERY denoising steps (0 = never)
+PREVIEW_EVERY = int(os.environ.get("MAGIMA_PREVIEW_EVERY", "5"))
+
+# Internal nginx location mapped to outputs/ (e.g. "/_outputs/"). When set, video
+# downloads are handed to nginx with X-Accel-Redirect, which serves ranges with sendfile
+ACCEL_REDIRECT = os.environ.get("MAGIMA_ACCEL_REDIRECT")
+
+# Requests without a model render with this one
+DEFAULT_MODEL_NAME = os.environ.get("MAGIMA_DEFAULT_MODEL") or DEFAULT_MODEL
+
+# One worker process per entry, "device[=model][@capacity_gb]", e.g.
+# "cuda:0=ltx-2-19b-distilled-fp8@80,cuda:1@80" or "cpu=fake,cpu=fake".
+# Unset, the server renders in-process on its own generator.
+DEVICES = parse_devices(os.environ.get("MAGIMA_DEVICES"))
+
+# A waiting job moves up one priority class per MAGIMA_PRIORITY_AGING_SECONDS (0 = never),
+# and client render time charged for fair share halves every MAGIMA_FAIR_SHARE_HALF_LIFE
+PRIORITY_AGING_SECONDS = float(os.environ.get("MAGIMA_PRIORITY_AGING_SECONDS", "900"))
+FAIR_SHARE_HALF_LIFE = float(os.environ.get("MAGIMA_FAIR_SHARE_HALF_LIFE", "600"))
+
+# With MAGIMA_PREEMPT=1, a job arriving while every worker is busy pauses the render
+# of the lowest priority class below its own; the paused job saves its latents and
+# resumes from them when it is next scheduled
+PREEMPT = os.environ.get("MAGIMA_PREEMPT") == "1"
+
+# Latents of preempted renders, one file per job
+CHECKPOINT_DIR = Path("outputs") / "checkpoints"
+
+# With MAGIMA_PIPELINED=1 the in-process generator only denoises on the worker
+# thread; upscaling, VAE decode and encoding run on stage threads behind it, with
+# MAGIMA_STAGE_QUEUE batches waiting between stages. Pool workers render whole jobs.
+PIPELINED = os.environ.get("MAGIMA_PIPELINED") == "1"
+STAGE_QUEUE_SIZE = int(os.environ.get("MAGIMA_STAGE_QUEUE", "2"))
+
+# Renditions every finished video is re-encoded into, e.g. "1080p@5000k,720p@2800k,480p@1200k,hls,poster"
+# ("default" for that ladder, unset for none), by MAGIMA_RENDITION_WORKERS CPU processes
+RENDITION_LADDER = parse_ladder(os.environ.get("MAGIMA_RENDITIONS"))
+RENDITION_WORKERS = int(os.environ.get("MAGIMA_RENDITION_WORKERS", "2"))
+
 # Global generator (loaded once)
 generator: LTXVideoGenerator = None
 
-# Job storage (in production, use Redis or similar)
-jobs = {}
+# Job storage: SQLite (WAL) by default, shareable between uvicorn workers
+jobs = open_job_store(os.environ.get("MAGIMA_JOB_DB"), lease_seconds=JOB_LEASE_SECONDS)
+
+# Finished renders by content address, and the job currently producing each key
+render_cache = RenderCache(max_bytes=int(RENDER_CACHE_GB * 1024**3))
+checkpoint_hashes = {}
+inflight = {}
+inflight_lock = threading.Lock()
+
+# Jobs being rendered, with the stop signal of their batch, and jobs asked to stop
+running = {}  # job_id -> (StopSignal, request)
+cancel_requested = set()
+running_lock = threading.Lock()
+
+# Sizes and hashes of finished videos, for the download manifest
+output_index = OutputIndex("outputs")
+
+# Progress events for SSE and WebSocket clients
+progress_hub = ProgressHub()
+
+# Predicted vs measured VRAM and runtime per shape; device size from torch unless
+# overridden, or the largest pool device's when the device list gives sizes
+cost_model = CostModel(
+    MODEL_VARIANTS,
+    path=os.environ.get("MAGIMA_COST_DB"),
+    capacity_gb=env_float("MAGIMA_DEVICE_VRAM_GB")
+    or max((d.capacity_gb for d in DEVICES if d.capacity_gb), default=None),
+)
 
 
 class GenerateRequest(BaseModel):
@@ -25,6 +149,21 @@ class GenerateRequest(BaseModel):
     num_inference_steps: int = 30
     guidance_scale: float = 7.5
     seed: Optional[int] = None
+    model: Optional[str] = None
+    # Clips longer than segment_frames render as overlapping segments
+    segment_frames: Optional[int] = None
+    overlap_frames: int = 17
+    # "interactive", "standard" or "batch"
+    priority: str = "standard"
+    # Seconds from submission the video should be ready in; the server fills in
+    # deadline_at (epoch seconds) and, if allowed, renders cheaper settings to meet it
+    deadline_seconds: Optional[float] = None
+    deadline_at: Optional[float] = None
+    allow_downgrade: bool = True
+    # Fair-share identity; defaults to the X-Client-Id header, then the client address
+    client_id: Optional[str] = None
+    # Run the 2x spatial latent upscaler: the video comes out at twice width and height
+    upscale: bool = False
 
 
 class JobStatus(BaseModel):
@@ -32,78 +171,1164 @@ class JobStatus(BaseModel):
     status: str
     video_path: Optional[str] = None
     error: Optional[str] = None
+    queue_position: Optional[int] = None
+    queue_depth: Optional[int] = None
+    estimated_wait: Optional[float] = None
+    cache_key: Optional[str] = None
+    cached: bool = False
+    timings: Optional[dict] = None
+    peak_memory: Optional[dict] = None
+    admission: Optional[dict] = None
+    cost: Optional[dict] = None
+    priority: Optional[str] = None
+    deadline_at: Optional[float] = None
+    downgrade: Optional[dict] = None
+    renditions: Optional[dict] = None
+
+
+def generator_options() -> dict:
+    return dict(
+        deterministic_enhancement=os.environ.get("MAGIMA_DETERMINISTIC_ENHANCEMENT") == "1",
+        vram_budget_gb=env_float("MAGIMA_VRAM_BUDGET_GB"),
+        host_budget_gb=env_float("MAGIMA_HOST_BUDGET_GB"),
+    )
 
 
 @app.on_event("startup")
 async def startup():
-    """Load model on startup"""
+    """Load model on startup and start the generation worker
+
+    With MAGIMA_DEVICES set the models load in the pool's worker processes
+    instead, which start in the background.
+    """
     global generator
-    generator = LTXVideoGenerator()
-    generator.load()
+    if not DEVICES:
+        generator = LTXVideoGenerator(model=DEFAULT_MODEL_NAME, **generator_options())
+        generator.load()
+        print(f"Startup profile: {generator.startup_profile.to_dict()}")
+    recover_jobs()
+    if stage_pipeline is not None:
+        stage_pipeline.start()
+    worker.start()
+    asyncio.get_running_loop().create_task(purge_jobs_periodically())
+    asyncio.get_running_loop().create_task(renew_job_leases())
+
+
+def recover_jobs():
+    """Re-queue jobs a dead server process left queued or processing
+
+    Only jobs whose owner stopped renewing its lease are taken over, so
+    sibling workers sharing the job DB never render each other's jobs.
+    """
+    for job in jobs.claim_interrupted():
+        request = job.get("request")
+        if request is None:
+            jobs.update(job["job_id"], status="failed", error="Interrupted by server restart")
+            continue
+        jobs.update(job["job_id"], status="queued")
+        try:
+            worker.submit(job["job_id"], GenerateRequest(**request))
+            print(f"Recovered interrupted job {job['job_id']}")
+        except QueueFull:
+            jobs.update(job["job_id"], status="failed", error="Interrupted by server restart")
+
+
+async def renew_job_leases():
+    """Keep this process's jobs leased, and pick up jobs of processes that died"""
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+        try:
+            await asyncio.to_thread(jobs.renew_leases)
+            await asyncio.to_thread(recover_jobs)
+        except Exception as e:
+            # Retried next round, well before the lease runs out
+            print(f"Warning: could not renew job leases: {e}")
+
+
+async def purge_jobs_periodically(interval: float = 3600):
+    while True:
+        purged = await asyncio.to_thread(jobs.purge, JOB_TTL_SECONDS)
+        if purged:
+            print(f"Purged {purged} job records older than the TTL")
+        await asyncio.sleep(interval)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    worker.stop(timeout=5)
+    # Unfinished jobs go to a sibling process (or the next start) without waiting out the lease
+    jobs.release_leases()
+    if stage_pipeline is not None:
+        stage_pipeline.stop(timeout=5)
+    if rendition_encoder is not None:
+        rendition_encoder.stop()
 
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "model_loaded": generator is not None}
+    return {
+        "status": "healthy",
+        "model_loaded": generator is not None or any(w["alive"] for w in worker_stats() or []),
+        "queue_depth": len(worker.queue),
+        "max_queue_size": MAX_QUEUE_SIZE,
+        "current_jobs": worker.current_jobs,
+        "prompt_cache": prompt_cache_stats(),
+        "embedding_cache": embedding_cache_stats(),
+        "models": generator.registry.stats() if generator is not None else None,
+        "startup_profile": generator.startup_profile.to_dict() if generator is not None else None,
+        "staging": generator.stager.stats() if generator is not None and generator.stager else None,
+        "cost_model": cost_model.stats(),
+        "fair_share": scheduler.stats(),
+        "stages": stage_pipeline.stats() if stage_pipeline is not None else None,
+        "renditions": rendition_encoder.stats() if rendition_encoder is not None else None,
+        "workers": worker_stats(),
+    }
+
+
+def worker_stats() -> Optional[list]:
+    """Per-device worker processes, when rendering on a pool"""
+    return worker.stats() if isinstance(worker, WorkerPool) else None
+
+
+def prompt_cache_stats() -> Optional[dict]:
+    """Hit/miss counters of the Gemma prompt cache, if enhancement is enabled"""
+    enhancer = generator.prompt_enhancer if generator is not None else None
+    if enhancer is None or enhancer.cache is None:
+        return None
+    return enhancer.cache.stats()
+
+
+def embedding_cache_stats() -> Optional[dict]:
+    """Hit/miss counters of the text embedding cache, once the pipeline has used it"""
+    cache = generator.embedding_cache if generator is not None else None
+    return cache.stats() if cache is not None else None
 
 
 @app.post("/generate", response_model=JobStatus)
-async def generate(request: GenerateRequest, background_tasks: BackgroundTasks):
-    """Start video generation job"""
-    job_id = str(uuid.uuid4())
-    jobs[job_id] = {"status": "processing", "video_path": None, "error": None}
+async def generate(request: GenerateRequest, http_request: Request):
+    """Queue a video generation job
+
+    Requests with an explicit seed are content-addressed: a finished identical
+    render is returned straight from the cache, and a running identical job is
+    shared instead of rendering twice. Jobs run by priority class, then
+    earliest deadline, then the client with the least recent render time.
+    """
+    if request.model is not None:
+        variant = MODEL_VARIANTS.get(request.model)
+        if variant is None or variant.kind not in GENERATION_KINDS:
+            raise HTTPException(status_code=422, detail=f"Unknown model: {request.model}")
+    if request.priority not in PRIORITY_CLASSES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown priority: {request.priority} (expected one of {', '.join(PRIORITY_CLASSES)})",
+        )
+    if request.upscale and is_long_video(request):
+        raise HTTPException(status_code=422, detail="upscale is not supported for segmented long videos")
+    if is_long_video(request):
+        try:
+            plan_segments(request.num_frames, request.segment_frames, request.overlap_frames)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    request = request.model_copy(update={
+        "client_id": request.client_id
+        or http_request.headers.get("x-client-id")
+        or (http_request.client.host if http_request.client else "anonymous"),
+        "deadline_at": time.time() + request.deadline_seconds if request.deadline_seconds is not None else None,
+    })
+    request, admission = admit(request)
+    key = request_cache_key(request)
+    if key is not None:
+        job_id = str(uuid.uuid4())
+        # The job gets its own link to the render, which cache eviction never removes
+        video_path = render_cache.check_out(key, Path("outputs") / f"{job_id}.mp4")
+        if video_path is not None:
+            jobs.create(
+                job_id,
+                status="completed",
+                video_path=str(video_path),
+                cache_key=key,
+                cached=True,
+            )
+            await asyncio.to_thread(output_index.add, video_path)
+            # Shares the ladder already encoded (or encoding) for this key
+            start_renditions(job_id, str(video_path), key)
+            return job_status(job_id)
+
+    request, downgrade = meet_deadline(request, worker.estimated_wait(worker.queue.rank_of(request)))
+    if downgrade is not None:
+        key = request_cache_key(request)
+    with inflight_lock:
+        if key is not None and key in inflight:
+            job = jobs.get(inflight[key])
+            # Each submitter sharing the job holds a reference; cancelling drops one
+            jobs.update(inflight[key], submitters=(job or {}).get("submitters", 1) + 1)
+            return job_status(inflight[key])
+
+        job_id = str(uuid.uuid4())
+        jobs.create(
+            job_id,
+            status="queued",
+            cache_key=key,
+            request=request.model_dump(),
+            admission=admission.to_dict(),
+            downgrade=downgrade,
+        )
+        try:
+            worker.submit(job_id, request)
+        except QueueFull as e:
+            jobs.delete(job_id)
+            raise HTTPException(
+                status_code=503,
+                detail=str(e),
+                headers={"Retry-After": str(worker.retry_after())},
+            )
+        if key is not None:
+            inflight[key] = job_id
+
+    if PREEMPT:
+        preempt_for(request)
+    return job_status(job_id)
 
-    background_tasks.add_task(run_generation, job_id, request)
 
-    return JobStatus(job_id=job_id, status="processing")
+def preempt_for(request: GenerateRequest):
+    """Pause the lowest-priority render if every worker is busy and `request` outranks it
+
+    Long videos can't be checkpointed, so they are never preempted.
+    """
+    rank = PRIORITY_CLASSES[request.priority]
+    workers = len(worker.slots) if isinstance(worker, WorkerPool) else 1
+    with running_lock:
+        batches = {}
+        for signal, job_request in running.values():
+            batches.setdefault(signal, []).append(job_request)
+    if len(batches) < workers:
+        return
+    candidates = [
+        (min(PRIORITY_CLASSES[r.priority] for r in requests), signal)
+        for signal, requests in batches.items()
+        if not any(is_long_video(r) for r in requests)
+    ]
+    if not candidates:
+        return
+    lowest, signal = max(candidates, key=lambda c: c[0])
+    if lowest > rank and signal() is None:
+        print(f"Preempting {list(PRIORITY_CLASSES)[lowest]} render for {request.priority} job")
+        signal.interrupt("preempt")
+
+
+@app.delete("/job/{job_id}", response_model=JobStatus)
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job
+
+    A job shared by several identical submissions only drops the caller's
+    reference until the last one cancels. A queued job is dropped at once.
+    A running render stops at its next denoising step; one sharing a batch
+    with jobs that still want their videos runs on, and only its output is
+    discarded.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] not in ACTIVE_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job is already {job['status']}")
+    with inflight_lock:
+        submitters = jobs.get(job_id).get("submitters", 1)
+        if submitters > 1:
+            jobs.update(job_id, submitters=submitters - 1)
+            return job_status(job_id)
+    if worker.queue.discard(job_id):
+        finish_job(job_id, status="cancelled", video_path=None, error="Cancelled")
+        return job_status(job_id)
+
+    with running_lock:
+        cancel_requested.add(job_id)
+        entry = running.get(job_id)
+        batch = [other for other, (signal, _) in running.items() if entry is not None and signal is entry[0]]
+        stop = entry is not None and all(other in cancel_requested for other in batch)
+    if stop:
+        entry[0].interrupt("cancel")
+    return job_status(job_id)
+
+
+def admit(request: GenerateRequest) -> tuple:
+    """Apply the admission policy, returning the request to run and the decision
+
+    Rejected requests raise 422 before they reach the queue.
+    """
+    model = request.model or DEFAULT_MODEL_NAME
+    admission = cost_model.admit(
+        model,
+        request.width,
+        request.height,
+        render_frames(request),
+        request.num_inference_steps,
+        policy=ADMISSION_POLICY,
+        candidates=tuple(n for n, v in MODEL_VARIANTS.items() if v.kind == "t2vid"),
+    )
+    ADMISSIONS_TOTAL.inc(action=admission.action)
+    if not admission.admitted:
+        raise HTTPException(
+            status_code=422,
+            detail={"error": "Predicted to run out of GPU memory", **admission.to_dict()},
+        )
+    if admission.action != "accept":
+        print(f"Admission: {admission.reason}")
+        frames = {"num_frames": admission.estimate.num_frames}
+        if is_long_video(request):
+            # A shorter segment must still leave new frames after the overlap
+            frames = {
+                "segment_frames": admission.estimate.num_frames,
+                "overlap_frames": fit_overlap(admission.estimate.num_frames, request.overlap_frames),
+            }
+        request = request.model_copy(update={
+            "model": admission.estimate.model if admission.estimate.model != model else request.model,
+            **frames,
+        })
+    return request, admission
+
+
+def predicted_seconds(request: GenerateRequest) -> float:
+    """Predicted render time of one request, all segments of a long video included"""
+    estimate = cost_model.estimate(
+        request.model or DEFAULT_MODEL_NAME,
+        request.width,
+        request.height,
+        render_frames(request),
+        request.num_inference_steps,
+    )
+    if not is_long_video(request):
+        return estimate.seconds
+    stride = request.segment_frames - request.overlap_frames
+    return estimate.seconds * max(1, -(-(request.num_frames - request.overlap_frames) // stride))
+
+
+def meet_deadline(request: GenerateRequest, start_in: float) -> tuple:
+    """Cheaper settings for a request that would miss its deadline, and a record of the change
+
+    `start_in` is the predicted wait before the job starts. The least
+    degraded candidate predicted to finish in time wins; when none does, the
+    fastest one runs. Returns the request unchanged (and None) when it has
+    no deadline, is on time, or doesn't allow downgrades.
+    """
+    if request.deadline_at is None or not request.allow_downgrade:
+        return request, None
+    seconds = predicted_seconds(request)
+    slack = request.deadline_at - time.time() - start_in
+    if seconds <= slack:
+        return request, None
+
+    models = tuple(
+        name for name, v in MODEL_VARIANTS.items()
+        if v.kind == "t2vid" and cost_model.estimate(
+            name, request.width, request.height, render_frames(request), request.num_inference_steps
+        ).fits
+    )
+    options = [
+        (request.model_copy(update=overrides), overrides)
+        for overrides in downgrade_candidates(
+            request.width,
+            request.height,
+            request.num_inference_steps,
+            request.model or DEFAULT_MODEL_NAME,
+            models,
+        )
+    ]
+    if not options:
+        return request, None
+    timed = [(predicted_seconds(option), option, overrides) for option, overrides in options]
+    on_time = [t for t in timed if t[0] <= slack]
+    chosen_seconds, chosen, overrides = on_time[0] if on_time else min(timed, key=lambda t: t[0])
+    if chosen_seconds >= seconds:
+        return request, None
+    downgrade = {
+        "from": {key: getattr(request, key) or DEFAULT_MODEL_NAME if key == "model" else getattr(request, key) for key in overrides},
+        "to": overrides,
+        "predicted_seconds": round(chosen_seconds, 1),
+        "slack_seconds": round(slack, 1),
+        "meets_deadline": bool(on_time),
+    }
+    print(
+        f"Deadline: {request.width}x{request.height}/{request.num_inference_steps} steps needs "
+        f"~{seconds:.0f}s with {slack:.0f}s left; rendering {overrides}"
+    )
+    return chosen, downgrade
+
+
+def is_long_video(request: GenerateRequest) -> bool:
+    return request.segment_frames is not None and request.num_frames > request.segment_frames
+
+
+def render_frames(request: GenerateRequest) -> int:
+    """Frames in one pipeline call: the segment length for long videos"""
+    return request.segment_frames if is_long_video(request) else request.num_frames
+
+
+@app.get("/cost/estimate")
+async def cost_estimate(
+    width: int,
+    height: int,
+    num_frames: int,
+    num_inference_steps: int = 30,
+    model: Optional[str] = None,
+):
+    """Predicted peak VRAM and runtime of a shape, and what admission would do"""
+    return cost_model.admit(
+        model or DEFAULT_MODEL_NAME,
+        width,
+        height,
+        num_frames,
+        num_inference_steps,
+        policy=ADMISSION_POLICY,
+        candidates=tuple(n for n, v in MODEL_VARIANTS.items() if v.kind == "t2vid"),
+    ).to_dict()
+
+
+@app.get("/cost/history")
+async def cost_history(model: Optional[str] = None, limit: int = 100):
+    """Recent renders with their predicted and measured cost"""
+    return cost_model.history(model=model, limit=min(limit, 1000))
 
 
 @app.get("/job/{job_id}", response_model=JobStatus)
 async def get_job(job_id: str):
-    """Get job status"""
-    if job_id not in jobs:
+    """Get job status, by job ID or by render cache key"""
+    job = jobs.get(job_id)
+    if job is None:
+        cached_path = render_cache.lookup(job_id)
+        if cached_path is not None:
+            return JobStatus(
+                job_id=job_id,
+                status="completed",
+                video_path=str(cached_path),
+                cache_key=job_id,
+                cached=True,
+            )
         return JobStatus(job_id=job_id, status="not_found")
 
-    job = jobs[job_id]
+    return job_status(job_id, job)
+
+
+@app.get("/job/{job_id}/events")
+async def job_events_sse(job_id: str, previews: bool = False):
+    """Server-Sent Events: queue position, denoising steps with ETA, previews, final state"""
+
+    async def stream():
+        async for event in job_events(job_id, previews):
+            if event["type"] == "ping":
+                yield ": ping\n\n"
+            else:
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/job/{job_id}/ws")
+async def job_events_ws(websocket: WebSocket, job_id: str, previews: bool = False):
+    """The same events as /job/{job_id}/events, as JSON WebSocket messages"""
+    await websocket.accept()
+    try:
+        async for event in job_events(job_id, previews):
+            await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+async def job_events(job_id: str, previews: bool = False, ping_interval: float = 15.0):
+    """Progress of one job until it completes or fails
+
+    Queue position is re-checked in-process every second while the job waits,
+    so clients get position changes without polling the API.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        yield {"type": "not_found", "job_id": job_id}
+        return
+
+    queue = progress_hub.subscribe(job_id, previews)
+    try:
+        # Subscribed first, so a job finishing now can't slip between check and stream
+        job = jobs.get(job_id)
+        if job["status"] in TERMINAL_EVENTS:
+            yield terminal_event(job_id, job)
+            return
+
+        last_position = None
+        idle = 0.0
+        while True:
+            position = worker.position(job_id)
+            if position and position != last_position:
+                yield {
+                    "type": "queued",
+                    "job_id": job_id,
+                    "position": position,
+                    "queue_depth": len(worker.queue),
+                    "eta": round(worker.estimated_wait(position), 1),
+                }
+            last_position = position
+
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=1.0)
+            except asyncio.TimeoutError:
+                idle += 1.0
+                if idle >= ping_interval:
+                    idle = 0.0
+                    yield {"type": "ping"}
+                continue
+            idle = 0.0
+            yield event
+            if event["type"] in TERMINAL_EVENTS:
+                return
+    finally:
+        progress_hub.unsubscribe(job_id, queue)
+
+
+def terminal_event(job_id: str, job: dict) -> dict:
+    return {
+        "type": job["status"],
+        "job_id": job_id,
+        "video_path": job.get("video_path"),
+        "error": job.get("error"),
+    }
+
+
+@app.api_route("/video/{job_id}", methods=["GET", "HEAD"])
+async def get_video(job_id: str, request: Request):
+    """Download a finished video, by job ID or render cache key, with Range support"""
+    job = jobs.get(job_id)
+    if job is not None:
+        path = job["video_path"] if job["status"] == "completed" else None
+    else:
+        path = render_cache.lookup(job_id)
+    if path is None or not Path(path).is_file():
+        raise HTTPException(status_code=404, detail=f"No finished video for {job_id}")
+    return video_response(Path(path), request, filename=f"{job_id}.mp4")
+
+
+@app.get("/outputs/manifest")
+async def outputs_manifest():
+    """Every finished video with its size and SHA-256, for incremental sync"""
+    writing = {f"{job_id}.mp4" for job_id in worker.current_jobs}
+    files = await asyncio.to_thread(output_index.manifest, writing)
+    for entry in files:
+        entry["url"] = f"/outputs/{entry['name']}"
+    return {"generated_at": time.time(), "files": files}
+
+
+@app.api_route("/outputs/{name:path}", methods=["GET", "HEAD"])
+async def get_output(name: str, request: Request):
+    """Download a file listed in the manifest, with Range support"""
+    path = output_index.resolve(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No such output: {name}")
+    return video_response(path, request)
+
+
+@app.api_route("/renditions/{ladder}/{name:path}", methods=["GET", "HEAD"])
+async def get_rendition(ladder: str, name: str, request: Request):
+    """Download a finished rendition (MP4 rung, HLS playlist or segment, poster), with Range support
+
+    `ladder` is a job's cache key, or its ID when it has none; job status
+    gives the full URLs.
+    """
+    root = (output_index.root / "renditions" / ladder).resolve()
+    path = (root / name).resolve()
+    media_type = RENDITION_MEDIA_TYPES.get(path.suffix)
+    if root not in path.parents or media_type is None or not path.is_file():
+        raise HTTPException(status_code=404, detail=f"No such rendition: {name}")
+    return video_response(path, request, media_type=media_type)
+
+
+RENDITION_MEDIA_TYPES = {
+    ".mp4": "video/mp4",
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+    ".jpg": "image/jpeg",
+}
+
+
+def video_response(path: Path, request: Request, filename: str = None, media_type: str = "video/mp4") -> Response:
+    if ACCEL_REDIRECT:
+        relative = path.resolve().relative_to(output_index.root.resolve()).as_posix()
+        return Response(
+            media_type=media_type,
+            headers={"X-Accel-Redirect": ACCEL_REDIRECT.rstrip("/") + "/" + relative},
+        )
+    return RangeFileResponse(path, request.headers, media_type=media_type, filename=filename)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    QUEUE_DEPTH.set(len(worker.queue))
+    for kind, value in (prompt_cache_stats() or {}).items():
+        PROMPT_CACHE.set(value, kind=kind)
+    for kind, value in (embedding_cache_stats() or {}).items():
+        EMBEDDING_CACHE.set(value, kind=kind)
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/jobs")
+async def list_jobs(status: Optional[str] = None, limit: int = 100):
+    """Most recent job records, optionally filtered by status"""
+    return jobs.list(status=status, limit=min(limit, 1000))
+
+
+def job_status(job_id: str, job: dict = None) -> JobStatus:
+    job = job or jobs.get(job_id)
+    position = worker.position(job_id)
     return JobStatus(
         job_id=job_id,
         status=job["status"],
         video_path=job["video_path"],
         error=job["error"],
+        queue_position=position,
+        queue_depth=len(worker.queue),
+        estimated_wait=worker.estimated_wait(position) if position else None,
+        cache_key=job.get("cache_key"),
+        cached=job.get("cached", False),
+        timings=job.get("timings"),
+        peak_memory=job.get("peak_memory"),
+        admission=job.get("admission"),
+        cost=job.get("cost"),
+        priority=(job.get("request") or {}).get("priority"),
+        deadline_at=(job.get("request") or {}).get("deadline_at"),
+        downgrade=job.get("downgrade"),
+        renditions=rendition_urls(job.get("cache_key") or job_id, job.get("renditions")),
+    )
+
+
+def rendition_urls(ladder: str, renditions: Optional[dict]) -> Optional[dict]:
+    """A job's rendition records, with a download URL for the ready ones
+
+    `ladder` is the directory the ladder was encoded into: the job's cache
+    key, or its ID for a seedless render.
+    """
+    if not renditions:
+        return None
+    return {
+        name: {**record, "url": f"/renditions/{ladder}/{record['file']}"} if record.get("file") else record
+        for name, record in renditions.items()
+    }
+
+
+def request_cache_key(request: GenerateRequest) -> Optional[str]:
+    """Render cache key, or None for seedless requests (their output is random)"""
+    if request.seed is None:
+        return None
+    return render_key(
+        checkpoint_hash(request.model),
+        prompt=request.prompt,
+        negative_prompt=request.negative_prompt,
+        width=request.width,
+        height=request.height,
+        num_frames=request.num_frames,
+        num_inference_steps=request.num_inference_steps,
+        guidance_scale=request.guidance_scale,
+        seed=request.seed,
+        **long_video_params(request),
+        **({"upscale": True} if request.upscale else {}),
     )
 
 
-async def run_generation(job_id: str, request: GenerateRequest):
-    """Run generation in background"""
+def long_video_params(request: GenerateRequest) -> dict:
+    """Segmenting settings, which change the output of long videos only"""
+    if not is_long_video(request):
+        return {}
+    return {"segment_frames": request.segment_frames, "overlap_frames": request.overlap_frames}
+
+
+def record_job_metrics(job: Optional[dict]):
+    if job is None:
+        return
+    JOBS_TOTAL.inc(status=job["status"])
+    JOB_SECONDS.observe(job["finished_at"] - job["created_at"])
+    for stage, seconds in (job.get("timings") or {}).items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+    for kind, value in (job.get("peak_memory") or {}).items():
+        PEAK_MEMORY_BYTES.set(value, kind=kind)
+
+
+def checkpoint_hash(model: Optional[str]) -> str:
+    """Fingerprint of the checkpoint a request renders with, computed once per model"""
+    model = model or DEFAULT_MODEL_NAME
+    if model not in checkpoint_hashes:
+        checkpoint_hashes[model] = checkpoint_fingerprint(MODEL_VARIANTS[model].checkpoint_path)
+    return checkpoint_hashes[model]
+
+
+def finish_job(job_id: str, **fields):
+    """Record a job's final state and metrics, and release its in-flight cache key"""
+    job = jobs.update(job_id, finished_at=time.time(), **fields)
+    with running_lock:
+        cancel_requested.discard(job_id)
+    checkpoint_path(job_id).unlink(missing_ok=True)
+    record_job_metrics(job)
+    if fields.get("status") == "completed":
+        # Hashed now, on the worker thread, so manifest requests stay cheap
+        output_index.add(fields["video_path"])
+        start_renditions(job_id, fields["video_path"], job.get("cache_key") if job else None)
+    if job is not None:
+        progress_hub.publish(job_id, terminal_event(job_id, job))
+    key = job.get("cache_key") if job else None
+    if key is None:
+        return
+    with inflight_lock:
+        if fields.get("status") == "completed":
+            try:
+                render_cache.store(key, fields["video_path"])
+            except OSError as e:
+                print(f"Warning: could not cache render {key}: {e}")
+        if inflight.get(key) == job_id:
+            del inflight[key]
+
+
+def start_renditions(job_id: str, video_path: str, key: Optional[str] = None):
+    """Queue the rendition ladder for a finished video; the job is already complete
+
+    Seeded renders share one ladder per cache key, so repeats aren't re-encoded.
+    """
+    if rendition_encoder is None:
+        return
     try:
-        output_dir = Path("outputs")
-        output_dir.mkdir(exist_ok=True)
-        video_path = output_dir / f"{job_id}.mp4"
-
-        frames = generator.generate(
-            prompt=request.prompt,
-            negative_prompt=request.negative_prompt,
-            width=request.width,
-            height=request.height,
-            num_frames=request.num_frames,
-            num_inference_steps=request.num_inference_steps,
-            guidance_scale=request.guidance_scale,
-            seed=request.seed,
-        )
+        rendition_encoder.submit(job_id, video_path, key=key)
+    except Exception as e:
+        print(f"Warning: could not start renditions for {job_id}: {e}")
+
+
+def record_renditions(job_id: str, renditions: dict):
+    """Called from the rendition encoder each time one of a job's renditions lands"""
+    jobs.update(job_id, renditions=renditions)
+
+
+def checkpoint_path(job_id: str) -> Path:
+    return CHECKPOINT_DIR / f"{job_id}.pt"
+
+
+def take_cancelled(batch: list) -> list:
+    """Finish jobs cancelled between dispatch and render, returning the rest"""
+    with running_lock:
+        cancelled = [item for item in batch if item[0] in cancel_requested]
+    for job_id, _ in cancelled:
+        finish_job(job_id, status="cancelled", video_path=None, error="Cancelled")
+    return [item for item in batch if item not in cancelled]
+
+
+def release_running(batch: list, signal: StopSignal):
+    with running_lock:
+        for job_id, _ in batch:
+            if running.get(job_id, (None,))[0] is signal:
+                del running[job_id]
+
+
+def requeue_interrupted(batch: list, signal: StopSignal, preempted: bool, job_metrics):
+    """After a render stopped early: cancel the jobs asked to stop, requeue the preempted rest"""
+    release_running(batch, signal)
+    for job_id, request in batch:
+        with running_lock:
+            cancelled = job_id in cancel_requested or not preempted
+        if cancelled:
+            finish_job(job_id, status="cancelled", video_path=None, error="Cancelled", **job_metrics(job_id))
+            continue
+        resumable = checkpoint_path(job_id).exists()
+        job = jobs.update(job_id, status="queued")
+        jobs.update(job_id, preemptions=(job or {}).get("preemptions", 0) + 1)
+        progress_hub.publish(job_id, {"type": "preempted", "job_id": job_id, "resumable": resumable})
+        worker.queue.put(job_id, request, force=True)
+
+
+def record_cost(estimate, seconds: Optional[float], memory: dict) -> dict:
+    """Feed a finished render back into the cost model and the prediction metrics"""
+    vram_bytes = memory.get("peak_vram_bytes")
+    vram_gb = vram_bytes / 1024**3 if vram_bytes else None
+    cost_model.record(estimate, actual_vram_gb=vram_gb, actual_seconds=seconds)
+    if seconds is not None and estimate.seconds > 0:
+        COST_PREDICTION_RATIO.observe(seconds / estimate.seconds, kind="seconds")
+    if vram_gb is not None and estimate.vram_gb > 0:
+        COST_PREDICTION_RATIO.observe(vram_gb / estimate.vram_gb, kind="vram")
+    return {"vram_gb": round(vram_gb, 2) if vram_gb is not None else None, "seconds": round(seconds, 1) if seconds is not None else None}
 
-        generator.save_video(frames, str(video_path))
 
-        jobs[job_id] = {
-            "status": "completed",
-            "video_path": str(video_path),
-            "error": None,
-        }
+def batch_progress(batch: list, render_started: float):
+    """Step callback publishing progress, and previews when a client wants them, per job"""
+    first = batch[0][1]
+
+    def on_progress(step: int, total: int, latents=None):
+        elapsed = time.perf_counter() - render_started
+        eta = elapsed / step * (total - step) if step else None
+        for index, (job_id, _) in enumerate(batch):
+            progress_hub.publish(job_id, {
+                "type": "step",
+                "job_id": job_id,
+                "step": step,
+                "total": total,
+                "elapsed": round(elapsed, 1),
+                "eta": round(eta, 1) if eta is not None else None,
+            })
+            if (
+                latents is None
+                or not PREVIEW_EVERY
+                or step % PREVIEW_EVERY
+                or not progress_hub.wants_previews(job_id)
+            ):
+                continue
+            try:
+                image = latent_preview(
+                    latents, first.width, first.height, render_frames(first), index=index
+                )
+            except Exception as e:
+                print(f"Warning: could not build preview for {job_id}: {e}")
+                continue
+            progress_hub.publish(job_id, {
+                "type": "preview",
+                "job_id": job_id,
+                "step": step,
+                "image": base64.b64encode(encode_jpeg(image)).decode("ascii"),
+                "content_type": "image/jpeg",
+            })
+
+    return on_progress
+
+
+def batch_key(request: GenerateRequest) -> tuple:
+    """Requests with the same key can share one batched pipeline call"""
+    return (
+        request.width,
+        request.height,
+        request.num_frames,
+        request.num_inference_steps,
+        request.guidance_scale,
+        request.model,
+        request.segment_frames,
+        request.overlap_frames,
+        request.upscale,
+    )
+
+
+def run_generation(batch: list, gen=None):
+    """Run a batch of same-shape jobs on the worker thread
+
+    `gen` is the pool worker's RemoteGenerator, or None for the in-process
+    generator. A batch predicted not to fit in VRAM as a whole is split into
+    smaller ones. Long videos render one job at a time, segment by segment.
+    Jobs that would now miss their deadline are downgraded first, and the
+    render time is charged to the clients for fair share.
+    """
+    gen = gen or generator
+    batch = take_cancelled(retarget_deadlines(batch))
+    if not batch:
+        return
+    if len({batch_key(request) for _, request in batch}) > 1:
+        groups = {}
+        for item in batch:
+            groups.setdefault(batch_key(item[1]), []).append(item)
+        for group in groups.values():
+            run_generation(group, gen)
+        return
+    first = batch[0][1]
+    # Explicit, so every pool worker renders the same model whatever it loaded first
+    model = first.model or DEFAULT_MODEL_NAME
+    long_video = is_long_video(first)
+    # Preempted jobs continue from their own latents, so they render alone
+    resumed = len(batch) > 1 and any(checkpoint_path(job_id).exists() for job_id, _ in batch)
+    if (long_video or resumed) and len(batch) > 1:
+        for item in batch:
+            run_generation([item], gen)
+        return
+
+    estimate = cost_model.estimate(
+        model,
+        first.width,
+        first.height,
+        render_frames(first),
+        first.num_inference_steps,
+        batch_size=len(batch),
+    )
+    if len(batch) > 1 and not estimate.fits:
+        size = cost_model.max_batch_size(estimate, len(batch))
+        for i in range(0, len(batch), size):
+            run_generation(batch[i:i + size], gen)
+        return
+
+    started_at = time.time()
+    trace = StageTimer()
+    created_at = {}
+    for job_id, _ in batch:
+        job = jobs.update(job_id, status="processing", started_at=started_at)
+        created_at[job_id] = job["created_at"] if job else started_at
+        progress_hub.publish(job_id, {"type": "started", "job_id": job_id, "batch_size": len(batch)})
+    signal = StopSignal()
+    with running_lock:
+        for job_id, request in batch:
+            running[job_id] = (signal, request)
+    reset_peak_memory()
+    memory = gen.peak_memory if isinstance(gen, RemoteGenerator) else peak_memory
+    cost = {"predicted": estimate.to_dict(), "actual": None}
+
+    def job_metrics(job_id: str) -> dict:
+        # Stage timings cover the whole batch; queue wait is per job
+        timings = {"queue_wait": started_at - created_at[job_id], **trace.to_dict()}
+        return {"timings": timings, "peak_memory": memory(), "cost": cost}
+
+    def fail(error: Exception):
+        for job_id, _ in batch:
+            finish_job(job_id, status="failed", video_path=None, error=str(error), **job_metrics(job_id))
+
+    def complete(videos: list, render_seconds: float):
+        # A long video's runtime spans many segments, so only its peak VRAM says
+        # anything about the per-call estimate
+        cost["actual"] = record_cost(estimate, None if long_video else render_seconds, memory())
+        for _, request in batch:
+            scheduler.charge(request.client_id or "anonymous", render_seconds / len(batch))
+
+        for (job_id, _), frames in zip(batch, videos):
+            with running_lock:
+                cancelled = job_id in cancel_requested
+            if cancelled:
+                # Cancelled while sharing a batch that ran on; its video is not kept
+                (output_dir / f"{job_id}.mp4").unlink(missing_ok=True)
+                finish_job(job_id, status="cancelled", video_path=None, error="Cancelled", **job_metrics(job_id))
+                continue
+            try:
+                video_path = output_dir / f"{job_id}.mp4"
+                # Pool workers write their videos and report that disk_write themselves
+                if not isinstance(gen, RemoteGenerator):
+                    with trace.stage("disk_write"):
+                        gen.save_video(frames, str(video_path))
+                finish_job(
+                    job_id,
+                    status="completed",
+                    video_path=str(video_path),
+                    error=None,
+                    **job_metrics(job_id),
+                )
+            except Exception as e:
+                finish_job(job_id, status="failed", video_path=None, error=str(e), **job_metrics(job_id))
+
+    staged = stage_pipeline is not None and gen is generator and not long_video and generator.supports_stages()
+    output_dir = Path("outputs")
+    try:
+        output_dir.mkdir(exist_ok=True)
+
+        requests = [request for _, request in batch]
+        render_started = time.perf_counter()
+        on_progress = batch_progress(batch, render_started)
+        if long_video:
+            job_id = batch[0][0]
+            videos = [gen.generate_long(
+                prompt=first.prompt,
+                output_path=str(output_dir / f"{job_id}.mp4"),
+                negative_prompt=first.negative_prompt,
+                width=first.width,
+                height=first.height,
+                num_frames=first.num_frames,
+                segment_frames=first.segment_frames,
+                overlap_frames=first.overlap_frames,
+                num_inference_steps=first.num_inference_steps,
+                guidance_scale=first.guidance_scale,
+                seed=first.seed,
+                model=model,
+                trace=trace,
+                progress=on_progress,
+                should_stop=signal,
+            )]
+        else:
+            batch_args = dict(
+                prompts=[r.prompt for r in requests],
+                negative_prompts=[r.negative_prompt for r in requests],
+                seeds=[r.seed for r in requests],
+                width=first.width,
+                height=first.height,
+                num_frames=first.num_frames,
+                num_inference_steps=first.num_inference_steps,
+                guidance_scale=first.guidance_scale,
+                model=model,
+                trace=trace,
+                progress=on_progress,
+                should_stop=signal,
+                checkpoint_paths=[str(checkpoint_path(job_id)) for job_id, _ in batch],
+                resume_from=[
+                    str(checkpoint_path(job_id)) if checkpoint_path(job_id).exists() else None
+                    for job_id, _ in batch
+                ],
+            )
+            if staged:
+                latents = gen.denoise_batch(**batch_args)
+            else:
+                videos = gen.generate_batch(
+                    **batch_args,
+                    output_paths=[str(output_dir / f"{job_id}.mp4") for job_id, _ in batch],
+                    upscale=first.upscale,
+                )
+    except RenderCancelled as e:
+        if gen is generator:
+            generator.release_memory()
+        requeue_interrupted(batch, signal, e.preempt, job_metrics)
+        return
     except Exception as e:
-        jobs[job_id] = {
-            "status": "failed",
-            "video_path": None,
-            "error": str(e),
-        }
+        if is_out_of_memory(e):
+            cost["actual"] = {"oom": True}
+            cost_model.record(estimate, oom=True)
+        fail(e)
+        return
+    finally:
+        release_running(batch, signal)
+
+    if staged:
+        # The worker moves on to the next batch while this one goes through the stages
+        stage_pipeline.submit({
+            "batch": batch,
+            "latents": latents,
+            "upscale": first.upscale,
+            "trace": trace,
+            "seconds": time.perf_counter() - render_started,
+            "complete": complete,
+            "fail": fail,
+        })
+        return
+    complete(videos, time.perf_counter() - render_started)
+
+
+def timed_stage(fn):
+    """Add a stage's run time to the item's render seconds"""
+    def run(item: dict):
+        started = time.perf_counter()
+        try:
+            return fn(item)
+        finally:
+            item["seconds"] += time.perf_counter() - started
+
+    return run
+
+
+def upscale_stage(item: dict) -> dict:
+    if item["upscale"]:
+        item["latents"] = generator.upscale_latents(item["latents"], item["trace"])
+    return item
+
+
+def decode_stage(item: dict) -> dict:
+    item["frames"] = generator.decode_latents(item.pop("latents"), item["trace"])
+    return item
+
+
+def encode_stage(item: dict):
+    """Encode each job's video and finish the batch; cancelled jobs are not encoded"""
+    started = time.perf_counter()
+    videos = []
+    for (job_id, _), frames in zip(item["batch"], item.pop("frames")):
+        with running_lock:
+            cancelled = job_id in cancel_requested
+        path = str(Path("outputs") / f"{job_id}.mp4")
+        videos.append(None if cancelled else generator.encode_frames(frames, path, trace=item["trace"]))
+    item["complete"](videos, item["seconds"] + time.perf_counter() - started)
+
+
+def stage_failed(name: str, item: dict, error: Exception):
+    if "latents" in item:
+        generator.release_latents(item["latents"])
+    item["fail"](error)
+
+
+def retarget_deadlines(batch: list) -> list:
+    """Re-check deadlines at dispatch, when the actual queue wait is known
+
+    Downgraded jobs get their new settings recorded in the job store, and
+    move to the cache key of what they now render, so the cheaper video is
+    never cached or shared as the full-quality one.
+    """
+    retargeted = []
+    for job_id, request in batch:
+        if request.deadline_at is not None and request.allow_downgrade:
+            request, downgrade = meet_deadline(request, 0.0)
+            if downgrade is not None:
+                rekey_job(job_id, request_cache_key(request))
+                jobs.update(job_id, request=request.model_dump(), downgrade=downgrade)
+        retargeted.append((job_id, request))
+    return retargeted
+
+
+def rekey_job(job_id: str, key: Optional[str]):
+    """Move a job's in-flight claim and recorded cache key to `key`"""
+    job = jobs.get(job_id)
+    old_key = job.get("cache_key") if job else None
+    if old_key == key:
+        return
+    with inflight_lock:
+        if old_key is not None and inflight.get(old_key) == job_id:
+            del inflight[old_key]
+        if key is not None:
+            inflight.setdefault(key, job_id)
+    jobs.update(job_id, cache_key=key)
+
+
+def fits_device(request: GenerateRequest, device: DeviceSpec) -> bool:
+    """Whether a request's predicted peak VRAM fits on a pool device"""
+    if device.capacity_gb is None:
+        return True
+    estimate = cost_model.estimate(
+        request.model or DEFAULT_MODEL_NAME,
+        request.width,
+        request.height,
+        render_frames(request),
+        request.num_inference_steps,
+    )
+    return estimate.vram_gb <= device.capacity_gb
+
+
+scheduler = FairScheduler(
+    priority_of=lambda request: request.priority,
+    deadline_of=lambda request: request.deadline_at,
+    client_of=lambda request: request.client_id or "anonymous",
+    half_life=FAIR_SHARE_HALF_LIFE,
+    aging_seconds=PRIORITY_AGING_SECONDS,
+)
+
+if DEVICES:
+    worker = WorkerPool(
+        run_generation,
+        DEVICES,
+        generator_options=generator_options(),
+        max_queue_size=MAX_QUEUE_SIZE,
+        batch_key=batch_key,
+        max_batch_size=MAX_BATCH_SIZE,
+        batch_window=BATCH_WINDOW,
+        model_of=lambda request: request.model or DEFAULT_MODEL_NAME,
+        accept=fits_device,
+        preview_every=PREVIEW_EVERY,
+        scheduler=scheduler,
+    )
+else:
+    worker = GenerationWorker(
+        run_generation,
+        max_queue_size=MAX_QUEUE_SIZE,
+        batch_key=batch_key,
+        max_batch_size=MAX_BATCH_SIZE,
+        batch_window=BATCH_WINDOW,
+        scheduler=scheduler,
+    )
+
+stage_pipeline = StagePipeline(
+    [
+        ("upscale", timed_stage(upscale_stage)),
+        ("decode", timed_stage(decode_stage)),
+        ("encode", encode_stage),
+    ],
+    queue_size=STAGE_QUEUE_SIZE,
+    on_error=stage_failed,
+) if PIPELINED and not DEVICES else None
+
+
+rendition_encoder = RenditionEncoder(
+    RENDITION_LADDER,
+    root=str(Path("outputs") / "renditions"),
+    workers=RENDITION_WORKERS,
+    on_update=record_renditions,
+) if RENDITION_LADDER else None
 
 
 def main():
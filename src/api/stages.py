@@ -0,0 +1,102 @@
+"""Render stages chained by bounded hand-off queues, one thread per stage"""
+import queue
+import threading
+import time
+from typing import Any, Callable, Optional
+
+# Put on a stage's queue to make its thread exit
+_STOP = object()
+
+
+class StagePipeline:
+    """Runs items through `stages` in order, each stage on its own thread
+
+    `stages` is a list of `(name, fn)`; each `fn(item)` returns the item for
+    the next stage, or None to drop it. Stages hand items on through queues
+    of `queue_size`, so while one job is encoded the next can be decoded and
+    a third denoised, and steady-state throughput approaches that of the
+    slowest stage rather than the sum of all of them. A full queue blocks
+    the stage before it, which in turn blocks `submit`, so a slow encoder
+    holds back new renders instead of piling up decoded frames in memory.
+    An item whose stage raises is passed to `on_error(name, item, error)`.
+    """
+
+    def __init__(
+        self,
+        stages: list,
+        queue_size: int = 2,
+        on_error: Optional[Callable[[str, Any, Exception], None]] = None,
+    ):
+        self.stages = list(stages)
+        self.queue_size = queue_size
+        self.on_error = on_error
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in self.stages]
+        self._busy = [0] * len(self.stages)
+        self._items = [0] * len(self.stages)
+        self._seconds = [0.0] * len(self.stages)
+        self._threads = []
+
+    def start(self):
+        """Start the stage threads"""
+        if any(thread.is_alive() for thread in self._threads):
+            return self
+        self._threads = [
+            threading.Thread(target=self._run, args=(i,), name=f"stage-{name}", daemon=True)
+            for i, (name, _) in enumerate(self.stages)
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """Finish the items already submitted, then stop the threads"""
+        if not self._threads:
+            return
+        self._queues[0].put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def submit(self, item: Any):
+        """Hand an item to the first stage, blocking while its queue is full"""
+        self._queues[0].put(item)
+
+    def stats(self) -> dict:
+        """Queued and in-progress items, items done and busy seconds per stage"""
+        return {
+            name: {
+                "queued": self._queues[i].qsize(),
+                "busy": self._busy[i],
+                "items": self._items[i],
+                "seconds": round(self._seconds[i], 1),
+            }
+            for i, (name, _) in enumerate(self.stages)
+        }
+
+    def _run(self, index: int):
+        name, fn = self.stages[index]
+        inbox = self._queues[index]
+        outbox = self._queues[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                if outbox is not None:
+                    outbox.put(_STOP)
+                return
+            self._busy[index] = 1
+            started = time.perf_counter()
+            try:
+                result = fn(item)
+            except Exception as e:
+                result = None
+                print(f"Stage {name} failed: {e}")
+                if self.on_error is not None:
+                    try:
+                        self.on_error(name, item, e)
+                    except Exception as error:
+                        print(f"Stage {name}: error handler raised {error}")
+            finally:
+                self._seconds[index] += time.perf_counter() - started
+                self._items[index] += 1
+                self._busy[index] = 0
+            if result is not None and outbox is not None:
+                outbox.put(result)
@@ -0,0 +1,245 @@
+"""Dedicated generation worker fed by a bounded job queue"""
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Hashable, Optional
+
+# How far past the head of the queue a worker may look for a job it prefers
+PREFER_WINDOW = 8
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted to a queue with no free slots"""
+
+
+class JobQueue:
+    """Bounded queue of pending jobs that supports position lookups
+
+    FIFO by default. With a `scheduler`, jobs are taken in the order of
+    `scheduler.key(payload, seconds_waited)` instead (ties stay FIFO); keys
+    are `(tier, tiebreak)` pairs, and only jobs in the same tier as the
+    next one may be reordered for a worker's preference.
+    """
+
+    def __init__(self, max_size: int = 16, scheduler=None):
+        self.max_size = max_size
+        self.scheduler = scheduler
+        self._items = deque()
+        self._enqueued = {}
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+    def put(self, job_id: str, payload: Any, force: bool = False) -> int:
+        """Append a job and return its 1-based position in the queue
+
+        `force` skips the size bound, for jobs that were already admitted
+        once, like a preempted render going back in line.
+        """
+        with self._cond:
+            if len(self._items) >= self.max_size and not force:
+                raise QueueFull(f"Job queue is full ({self.max_size} jobs waiting)")
+            self._items.append((job_id, payload))
+            self._enqueued[job_id] = time.monotonic()
+            self._cond.notify()
+            return self._position_locked(job_id)
+
+    def discard(self, job_id: str) -> bool:
+        """Remove a waiting job; False if it isn't queued"""
+        with self._cond:
+            for item in self._items:
+                if item[0] == job_id:
+                    self._remove(item)
+                    return True
+        return False
+
+    def get(self, timeout: Optional[float] = None) -> Optional[tuple]:
+        """Pop the oldest job, waiting up to `timeout` seconds for one to arrive"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout=timeout):
+                return None
+            item = self._ordered()[0]
+            self._remove(item)
+            return item
+
+    def get_batch(
+        self,
+        key: Callable[[Any], Hashable],
+        max_size: int,
+        window: float,
+        timeout: Optional[float] = None,
+        prefer: Optional[Callable[[Any], bool]] = None,
+        accept: Optional[Callable[[Any], bool]] = None,
+    ) -> list:
+        """Pop the oldest job plus up to `max_size - 1` queued jobs sharing its key
+
+        After the first job arrives, waits up to `window` seconds for more
+        matching jobs so bursts of same-shape requests can run as one batch.
+        Jobs `accept` rejects are left for other workers; among the oldest
+        PREFER_WINDOW acceptable jobs, one that `prefer` likes goes first.
+        """
+        with self._cond:
+            if not self._cond.wait_for(
+                lambda: self._pick(prefer, accept) is not None, timeout=timeout
+            ):
+                return []
+            first = self._pick(prefer, accept)
+            self._remove(first)
+            batch_key = key(first[1])
+            batch = [first]
+            deadline = time.monotonic() + window
+            while len(batch) < max_size:
+                for item in self._ordered():
+                    if len(batch) >= max_size:
+                        break
+                    if key(item[1]) == batch_key and (accept is None or accept(item[1])):
+                        self._remove(item)
+                        batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= max_size or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return batch
+
+    def _pick(self, prefer, accept) -> Optional[tuple]:
+        candidates = [item for item in self._ordered() if accept is None or accept(item[1])]
+        if not candidates:
+            return None
+        if prefer is not None:
+            head_tier = self._key(candidates[0])[0] if self.scheduler else None
+            for item in candidates[:PREFER_WINDOW]:
+                if self.scheduler and self._key(item)[0] != head_tier:
+                    break
+                if prefer(item[1]):
+                    return item
+        return candidates[0]
+
+    def _key(self, item: tuple, now: Optional[float] = None) -> tuple:
+        waited = time.monotonic() - self._enqueued.get(item[0], time.monotonic())
+        return self.scheduler.key(item[1], waited, now)
+
+    def _ordered(self) -> list:
+        if self.scheduler is None:
+            return list(self._items)
+        # One clock for the whole sort, so decaying usage can't swap a client's jobs
+        now = time.time()
+        return sorted(self._items, key=lambda item: self._key(item, now))
+
+    def _remove(self, item: tuple):
+        self._items.remove(item)
+        self._enqueued.pop(item[0], None)
+
+    def _position_locked(self, job_id: str) -> Optional[int]:
+        for i, (queued_id, _) in enumerate(self._ordered()):
+            if queued_id == job_id:
+                return i + 1
+        return None
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based position of a waiting job, or None if it is not queued"""
+        with self._cond:
+            return self._position_locked(job_id)
+
+    def rank_of(self, payload: Any) -> int:
+        """1-based position a new job with `payload` would get if submitted now"""
+        with self._cond:
+            if self.scheduler is None:
+                return len(self._items) + 1
+            now = time.time()
+            key = self.scheduler.key(payload, 0.0, now)
+            # Stable sort puts a new job after existing ties
+            return sum(1 for item in self._items if self._key(item, now) <= key) + 1
+
+
+class GenerationWorker:
+    """Runs batches of jobs on a background thread
+
+    The handler is called as `handler([(job_id, payload), ...])` on the worker
+    thread, so blocking GPU work never runs on the server's event loop. Jobs whose
+    payloads share a `batch_key` are grouped into the same call, up to
+    `max_batch_size` jobs collected within `batch_window` seconds.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[list], None],
+        max_queue_size: int = 16,
+        batch_key: Optional[Callable[[Any], Hashable]] = None,
+        max_batch_size: int = 1,
+        batch_window: float = 0.0,
+        scheduler=None,
+    ):
+        self.handler = handler
+        self.queue = JobQueue(max_queue_size, scheduler)
+        self.batch_key = batch_key or id
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.current_jobs: list = []
+        self._current_started: Optional[float] = None
+        self._durations = deque(maxlen=20)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the worker thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="generation-worker", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """Ask the worker to exit once the current job finishes"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, job_id: str, payload: Any) -> int:
+        """Queue a job, raising QueueFull when there is no room"""
+        return self.queue.put(job_id, payload)
+
+    def position(self, job_id: str) -> Optional[int]:
+        """0 while the job is running, 1+ while waiting, None otherwise"""
+        if job_id in self.current_jobs:
+            return 0
+        return self.queue.position(job_id)
+
+    @property
+    def average_duration(self) -> float:
+        """Mean wall time of recent batches (60s until one has finished)"""
+        if not self._durations:
+            return 60.0
+        return sum(self._durations) / len(self._durations)
+
+    def estimated_wait(self, position: int) -> float:
+        """Rough seconds until a job at `position` starts running"""
+        wait = position * self.average_duration
+        if self._current_started is not None:
+            elapsed = time.monotonic() - self._current_started
+            wait -= min(elapsed, self.average_duration)
+        return max(wait, 0.0)
+
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait before retrying"""
+        return max(1, int(self.average_duration))
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self.queue.get_batch(
+                self.batch_key, self.max_batch_size, self.batch_window, timeout=0.5
+            )
+            if not batch:
+                continue
+            self.current_jobs = [job_id for job_id, _ in batch]
+            self._current_started = time.monotonic()
+            try:
+                self.handler(batch)
+            except Exception as e:
+                print(f"Worker: batch {self.current_jobs} raised {e}")
+            finally:
+                self._durations.append(time.monotonic() - self._current_started)
+                self.current_jobs = []
+                self._current_started = None
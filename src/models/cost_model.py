@@ -0,0 +1,397 @@
+"""Predicted peak VRAM and runtime of a render, refined by measured history"""
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Optional
+
+from src.models.registry import ModelVariant, total_vram_gb
+
+DEFAULT_COST_DB_PATH = Path(__file__).parent.parent.parent / "cache" / "cost_model.sqlite"
+
+# Observations per model used to correct the static prior
+HISTORY_WINDOW = 50
+
+# Smallest clip the downgrade policy will shrink a request to
+MIN_DOWNGRADE_FRAMES = 25
+
+# How long a recorded OOM refuses shapes at least as large; after that they are
+# judged by the corrected formula again, so one transient OOM isn't permanent
+OOM_EVIDENCE_SECONDS = 6 * 3600
+
+
+@dataclass(frozen=True)
+class CostPrior:
+    """Static cost formula of one variant
+
+    Peak VRAM is `base_gb` (weights and workspace that stay resident during
+    denoising) plus `gb_per_ktoken` per thousand latent tokens per video in the
+    batch. Runtime is `base_seconds` plus `seconds_per_ktoken_step` per
+    thousand latent tokens per denoising step.
+    """
+
+    base_gb: float
+    gb_per_ktoken: float
+    base_seconds: float
+    seconds_per_ktoken_step: float
+
+
+# Calibrated on docs/LTX2-EXPERIMENTS.md (RTX 4090, 24 GB): 512x768x217 and
+# 704x1280x97 fit, 512x768x241 OOMs; 512x768 renders take ~25s at 121 frames
+# and ~30s at 217 frames with 8 steps.
+DEFAULT_PRIORS = {
+    "ltx-2-19b-distilled-fp8": CostPrior(6.0, 1.55, 18.0, 0.14),
+    "ltx-2-19b-dev": CostPrior(12.0, 1.55, 30.0, 0.14),
+    "fake": CostPrior(0.0, 0.0, 0.0, 0.0),
+}
+
+
+def latent_tokens(width: int, height: int, num_frames: int) -> int:
+    """Latent positions the transformer attends over
+
+    The LTX VAE compresses 32x spatially and 8x temporally (plus the first frame).
+    """
+    return (width // 32) * (height // 32) * ((num_frames - 1) // 8 + 1)
+
+
+def is_out_of_memory(error: BaseException) -> bool:
+    return type(error).__name__ == "OutOfMemoryError" or "out of memory" in str(error).lower()
+
+
+@dataclass(frozen=True)
+class CostEstimate:
+    model: str
+    width: int
+    height: int
+    num_frames: int
+    num_inference_steps: int
+    batch_size: int
+    tokens: int
+    vram_gb: float
+    seconds: float
+    capacity_gb: float
+    fits: bool
+    source: str  # prior, history, observed-fit, observed-oom or no-device
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["vram_gb"] = round(self.vram_gb, 2)
+        data["seconds"] = round(self.seconds, 1)
+        return data
+
+
+@dataclass(frozen=True)
+class Admission:
+    """What to do with a request: accept, reroute, downgrade or reject"""
+
+    action: str
+    estimate: CostEstimate
+    reason: str = ""
+
+    @property
+    def admitted(self) -> bool:
+        return self.action != "reject"
+
+    def to_dict(self) -> dict:
+        return {"action": self.action, "reason": self.reason, "estimate": self.estimate.to_dict()}
+
+
+class CostModel:
+    """Static per-variant formula, corrected by observations stored in SQLite
+
+    Each finished render records its predicted and actual peak VRAM and
+    runtime. Predictions for a model are scaled by the largest recent
+    actual/predicted VRAM ratio (OOMs are costly, so err high) and the median
+    runtime ratio. Shapes at least as large as an OOM recorded on the same
+    device size in the last OOM_EVIDENCE_SECONDS are refused outright, and
+    shapes no larger than a recorded success are admitted. Newer evidence
+    wins: a success at or above an OOM's size clears it, and an OOM at or
+    below a success's size clears that.
+
+    `capacity_gb` defaults to the device's total memory; with no GPU it is 0
+    and every request is admitted.
+    """
+
+    def __init__(
+        self,
+        variants: dict,
+        path: str = None,
+        capacity_gb: float = None,
+        priors: dict = None,
+        device: str = "cuda",
+    ):
+        self.variants = dict(variants)
+        self.priors = {**DEFAULT_PRIORS, **(priors or {})}
+        self.device = device
+        self._capacity_gb = capacity_gb
+        self._lock = threading.Lock()
+
+        self.path = Path(path or DEFAULT_COST_DB_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS observations ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " model TEXT NOT NULL,"
+            " width INTEGER, height INTEGER, num_frames INTEGER, steps INTEGER,"
+            " batch_size INTEGER NOT NULL,"
+            " tokens INTEGER NOT NULL,"
+            " capacity_gb REAL NOT NULL,"
+            " prior_vram_gb REAL NOT NULL,"
+            " prior_seconds REAL NOT NULL,"
+            " predicted_vram_gb REAL,"
+            " predicted_seconds REAL,"
+            " actual_vram_gb REAL,"
+            " actual_seconds REAL,"
+            " oom INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS observations_model ON observations (model, created_at)"
+        )
+        self._db.commit()
+
+    @property
+    def capacity_gb(self) -> float:
+        # Resolved lazily so constructing a cost model doesn't import torch
+        if self._capacity_gb is None:
+            self._capacity_gb = total_vram_gb(self.device)
+        return self._capacity_gb
+
+    def prior(self, model: str) -> CostPrior:
+        if model in self.priors:
+            return self.priors[model]
+        variant: Optional[ModelVariant] = self.variants.get(model)
+        base_gb = variant.vram_gb if variant is not None else 0.0
+        return CostPrior(base_gb, 1.55, 30.0, 0.14)
+
+    def estimate(
+        self,
+        model: str,
+        width: int,
+        height: int,
+        num_frames: int,
+        num_inference_steps: int,
+        batch_size: int = 1,
+    ) -> CostEstimate:
+        tokens = latent_tokens(width, height, num_frames)
+        prior_vram, prior_seconds = self._prior_cost(model, tokens, num_inference_steps, batch_size)
+        vram_ratio, seconds_ratio = self._corrections(model)
+        estimate = CostEstimate(
+            model=model,
+            width=width,
+            height=height,
+            num_frames=num_frames,
+            num_inference_steps=num_inference_steps,
+            batch_size=batch_size,
+            tokens=tokens,
+            vram_gb=prior_vram * vram_ratio,
+            seconds=prior_seconds * seconds_ratio,
+            capacity_gb=self.capacity_gb,
+            fits=True,
+            source="history" if (vram_ratio, seconds_ratio) != (1.0, 1.0) else "prior",
+        )
+
+        if self.capacity_gb <= 0:
+            return replace(estimate, source="no-device")
+
+        batch_tokens = tokens * batch_size
+        smallest_oom, largest_fit = self._evidence(model)
+        if smallest_oom is not None and batch_tokens >= smallest_oom:
+            return replace(estimate, fits=False, source="observed-oom")
+        if largest_fit is not None and batch_tokens <= largest_fit:
+            return replace(estimate, fits=True, source="observed-fit")
+        return replace(estimate, fits=estimate.vram_gb <= self.capacity_gb)
+
+    def admit(
+        self,
+        model: str,
+        width: int,
+        height: int,
+        num_frames: int,
+        num_inference_steps: int,
+        policy: tuple = (),
+        candidates: tuple = (),
+    ) -> Admission:
+        """Decide how to run a request that may not fit on the device
+
+        `policy` lists the fallbacks to try in order: "reroute" switches to the
+        cheapest of `candidates` that fits, "downgrade" shortens the clip (in
+        steps of 8 frames) until it fits. With no fallback that works, the
+        request is rejected.
+        """
+        estimate = self.estimate(model, width, height, num_frames, num_inference_steps)
+        if estimate.fits:
+            return Admission("accept", estimate)
+
+        reason = (
+            f"{width}x{height}x{num_frames} on {model} needs ~{estimate.vram_gb:.1f} GB, "
+            f"device has {estimate.capacity_gb:.1f} GB ({estimate.source})"
+        )
+        for fallback in policy:
+            if fallback == "reroute":
+                options = [
+                    self.estimate(name, width, height, num_frames, num_inference_steps)
+                    for name in candidates
+                    if name != model
+                ]
+                options = [o for o in options if o.fits]
+                if options:
+                    best = min(options, key=lambda o: o.vram_gb)
+                    return Admission("reroute", best, f"{reason}; rerouted to {best.model}")
+            elif fallback == "downgrade":
+                frames = num_frames - 8
+                while frames >= MIN_DOWNGRADE_FRAMES:
+                    smaller = self.estimate(model, width, height, frames, num_inference_steps)
+                    if smaller.fits:
+                        return Admission(
+                            "downgrade", smaller, f"{reason}; shortened to {frames} frames"
+                        )
+                    frames -= 8
+        return Admission("reject", estimate, reason)
+
+    def max_batch_size(self, estimate: CostEstimate, limit: int) -> int:
+        """Largest batch of `estimate`'s shape (at most `limit`) predicted to fit"""
+        size = limit
+        while size > 1:
+            batched = self.estimate(
+                estimate.model,
+                estimate.width,
+                estimate.height,
+                estimate.num_frames,
+                estimate.num_inference_steps,
+                batch_size=size,
+            )
+            if batched.fits:
+                return size
+            size -= 1
+        return 1
+
+    def record(
+        self,
+        estimate: CostEstimate,
+        actual_vram_gb: float = None,
+        actual_seconds: float = None,
+        oom: bool = False,
+    ):
+        """Store what a render actually cost next to what was predicted"""
+        prior_vram, prior_seconds = self._prior_cost(
+            estimate.model, estimate.tokens, estimate.num_inference_steps, estimate.batch_size
+        )
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO observations (model, width, height, num_frames, steps, batch_size,"
+                " tokens, capacity_gb, prior_vram_gb, prior_seconds, predicted_vram_gb,"
+                " predicted_seconds, actual_vram_gb, actual_seconds, oom, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    estimate.model,
+                    estimate.width,
+                    estimate.height,
+                    estimate.num_frames,
+                    estimate.num_inference_steps,
+                    estimate.batch_size,
+                    estimate.tokens,
+                    self.capacity_gb,
+                    prior_vram,
+                    prior_seconds,
+                    estimate.vram_gb,
+                    estimate.seconds,
+                    actual_vram_gb,
+                    actual_seconds,
+                    int(oom),
+                    time.time(),
+                ),
+            )
+            self._db.commit()
+
+    def history(self, model: str = None, limit: int = 100) -> list:
+        """Recent observations, newest first, for checking predictions against reality"""
+        query = "SELECT * FROM observations"
+        params = []
+        if model is not None:
+            query += " WHERE model = ?"
+            params.append(model)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            cursor = self._db.execute(query, params)
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT model, COUNT(*), SUM(oom) FROM observations GROUP BY model"
+            ).fetchall()
+        models = {}
+        for model, count, ooms in rows:
+            vram_ratio, seconds_ratio = self._corrections(model)
+            models[model] = {
+                "observations": count,
+                "ooms": ooms or 0,
+                "vram_correction": round(vram_ratio, 3),
+                "seconds_correction": round(seconds_ratio, 3),
+            }
+        return {"capacity_gb": self.capacity_gb, "models": models}
+
+    def _prior_cost(self, model: str, tokens: int, steps: int, batch_size: int) -> tuple:
+        prior = self.prior(model)
+        ktokens = tokens / 1000
+        vram = prior.base_gb + prior.gb_per_ktoken * ktokens * batch_size
+        seconds = prior.base_seconds + prior.seconds_per_ktoken_step * ktokens * steps * batch_size
+        return vram, seconds
+
+    def _corrections(self, model: str) -> tuple:
+        """(VRAM ratio, runtime ratio) of actual over prior cost in recent renders"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT prior_vram_gb, actual_vram_gb, prior_seconds, actual_seconds"
+                " FROM observations WHERE model = ? AND oom = 0 ORDER BY id DESC LIMIT ?",
+                (model, HISTORY_WINDOW),
+            ).fetchall()
+        vram_ratios = [a / p for p, a, _, _ in rows if a and p]
+        seconds_ratios = sorted(a / p for _, _, p, a in rows if a and p)
+        vram_ratio = max(vram_ratios) if vram_ratios else 1.0
+        seconds_ratio = seconds_ratios[len(seconds_ratios) // 2] if seconds_ratios else 1.0
+        return vram_ratio, seconds_ratio
+
+    def _evidence(self, model: str) -> tuple:
+        """(smallest batch tokens that OOMed, largest that fit) on this device size
+
+        Only observations no newer one contradicts count, and OOMs only for
+        OOM_EVIDENCE_SECONDS.
+        """
+        capacity = self.capacity_gb
+        cutoff = time.time() - OOM_EVIDENCE_SECONDS
+        with self._lock:
+            (smallest_oom,) = self._db.execute(
+                "SELECT MIN(o.tokens * o.batch_size) FROM observations o"
+                " WHERE o.model = ? AND ABS(o.capacity_gb - ?) < 0.5 AND o.oom = 1 AND o.created_at >= ?"
+                " AND NOT EXISTS (SELECT 1 FROM observations s"
+                "  WHERE s.model = o.model AND ABS(s.capacity_gb - o.capacity_gb) < 0.5 AND s.oom = 0"
+                "  AND s.id > o.id AND s.tokens * s.batch_size >= o.tokens * o.batch_size)",
+                (model, capacity, cutoff),
+            ).fetchone()
+            (largest_fit,) = self._db.execute(
+                "SELECT MAX(s.tokens * s.batch_size) FROM observations s"
+                " WHERE s.model = ? AND ABS(s.capacity_gb - ?) < 0.5 AND s.oom = 0"
+                " AND NOT EXISTS (SELECT 1 FROM observations o"
+                "  WHERE o.model = s.model AND ABS(o.capacity_gb - s.capacity_gb) < 0.5 AND o.oom = 1"
+                "  AND o.created_at >= ? AND o.id > s.id AND o.tokens * o.batch_size <= s.tokens * s.batch_size)",
+                (model, capacity, cutoff),
+            ).fetchone()
+        return smallest_oom, largest_fit
+
+
+def parse_policy(value: Optional[str]) -> tuple:
+    """"reroute,downgrade" -> ("reroute", "downgrade"); empty or "reject" -> ()"""
+    if not value:
+        return ()
+    steps = tuple(p.strip() for p in value.split(",") if p.strip())
+    unknown = set(steps) - {"reroute", "downgrade", "reject"}
+    if unknown:
+        raise ValueError(f"Unknown admission policy: {', '.join(sorted(unknown))}")
+    return tuple(p for p in steps if p != "reject")
@@ -0,0 +1,145 @@
+"""Persistent cache of text-encoder outputs"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_EMBEDDING_CACHE_DIR = Path(__file__).parent.parent.parent / "cache" / "embeddings"
+
+
+def tensor_bytes(tensors: dict) -> int:
+    return sum(t.numel() * t.element_size() for t in tensors.values())
+
+
+class EmbeddingCache:
+    """Text-encoder outputs keyed by text, encoder checkpoint and max length
+
+    Hot entries stay on the device in an LRU bounded by bytes, so a hit costs
+    nothing but a lookup. Every entry is also written to its own safetensors
+    file; those are memory-mapped back in on a device miss and evicted least
+    recently used once the directory grows past `max_disk_bytes`. File sizes
+    and recency are tracked in memory, seeded from the directory once, so a
+    write never rescans it.
+    Entries are dicts of tensors for one text, e.g. `embeds` and `mask`.
+    """
+
+    def __init__(
+        self,
+        path: str = None,
+        max_device_bytes: int = 1024**3,
+        max_disk_bytes: int = 20 * 1024**3,
+        device: str = "cuda",
+    ):
+        self.root = Path(path or DEFAULT_EMBEDDING_CACHE_DIR)
+        self.max_device_bytes = max_device_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.device = device
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._device = OrderedDict()
+        self._device_bytes = 0
+        self._disk = OrderedDict()  # key -> file size, least recently used first
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._scan_disk()
+
+    @staticmethod
+    def make_key(text: str, encoder_id: str, max_length: int) -> str:
+        payload = json.dumps({"text": text, "encoder": encoder_id, "max_length": max_length}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.safetensors"
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            if key in self._device:
+                self._device.move_to_end(key)
+                self.hits += 1
+                return self._device[key]
+
+        path = self.path_for(key)
+        try:
+            tensors = self._load(path)
+            os.utime(path)
+        except (FileNotFoundError, OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self._remember(key, tensors)
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            self.hits += 1
+            self.disk_hits += 1
+        return tensors
+
+    def put(self, key: str, tensors: dict):
+        from safetensors.torch import save_file
+
+        tensors = {name: t.detach().to(self.device) for name, t in tensors.items()}
+        with self._lock:
+            self._remember(key, tensors)
+
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        save_file({name: t.contiguous().cpu() for name, t in tensors.items()}, str(tmp))
+        os.replace(tmp, path)
+        size = path.stat().st_size
+        with self._lock:
+            self._disk_bytes += size - self._disk.pop(key, 0)
+            self._disk[key] = size
+            self._evict_disk()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "device_entries": len(self._device),
+                "device_bytes": self._device_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _load(self, path: Path) -> dict:
+        from safetensors import safe_open
+
+        # safe_open maps the file; only the slices read are paged in
+        with safe_open(str(path), framework="pt", device=str(self.device)) as f:
+            return {name: f.get_tensor(name) for name in f.keys()}
+
+    def _remember(self, key: str, tensors: dict):
+        if key in self._device:
+            self._device_bytes -= tensor_bytes(self._device.pop(key))
+        self._device[key] = tensors
+        self._device_bytes += tensor_bytes(tensors)
+        while self._device_bytes > self.max_device_bytes and len(self._device) > 1:
+            _, evicted = self._device.popitem(last=False)
+            self._device_bytes -= tensor_bytes(evicted)
+
+    def _scan_disk(self):
+        files = []
+        for path in self.root.glob("*/*.safetensors"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path.stem))
+        for _, size, key in sorted(files):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+            key, size = self._disk.popitem(last=False)
+            self.path_for(key).unlink(missing_ok=True)
+            self._disk_bytes -= size
@@ -0,0 +1,175 @@
+"""CPU stand-in for the video pipeline, for benchmarks and GPU-less tests"""
+import hashlib
+import time
+
+
+class FakeVAE:
+    """Decodes fake latents, which are already frames, so decode time is measurable"""
+
+    def decode(self, latents, temb=None, return_dict: bool = True):
+        return latents if return_dict else (latents,)
+
+
+class FakeUpscaler:
+    """2x nearest-neighbour stand-in for the latent upscaler, on fake (frame) latents"""
+
+    def to(self, device):
+        return self
+
+    def __call__(self, latents):
+        return latents.repeat(2, axis=2).repeat(2, axis=3)
+
+
+class FakeScheduler:
+    """Holds the timesteps of the current call, like a diffusers scheduler"""
+
+    def __init__(self):
+        self.timesteps = []
+
+
+class FakePipelineOutput:
+    def __init__(self, frames):
+        self.frames = frames
+
+
+class FakePipeline:
+    """Mimics the diffusers LTX pipeline call signature with deterministic frames
+
+    Each frame depends only on the prompt, the seed and the frame index, so
+    outputs are reproducible across runs and machines. `step_seconds` sleeps
+    once per denoising step to model GPU compute time; leave it at 0 to measure
+    only the wrapper's own overhead (frame packing, encode, queueing, caching).
+    """
+
+    def __init__(self, step_seconds: float = 0.0):
+        self.step_seconds = step_seconds
+        self.vae = FakeVAE()
+        self.scheduler = FakeScheduler()
+        self.device = "cpu"
+
+    def to(self, device):
+        self.device = device
+        return self
+
+    def encode_prompt(
+        self,
+        prompt,
+        negative_prompt=None,
+        do_classifier_free_guidance: bool = True,
+        num_videos_per_prompt: int = 1,
+        max_sequence_length: int = 128,
+        device=None,
+        **kwargs,
+    ):
+        """Deterministic stand-in embeddings, (B, max_sequence_length, 8), plus masks"""
+        import numpy as np
+        import torch
+
+        def encode(texts):
+            rows = [
+                np.frombuffer(hashlib.sha256(text.encode("utf-8")).digest()[:8], dtype=np.uint8)
+                for text in texts
+            ]
+            embeds = torch.tensor(np.stack(rows), dtype=torch.float32) / 255.0
+            embeds = embeds[:, None, :].repeat(1, max_sequence_length, 1)
+            return embeds, torch.ones(len(texts), max_sequence_length, dtype=torch.int64)
+
+        prompts = [prompt] if isinstance(prompt, str) else list(prompt)
+        embeds, mask = encode(prompts)
+        negative_embeds = negative_mask = None
+        if do_classifier_free_guidance:
+            negatives = negative_prompt or [""] * len(prompts)
+            negative_embeds, negative_mask = encode([negatives] if isinstance(negatives, str) else negatives)
+        return embeds, mask, negative_embeds, negative_mask
+
+    def __call__(
+        self,
+        prompt=None,
+        negative_prompt=None,
+        width: int = 704,
+        height: int = 480,
+        num_frames: int = 65,
+        num_inference_steps: int = 30,
+        guidance_scale: float = 7.5,
+        generator=None,
+        output_type: str = "pil",
+        conditions=None,
+        latents=None,
+        timesteps=None,
+        callback_on_step_end=None,
+        callback_on_step_end_tensor_inputs=None,
+        **kwargs,
+    ):
+        import numpy as np
+
+        if prompt is None:
+            # Embeddings are a pure function of the text, so they stand in for it
+            prompt = [self._embeds_text(row) for row in kwargs["prompt_embeds"]]
+        prompts = [prompt] if isinstance(prompt, str) else list(prompt)
+        generators = generator if isinstance(generator, list) else [generator] * len(prompts)
+
+        frames = np.stack([
+            self._frames(p, self._seed(g), width, height, num_frames)
+            for p, g in zip(prompts, generators)
+        ])
+
+        # (B, C, F, H, W) at the LTX latent resolution, fading in from noise.
+        # Given `timesteps` (and `latents`), only the remaining steps run.
+        clean = frames[:, ::8, ::32, ::32, :].transpose(0, 4, 1, 2, 3)
+        noise = np.random.default_rng(0).standard_normal(clean.shape).astype(np.float32)
+        if timesteps is None:
+            timesteps = [float(num_inference_steps - i) for i in range(num_inference_steps)]
+        self.scheduler.timesteps = list(timesteps)
+        done = num_inference_steps - len(timesteps)
+        for step, timestep in enumerate(timesteps):
+            if self.step_seconds:
+                time.sleep(self.step_seconds)
+            if callback_on_step_end is not None:
+                alpha = (done + step + 1) / num_inference_steps
+                callback_on_step_end(
+                    self, step, timestep, {"latents": alpha * clean + (1 - alpha) * noise}
+                )
+        for condition in conditions or []:
+            # Continue from the conditioning clip, like LTXVideoCondition at frame_index
+            video = np.stack([np.asarray(frame, dtype=np.float32) / 255.0 for frame in condition.video])
+            start = condition.frame_index
+            frames[:, start:start + len(video)] = video[: num_frames - start]
+        if output_type == "latent":
+            return FakePipelineOutput(frames)
+        frames = self.vae.decode(frames, return_dict=False)[0]
+
+        if output_type == "np":
+            return FakePipelineOutput(frames)
+
+        from PIL import Image
+
+        return FakePipelineOutput([
+            [Image.fromarray((frame * 255).astype(np.uint8)) for frame in video]
+            for video in frames
+        ])
+
+    @staticmethod
+    def _embeds_text(embeds) -> str:
+        return hashlib.sha256(embeds.cpu().numpy().tobytes()).hexdigest()
+
+    @staticmethod
+    def _seed(generator) -> int:
+        if generator is None:
+            return 0
+        if isinstance(generator, int):
+            return generator
+        return generator.initial_seed()
+
+    @staticmethod
+    def _frames(prompt: str, seed: int, width: int, height: int, num_frames: int):
+        """Smooth moving color gradient, (T, H, W, 3) float32 in [0, 1]"""
+        import numpy as np
+
+        digest = hashlib.sha256(f"{prompt}|{seed}".encode("utf-8")).digest()
+        base = np.frombuffer(digest[:3], dtype=np.uint8).astype(np.float32) / 255.0
+        t = np.arange(num_frames, dtype=np.float32)[:, None, None, None]
+        y = np.linspace(0, 1, height, dtype=np.float32)[None, :, None, None]
+        x = np.linspace(0, 1, width, dtype=np.float32)[None, None, :, None]
+        phase = np.arange(3, dtype=np.float32)[None, None, None, :] * 2.1
+        wave = np.sin(6.2832 * (x + 0.5 * y) + 0.2 * t + phase)
+        return np.clip(0.75 * base + 0.25 * (wave + 1.0) / 2.0, 0.0, 1.0).astype(np.float32)
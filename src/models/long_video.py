@@ -0,0 +1,99 @@
+"""Planning and stitching of long videos rendered as overlapping segments"""
+from typing import Optional
+
+
+def round_up_frames(num_frames: int) -> int:
+    """Smallest valid LTX frame count (8n + 1) that is at least `num_frames`"""
+    return max(1, (num_frames - 1 + 7) // 8 * 8 + 1)
+
+
+def plan_segments(total_frames: int, segment_frames: int, overlap_frames: int) -> list:
+    """Frame count of each segment needed to cover `total_frames`
+
+    Every segment after the first repeats the previous segment's last
+    `overlap_frames` frames, so it contributes `segment_frames - overlap_frames`
+    new ones. All counts are valid LTX lengths; the last segment is only as
+    long as needed, and the stitcher drops anything past `total_frames`.
+    """
+    if (segment_frames - 1) % 8 != 0 or (overlap_frames - 1) % 8 != 0:
+        raise ValueError(
+            f"segment_frames ({segment_frames}) and overlap_frames ({overlap_frames}) "
+            "must both be (8 × n) + 1"
+        )
+    if not 0 < overlap_frames < segment_frames:
+        raise ValueError("overlap_frames must be positive and shorter than segment_frames")
+
+    if total_frames <= segment_frames:
+        return [round_up_frames(total_frames)]
+
+    segments = [segment_frames]
+    covered = segment_frames
+    stride = segment_frames - overlap_frames
+    while covered < total_frames:
+        new_frames = min(stride, total_frames - covered)
+        segments.append(round_up_frames(overlap_frames + new_frames))
+        covered += new_frames
+    return segments
+
+
+def fit_overlap(segment_frames: int, overlap_frames: int) -> int:
+    """`overlap_frames`, shortened if a shortened segment would no longer leave 8 new frames"""
+    return min(overlap_frames, segment_frames - 8)
+
+
+class OverlapStitcher:
+    """Streams segments to a video writer, crossfading where they overlap
+
+    Each segment's last `overlap_frames` frames are held back until the next
+    segment arrives, then linearly blended with that segment's first frames,
+    which were rendered conditioned on them when the pipeline supports it. Only one segment and one tail
+    are ever in memory, so host RAM is bounded by the segment length.
+    """
+
+    def __init__(self, writer, overlap_frames: int, total_frames: int):
+        self.writer = writer
+        self.overlap_frames = overlap_frames
+        self.total_frames = total_frames
+        self.frames_written = 0
+        self._tail = None
+
+    @property
+    def tail(self):
+        """The held-back frames the next segment should be conditioned on"""
+        return self._tail
+
+    def add(self, frames):
+        """Write a (T, H, W, 3) uint8 segment, holding back its tail"""
+        import numpy as np
+
+        start = 0
+        if self._tail is not None:
+            overlap = min(len(self._tail), len(frames))
+            for k in range(overlap):
+                w = (k + 1) / (overlap + 1)
+                blended = (1 - w) * self._tail[k].astype(np.float32) + w * frames[k]
+                self._write(np.clip(blended + 0.5, 0, 255).astype(np.uint8))
+            start = overlap
+
+        body_end = max(start, len(frames) - self.overlap_frames)
+        for frame in frames[start:body_end]:
+            self._write(frame)
+        self._tail = np.array(frames[body_end:], copy=True)
+
+    def finish(self) -> int:
+        """Flush the last tail; returns the number of frames written"""
+        if self._tail is not None:
+            for frame in self._tail:
+                self._write(frame)
+            self._tail = None
+        return self.frames_written
+
+    def _write(self, frame):
+        if self.frames_written < self.total_frames:
+            self.writer.write(frame)
+            self.frames_written += 1
+
+
+def segment_seed(seed: Optional[int], index: int) -> Optional[int]:
+    """Distinct but reproducible seed for each segment"""
+    return None if seed is None else seed + index
@@ -1,7 +1,13 @@
 """LTX-2 Video model wrapper with prompt enhancement"""
 import sys
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
+
+from src.models.registry import ModelRegistry, ModelVariant
+from src.models.staging import default_stager
+from src.models.timing import StageTimer, maybe_stage, timed_calls
+from src.models.video import FrameBuffer, GeneratedVideo, StreamingVideoWriter
 
 # Add LTX-2 packages to path when running on RunPod
 LTX_PATH = Path(__file__).parent.parent.parent / "models" / "LTX-2"
@@ -13,6 +19,30 @@ if LTX_PATH.exists():
 DEFAULT_MODEL_PATH = Path(__file__).parent.parent.parent / "models" / "ltx-2-19b-dev.safetensors"
 DEFAULT_GEMMA_PATH = Path(__file__).parent.parent.parent / "models" / "gemma"
 DEFAULT_UPSCALER_PATH = Path(__file__).parent.parent.parent / "models" / "ltx-2-spatial-upscaler-x2-1.0.safetensors"
+DISTILLED_MODEL_PATH = Path(__file__).parent.parent.parent / "models" / "ltx-2-19b-distilled-fp8.safetensors"
+
+# Latent upscaler `upscale=True` renders use (the fake model gets a fake one)
+UPSCALER_MODEL = "ltx-2-spatial-upscaler-x2"
+
+# Named model variants that requests and presets can select
+DEFAULT_MODEL = "ltx-2-19b-dev"
+MODEL_VARIANTS = {
+    "ltx-2-19b-dev": ModelVariant(
+        "ltx-2-19b-dev", str(DEFAULT_MODEL_PATH), vram_gb=43.0
+    ),
+    "ltx-2-19b-distilled-fp8": ModelVariant(
+        "ltx-2-19b-distilled-fp8", str(DISTILLED_MODEL_PATH), vram_gb=27.0, precision="fp8"
+    ),
+    "ltx-2-spatial-upscaler-x2": ModelVariant(
+        "ltx-2-spatial-upscaler-x2", str(DEFAULT_UPSCALER_PATH), vram_gb=1.0, kind="upscaler"
+    ),
+    # Deterministic CPU stand-ins (src/models/fake.py) for benchmarks and tests
+    "fake": ModelVariant("fake", "fake", vram_gb=0.0, kind="fake"),
+    "fake-upscaler": ModelVariant("fake-upscaler", "fake", vram_gb=0.0, kind="upscaler"),
+}
+
+# Variant kinds that can render a video from a prompt
+GENERATION_KINDS = ("t2vid", "fake")
 
 # Default negative prompt for kids content
 DEFAULT_NEGATIVE_PROMPT = (
@@ -28,31 +58,213 @@ soft key light 45 degrees, cinematic color grading,
 avoid high-frequency patterns, smooth textures, vibrant colors."""
 
 
+def offset_progress(progress: Optional[Callable], offset: int, total: int) -> Optional[Callable]:
+    """Report a sub-call's steps as part of a longer run of `total` steps"""
+    if progress is None:
+        return None
+    return lambda step, _, latents=None: progress(offset + step, total, latents)
+
+
+class RenderCancelled(Exception):
+    """Raised out of a render interrupted at a step boundary
+
+    `preempt` is True when the render was paused to make room for other work
+    rather than cancelled; its checkpoints, if it was given paths for them,
+    are on disk by the time this is raised.
+    """
+
+    def __init__(self, preempt: bool = False):
+        super().__init__("Render preempted" if preempt else "Render cancelled")
+        self.preempt = preempt
+
+
+def check_stop(should_stop: Optional[Callable]):
+    """Raise RenderCancelled if `should_stop` asks for it"""
+    mode = should_stop() if should_stop is not None else None
+    if mode is not None:
+        raise RenderCancelled(preempt=mode == "preempt")
+
+
+@dataclass
+class LatentBatch:
+    """Denoised latents of a batch, on their way to the upscaler and VAE decoder
+
+    `width` and `height` are the pixel size the latents decode to. `model` is
+    the variant that denoised them, whose VAE decodes them; it stays pinned
+    in the registry until `release_latents`.
+    """
+
+    latents: object
+    width: int
+    height: int
+    num_frames: int
+    model: Optional[str] = None
+    pinned: bool = False
+
+
+class StopSignal:
+    """A render's `should_stop`, set from another thread to stop it at its next step
+
+    `interrupt("cancel")` abandons the render; `interrupt("preempt")` has it
+    checkpoint its latents first, where it was given paths for them.
+    """
+
+    def __init__(self):
+        self.mode = None
+
+    def interrupt(self, mode: str = "cancel"):
+        self.mode = mode
+
+    def __call__(self) -> Optional[str]:
+        return self.mode
+
+
+def load_pipeline(variant: ModelVariant, device: str = "cuda", profile: StageTimer = None):
+    """Build the generation pipeline for a model variant
+
+    With a `profile`, records `ltx.import`, `ltx.weights` and `ltx.to_device`.
+    The official pipeline reads and places weights in one call, so its
+    device transfer is included in `ltx.weights`.
+    """
+    if variant.kind == "upscaler":
+        return load_upscaler(variant, device, profile)
+    if variant.kind == "fake":
+        import os
+
+        from src.models.fake import FakePipeline
+
+        # MAGIMA_FAKE_STEP_SECONDS models GPU time per step, e.g. to exercise cancellation
+        return FakePipeline(step_seconds=float(os.environ.get("MAGIMA_FAKE_STEP_SECONDS", "0"))).to(device)
+    if variant.kind not in GENERATION_KINDS:
+        raise ValueError(f"{variant.name} is a {variant.kind} model, not a text-to-video model")
+
+    # Load LTX-2 pipeline using official ltx-pipelines
+    print(f"Loading LTX-2 from {variant.checkpoint_path}...")
+
+    try:
+        with maybe_stage(profile, "ltx.import"):
+            from ltx_pipelines.t2vid import T2VidPipeline
+
+        with maybe_stage(profile, "ltx.weights"):
+            pipeline = T2VidPipeline(
+                checkpoint_path=str(variant.checkpoint_path),
+                precision=variant.precision,
+            )
+        print("LTX-2 loaded with official pipeline!")
+    except ImportError as e:
+        print(f"Warning: Could not load ltx_pipelines: {e}")
+        print("Falling back to diffusers...")
+        # Fallback to diffusers (may not work with safetensors directly)
+        with maybe_stage(profile, "ltx.import"):
+            import torch
+            from diffusers import DiffusionPipeline
+        with maybe_stage(profile, "ltx.weights"):
+            pipeline = DiffusionPipeline.from_pretrained(
+                "Lightricks/LTX-Video",
+                torch_dtype=torch.bfloat16,
+            )
+        with maybe_stage(profile, "ltx.to_device"):
+            pipeline = pipeline.to(device)
+
+    return pipeline
+
+
+def load_upscaler(variant: ModelVariant, device: str = "cuda", profile: StageTimer = None):
+    """Load the 2x spatial latent upscaler"""
+    if variant.checkpoint_path == "fake":
+        from src.models.fake import FakeUpscaler
+
+        return FakeUpscaler()
+
+    print(f"Loading latent upscaler from {variant.checkpoint_path}...")
+    with maybe_stage(profile, "upscaler.import"):
+        import torch
+        from diffusers.pipelines.ltx.modeling_latent_upsampler import LTXLatentUpsamplerModel
+    with maybe_stage(profile, "upscaler.weights"):
+        path = Path(variant.checkpoint_path)
+        if path.is_dir():
+            upscaler = LTXLatentUpsamplerModel.from_pretrained(str(path), torch_dtype=torch.bfloat16)
+        else:
+            upscaler = LTXLatentUpsamplerModel.from_single_file(str(path), torch_dtype=torch.bfloat16)
+    return upscaler.to(device)
+
+
 class PromptEnhancer:
-    """Enhance prompts using Gemma model"""
+    """Enhance prompts using Gemma model
+
+    Enhanced prompts are memoized in `cache` (a PromptCache) keyed on the prompt
+    text as passed in, which already includes the film template when one is used,
+    plus the model path and sampling params. With `deterministic=True` Gemma
+    decodes greedily, so a cached result matches what a fresh run would produce.
+
+    The system prompt is prefilled once at load and its KV cache is copied into
+    every `generate` call, so each request only prefills its own few tokens.
+    `enhance_many` batches prompts into one call: the shared prefix comes
+    first, then each prompt left-padded to the longest, so the cached prefix
+    sits at the same positions in every row and the new tokens line up at
+    the end.
+    """
+
+    MAX_NEW_TOKENS = 256
+    TEMPERATURE = 0.7
+    # Prompts per `generate` call in `enhance_many`
+    MAX_BATCH_SIZE = 8
 
-    def __init__(self, model_path: str = None):
+    SYSTEM_PROMPT = """You are a professional cinematographer. Expand the following video prompt
+into a detailed film-direction style description. Include:
+- Visual style (3D animated, Pixar quality, etc.)
+- Camera details (lens, depth of field)
+- Lighting (soft key light, etc.)
+- Motion description
+- Color palette
+Keep it concise but descriptive. Output only the enhanced prompt, nothing else."""
+
+    def __init__(
+        self,
+        model_path: str = None,
+        cache=None,
+        deterministic: bool = False,
+        weights_path: str = None,
+    ):
         self.model_path = model_path or str(DEFAULT_GEMMA_PATH)
+        # Where the weights are read from, e.g. a staged local copy; the cache keys on model_path
+        self.weights_path = weights_path or self.model_path
         self.model = None
         self.tokenizer = None
+        self.cache = cache
+        self.deterministic = deterministic
+        self._prefix_ids = None
+        self._prefix_cache = None
+
+    def load(self, profile: StageTimer = None):
+        """Load Gemma model for prompt enhancement
 
-    def load(self):
-        """Load Gemma model for prompt enhancement"""
+        With a `profile`, records `gemma.import`, `gemma.weights` and
+        `gemma.prefix`. The 4-bit checkpoint is quantized straight onto the
+        GPU by `device_map="auto"`, so weight read and device placement are a
+        single stage.
+        """
         try:
-            from transformers import AutoModelForCausalLM, AutoTokenizer
-            import torch
+            with maybe_stage(profile, "gemma.import"):
+                from transformers import AutoModelForCausalLM, AutoTokenizer
+                import torch
 
-            print(f"Loading Gemma from {self.model_path}...")
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
-            self.model = AutoModelForCausalLM.from_pretrained(
-                self.model_path,
-                torch_dtype=torch.bfloat16,
-                device_map="auto",
-            )
+            print(f"Loading Gemma from {self.weights_path}...")
+            with maybe_stage(profile, "gemma.weights"):
+                self.tokenizer = AutoTokenizer.from_pretrained(self.weights_path)
+                self.model = AutoModelForCausalLM.from_pretrained(
+                    self.weights_path,
+                    torch_dtype=torch.bfloat16,
+                    device_map="auto",
+                )
             print("Gemma loaded!")
         except Exception as e:
             print(f"Warning: Could not load Gemma for prompt enhancement: {e}")
             self.model = None
+            return self
+
+        with maybe_stage(profile, "gemma.prefix"):
+            self._prefill_prefix()
         return self
 
     def enhance(self, prompt: str) -> str:
@@ -60,33 +272,96 @@ class PromptEnhancer:
         if self.model is None:
             print("Gemma not loaded, using original prompt")
             return prompt
+        return self.enhance_many([prompt])[0]
 
-        system_prompt = """You are a professional cinematographer. Expand the following video prompt
-into a detailed film-direction style description. Include:
-- Visual style (3D animated, Pixar quality, etc.)
-- Camera details (lens, depth of field)
-- Lighting (soft key light, etc.)
-- Motion description
-- Color palette
-Keep it concise but descriptive. Output only the enhanced prompt, nothing else."""
+    def enhance_many(self, prompts: list) -> list:
+        """Enhance several prompts, generating the ones not in the cache in batched calls"""
+        if self.model is None:
+            print("Gemma not loaded, using original prompts")
+            return list(prompts)
 
-        full_prompt = f"{system_prompt}\n\nOriginal prompt: {prompt}\n\nEnhanced prompt:"
+        results = {}
+        keys = {}
+        for prompt in dict.fromkeys(prompts):
+            if self.cache is None:
+                continue
+            keys[prompt] = self.cache.make_key(prompt, self.model_path, **self.sampling_params())
+            cached = self.cache.get(keys[prompt])
+            if cached is not None:
+                print(f"Enhanced prompt (cached): {cached[:100]}...")
+                results[prompt] = cached
 
-        inputs = self.tokenizer(full_prompt, return_tensors="pt").to(self.model.device)
-        outputs = self.model.generate(
-            **inputs,
-            max_new_tokens=256,
-            temperature=0.7,
-            do_sample=True,
-        )
-        enhanced = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+        missing = [p for p in dict.fromkeys(prompts) if p not in results]
+        for i in range(0, len(missing), self.MAX_BATCH_SIZE):
+            chunk = missing[i:i + self.MAX_BATCH_SIZE]
+            for prompt, enhanced in zip(chunk, self._generate(chunk)):
+                if prompt in keys:
+                    self.cache.put(keys[prompt], enhanced)
+                print(f"Enhanced prompt: {enhanced[:100]}...")
+                results[prompt] = enhanced
+        return [results[p] for p in prompts]
+
+    def sampling_params(self) -> dict:
+        """Keyword arguments passed to `model.generate`"""
+        if self.deterministic:
+            return {"max_new_tokens": self.MAX_NEW_TOKENS, "do_sample": False}
+        return {
+            "max_new_tokens": self.MAX_NEW_TOKENS,
+            "temperature": self.TEMPERATURE,
+            "do_sample": True,
+        }
+
+    def _prefill_prefix(self):
+        """Run the system prompt through the model once and keep its KV cache"""
+        import torch
 
-        # Extract just the enhanced prompt part
-        if "Enhanced prompt:" in enhanced:
-            enhanced = enhanced.split("Enhanced prompt:")[-1].strip()
+        prefix = self.tokenizer(f"{self.SYSTEM_PROMPT}\n\nOriginal prompt:", return_tensors="pt")
+        self._prefix_ids = prefix.input_ids[0]
+        try:
+            with torch.no_grad():
+                output = self.model(**prefix.to(self.model.device), use_cache=True)
+            self._prefix_cache = output.past_key_values
+        except Exception as e:
+            # Still correct without it, just prefilling the system prompt every call
+            print(f"Warning: could not cache the prompt enhancer prefix: {e}")
+            self._prefix_cache = None
 
-        print(f"Enhanced prompt: {enhanced[:100]}...")
-        return enhanced
+    def _generate(self, prompts: list) -> list:
+        """One `generate` call for a batch of uncached prompts"""
+        import copy
+
+        import torch
+
+        tokenizer = self.tokenizer
+        pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+        suffixes = [
+            tokenizer(f" {prompt}\n\nEnhanced prompt:", add_special_tokens=False).input_ids
+            for prompt in prompts
+        ]
+        longest = max(len(ids) for ids in suffixes)
+        prefix = self._prefix_ids.tolist()
+        input_ids = torch.tensor([prefix + [pad_id] * (longest - len(ids)) + ids for ids in suffixes])
+        attention_mask = torch.tensor([
+            [1] * len(prefix) + [0] * (longest - len(ids)) + [1] * len(ids) for ids in suffixes
+        ])
+
+        kwargs = {}
+        if self._prefix_cache is not None:
+            past = copy.deepcopy(self._prefix_cache)
+            if len(prompts) > 1:
+                past.batch_repeat_interleave(len(prompts))
+            kwargs["past_key_values"] = past
+
+        with torch.no_grad():
+            outputs = self.model.generate(
+                input_ids=input_ids.to(self.model.device),
+                attention_mask=attention_mask.to(self.model.device),
+                pad_token_id=pad_id,
+                **kwargs,
+                **self.sampling_params(),
+            )
+        new_tokens = outputs[:, input_ids.shape[1]:]
+        return [text.strip() for text in tokenizer.batch_decode(new_tokens, skip_special_tokens=True)]
 
 
 class LTXVideoGenerator:
@@ -97,44 +372,95 @@ class LTXVideoGenerator:
         model_path: str = None,
         gemma_path: str = None,
         use_prompt_enhancement: bool = True,
+        prompt_cache_path: str = None,
+        deterministic_enhancement: bool = False,
+        model: str = None,
+        vram_budget_gb: float = None,
+        host_budget_gb: float = None,
+        device: str = "cuda",
+        use_embedding_cache: bool = True,
+        embedding_cache_path: str = None,
+        stager=None,
     ):
-        self.model_path = model_path or str(DEFAULT_MODEL_PATH)
+        self.model = model or DEFAULT_MODEL
+        self.device = device
+        variants = dict(MODEL_VARIANTS)
+        if model_path:
+            # An explicit checkpoint overrides the selected variant's path
+            base = variants.get(self.model, MODEL_VARIANTS[DEFAULT_MODEL])
+            variants[self.model] = replace(base, name=self.model, checkpoint_path=str(model_path))
+        self.startup_profile = StageTimer()
+        # Copies weights off the network volume once; see src/models/staging.py
+        self.stager = stager if stager is not None else default_stager()
+        self.registry = ModelRegistry(
+            variants,
+            loader=lambda variant, device: load_pipeline(
+                self._staged(variant), device, self.startup_profile
+            ),
+            vram_budget_gb=vram_budget_gb,
+            host_budget_gb=host_budget_gb,
+            device=device,
+        )
+        self.model_path = variants[self.model].checkpoint_path
         self.gemma_path = gemma_path or str(DEFAULT_GEMMA_PATH)
         self.use_prompt_enhancement = use_prompt_enhancement
+        self.prompt_cache_path = prompt_cache_path
+        self.deterministic_enhancement = deterministic_enhancement
+        self.use_embedding_cache = use_embedding_cache
+        self.embedding_cache_path = embedding_cache_path
         self.pipeline = None
+        self.active_model = None
         self.prompt_enhancer = None
+        self.embedding_cache = None
 
-    def load(self):
-        """Load the model pipeline and optional prompt enhancer"""
-        import torch
+    def load(self, model: str = None):
+        """Load the optional prompt enhancer and make `model` the active pipeline
 
-        # Load prompt enhancer first (uses less VRAM)
-        if self.use_prompt_enhancement:
-            self.prompt_enhancer = PromptEnhancer(self.gemma_path)
-            self.prompt_enhancer.load()
+        Gemma and the video pipeline load concurrently, since both are mostly
+        waiting on disk reads. Per-component timings go to `startup_profile`.
+        Variants other than the generator's default are loaded on first use and
+        kept resident as far as the registry's memory budget allows.
+        """
+        from concurrent.futures import ThreadPoolExecutor
 
-        # Load LTX-2 pipeline using official ltx-pipelines
-        print(f"Loading LTX-2 from {self.model_path}...")
+        model = model or self.model
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="load") as pool:
+            enhancer = None
+            if self.use_prompt_enhancement and self.prompt_enhancer is None:
+                enhancer = pool.submit(self._load_prompt_enhancer)
+            pipeline = pool.submit(self.registry.get, model)
 
-        try:
-            from ltx_pipelines.t2vid import T2VidPipeline
+            self.pipeline = pipeline.result()
+            self.active_model = model
+            if enhancer is not None:
+                self.prompt_enhancer = enhancer.result()
+        return self
 
-            self.pipeline = T2VidPipeline(
-                checkpoint_path=str(self.model_path),
-                precision="bf16",
-            )
-            print("LTX-2 loaded with official pipeline!")
-        except ImportError as e:
-            print(f"Warning: Could not load ltx_pipelines: {e}")
-            print("Falling back to diffusers...")
-            # Fallback to diffusers (may not work with safetensors directly)
-            from diffusers import DiffusionPipeline
-            self.pipeline = DiffusionPipeline.from_pretrained(
-                "Lightricks/LTX-Video",
-                torch_dtype=torch.bfloat16,
-            ).to("cuda")
+    def _staged(self, variant: ModelVariant) -> ModelVariant:
+        """The variant with its checkpoint read from the local staging cache"""
+        if self.stager is None:
+            return variant
+        with self.startup_profile.stage("ltx.stage"):
+            return replace(variant, checkpoint_path=self.stager.stage(variant.checkpoint_path))
 
-        return self
+    def _load_prompt_enhancer(self) -> PromptEnhancer:
+        from src.models.prompt_cache import PromptCache
+
+        weights_path = self.gemma_path
+        if self.stager is not None:
+            with self.startup_profile.stage("gemma.stage"):
+                weights_path = self.stager.stage(self.gemma_path)
+        enhancer = PromptEnhancer(
+            self.gemma_path,
+            cache=PromptCache(self.prompt_cache_path),
+            deterministic=self.deterministic_enhancement,
+            weights_path=weights_path,
+        )
+        return enhancer.load(self.startup_profile)
+
+    def _ensure_model(self, model: Optional[str]):
+        if self.pipeline is None or (model and model != self.active_model):
+            self.load(model)
 
     def warmup(self):
         """Run a tiny generation to warm up GPU/model"""
@@ -143,14 +469,15 @@ class LTXVideoGenerator:
             self.load()
 
         # Tiny generation: 256x256, 9 frames
-        _ = self.generate(
-            prompt="test",
-            width=256,
-            height=256,
-            num_frames=9,
-            num_inference_steps=4,
-            enhance_prompt=False,
-        )
+        with self.startup_profile.stage("warmup.first_call"):
+            _ = self.generate(
+                prompt="test",
+                width=256,
+                height=256,
+                num_frames=9,
+                num_inference_steps=4,
+                enhance_prompt=False,
+            )
         print("Warmup complete!")
 
     def generate(
@@ -165,9 +492,24 @@ class LTXVideoGenerator:
         seed: Optional[int] = None,
         enhance_prompt: bool = True,
         use_film_template: bool = False,
+        output_path: Optional[str] = None,
+        crop_height: Optional[int] = None,
+        model: Optional[str] = None,
+        trace: StageTimer = None,
+        condition_frames=None,
+        progress: Callable = None,
+        should_stop: Callable = None,
+        checkpoint_path: Optional[str] = None,
+        resume_from: Optional[str] = None,
     ) -> list:
         """Generate video frames from prompt
 
+        The official pipeline returns a GeneratedVideo, which stays encoded on
+        disk and decodes frames lazily; the diffusers fallback returns a
+        FrameBuffer holding every frame in one contiguous uint8 array.
+        When `output_path` is given the video is written there and a
+        GeneratedVideo for it is returned from either backend.
+
         Args:
             prompt: Text description of the video
             negative_prompt: What to avoid (defaults to kids-safe blocklist)
@@ -179,34 +521,40 @@ class LTXVideoGenerator:
             seed: Random seed for reproducibility
             enhance_prompt: Whether to use Gemma to enhance prompt
             use_film_template: Whether to wrap prompt in film-style template
+            output_path: Write the finished video here instead of returning frames
+            crop_height: Center-crop diffusers frames to this height (e.g. 1088 -> 1080)
+            model: Model variant to render with (defaults to the generator's model)
+            trace: Records `template`, `enhance`, `denoise`, `vae_decode`, `encode`
+                and `disk_write` seconds. The official pipeline decodes and
+                encodes inside its own call, so all of that counts as `denoise`.
+            condition_frames: uint8 frames the clip should start from (used by
+                `generate_long`); ignored by pipelines that can't condition on video
+            progress: Called as `progress(step, total_steps, latents)` after each
+                denoising step. Pipelines without step callbacks report only the
+                start and end of the call, with `latents` None.
+            should_stop: Polled after each denoising step (and before the render
+                starts); returning "cancel" or "preempt" (see StopSignal)
+                raises RenderCancelled. Pipelines without step callbacks only
+                stop between batch items or segments.
+            checkpoint_path: Where to save the latents if the render is preempted
+            resume_from: A checkpoint to continue denoising from, written by an
+                earlier preempted call with the same settings. Pipelines that
+                can't take latents and timesteps start over instead.
         """
         import torch
 
-        if self.pipeline is None:
-            self.load()
-
-        # Validate dimensions
-        if width % 32 != 0 or height % 32 != 0:
-            raise ValueError(f"Width ({width}) and height ({height}) must be divisible by 32")
-        if (num_frames - 1) % 8 != 0:
-            raise ValueError(f"num_frames ({num_frames}) must be (8 × n) + 1")
-
-        # Apply film template if requested
-        if use_film_template:
-            prompt = FILM_PROMPT_TEMPLATE.format(scene=prompt)
+        self._ensure_model(model)
+        check_stop(should_stop)
 
-        # Enhance prompt if enabled
-        if enhance_prompt and self.prompt_enhancer and self.prompt_enhancer.model:
-            prompt = self.prompt_enhancer.enhance(prompt)
-
-        # Use default negative prompt if not provided
-        if negative_prompt is None:
-            negative_prompt = DEFAULT_NEGATIVE_PROMPT
+        self._validate_shape(width, height, num_frames)
+        prompt, negative_prompt = self._prepare_prompt(
+            prompt, negative_prompt, enhance_prompt, use_film_template, trace
+        )
 
         # Set up generator for reproducibility
         generator = None
         if seed is not None:
-            generator = torch.Generator(device="cuda").manual_seed(seed)
+            generator = torch.Generator(device=self.device).manual_seed(seed)
 
         print(f"\nGenerating video:")
         print(f"  Resolution: {width}x{height}")
@@ -214,40 +562,69 @@ class LTXVideoGenerator:
         print(f"  Steps: {num_inference_steps}")
         print(f"  Prompt: {prompt[:80]}...")
 
+        resume_kwargs = self._resume_kwargs(resume_from, num_inference_steps)
+        step_kwargs = self._progress_kwargs(
+            progress,
+            num_inference_steps,
+            should_stop=should_stop,
+            checkpoint_paths=[checkpoint_path],
+            first_step=num_inference_steps - len(resume_kwargs.get("timesteps", range(num_inference_steps))),
+        )
+        if progress is not None and not step_kwargs:
+            progress(0, num_inference_steps, None)
+
         # Use official LTX-2 pipeline API
         try:
-            from ltx_pipelines.t2vid import T2VidPipeline
-            if isinstance(self.pipeline, T2VidPipeline):
-                # Official pipeline - generates directly to file
+            if self._is_official_pipeline():
+                # Official pipeline - generates directly to file. Render beside
+                # the destination so publishing the result is an atomic rename.
+                import os
                 import tempfile
-                with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as f:
+                temp_dir = None
+                if output_path:
+                    temp_dir = Path(output_path).parent
+                    temp_dir.mkdir(parents=True, exist_ok=True)
+                # Hidden, so the output manifest skips it; the pipeline's writer
+                # picks the container from the .mp4 extension
+                with tempfile.NamedTemporaryFile(prefix=".", suffix=".mp4", dir=temp_dir, delete=False) as f:
                     temp_path = f.name
 
-                self.pipeline(
-                    prompt=prompt,
-                    negative_prompt=negative_prompt,
-                    output_path=temp_path,
-                    height=height,
-                    width=width,
-                    num_frames=num_frames,
-                    num_inference_steps=num_inference_steps,
-                    cfg_guidance_scale=guidance_scale,
-                    seed=seed,
-                )
+                try:
+                    with tempfile.TemporaryDirectory() as workdir, maybe_stage(trace, "denoise"):
+                        self.pipeline(
+                            prompt=prompt,
+                            negative_prompt=negative_prompt,
+                            output_path=temp_path,
+                            height=height,
+                            width=width,
+                            num_frames=num_frames,
+                            num_inference_steps=num_inference_steps,
+                            cfg_guidance_scale=guidance_scale,
+                            seed=seed,
+                            **self._conditioning_kwargs(condition_frames, workdir),
+                            **step_kwargs,
+                        )
+                except Exception:
+                    os.unlink(temp_path)
+                    raise
 
-                # Read frames from generated video
-                import imageio
-                reader = imageio.get_reader(temp_path)
-                frames = [frame for frame in reader]
-                reader.close()
-                import os
-                os.unlink(temp_path)
-                return frames
+                if progress is not None and not step_kwargs:
+                    progress(num_inference_steps, num_inference_steps, None)
+
+                # Frames stay encoded on disk until someone asks for them
+                video = GeneratedVideo(temp_path, temporary=True)
+                if output_path:
+                    with maybe_stage(trace, "disk_write"):
+                        video.save(output_path)
+                return video
+        except RenderCancelled:
+            raise
         except Exception as e:
             print(f"Official pipeline failed: {e}, trying diffusers API...")
 
         # Diffusers API fallback
-        output = self.pipeline(
+        output = self._run_diffusers(
+            trace,
             prompt=prompt,
             negative_prompt=negative_prompt,
             width=width,
@@ -256,14 +633,780 @@ class LTXVideoGenerator:
             num_inference_steps=num_inference_steps,
             guidance_scale=guidance_scale,
             generator=generator,
+            output_type="np",
+            **self._conditioning_kwargs(condition_frames),
+            **resume_kwargs,
+            **step_kwargs,
+        )
+        if progress is not None and not step_kwargs:
+            progress(num_inference_steps, num_inference_steps, None)
+
+        return self._collect_frames(output.frames[0], output_path, crop_height, trace)
+
+    def generate_batch(
+        self,
+        prompts: list,
+        negative_prompts: list = None,
+        seeds: list = None,
+        width: int = 1920,
+        height: int = 1088,
+        num_frames: int = 121,
+        num_inference_steps: int = 30,
+        guidance_scale: float = 7.5,
+        enhance_prompt: bool = True,
+        use_film_template: bool = False,
+        output_paths: list = None,
+        crop_height: Optional[int] = None,
+        model: Optional[str] = None,
+        trace: StageTimer = None,
+        progress: Callable = None,
+        should_stop: Callable = None,
+        checkpoint_paths: list = None,
+        resume_from: list = None,
+        upscale: bool = False,
+    ) -> list:
+        """Generate several same-shape videos in one pipeline call
+
+        All prompts share the shape and sampling settings; negative prompts,
+        seeds, output paths, checkpoint paths and checkpoints to resume from are
+        per prompt. Returns one result per prompt, in order, with the same
+        types as `generate`. `trace`, `progress` and `should_stop` cover the whole batch;
+        preview latents are batched, one row per prompt. Prompts resuming from
+        a checkpoint render one at a time. With `upscale`, the latents go
+        through the 2x spatial upscaler before decoding, so videos come out at
+        twice `width` and `height`; see `denoise_batch` for the stages.
+        """
+        import torch
+
+        negative_prompts = negative_prompts or [None] * len(prompts)
+        seeds = seeds or [None] * len(prompts)
+        output_paths = output_paths or [None] * len(prompts)
+        checkpoint_paths = checkpoint_paths or [None] * len(prompts)
+        resume_from = resume_from or [None] * len(prompts)
+        shared = dict(
+            width=width,
+            height=height,
+            num_frames=num_frames,
+            num_inference_steps=num_inference_steps,
+            guidance_scale=guidance_scale,
+            enhance_prompt=enhance_prompt,
+            use_film_template=use_film_template,
+            crop_height=crop_height,
+            model=model,
+            trace=trace,
+            should_stop=should_stop,
+        )
+
+        self._ensure_model(model)
+
+        if upscale and not self.supports_stages():
+            print("  The official pipeline can't upscale latents separately; rendering at base size")
+            upscale = False
+        if upscale and (len(prompts) == 1 or not any(resume_from)):
+            latents = self.denoise_batch(
+                prompts,
+                negative_prompts,
+                seeds,
+                width=width,
+                height=height,
+                num_frames=num_frames,
+                num_inference_steps=num_inference_steps,
+                guidance_scale=guidance_scale,
+                enhance_prompt=enhance_prompt,
+                use_film_template=use_film_template,
+                model=model,
+                trace=trace,
+                progress=progress,
+                should_stop=should_stop,
+                checkpoint_paths=checkpoint_paths,
+                resume_from=resume_from,
+            )
+            try:
+                frames = self.decode_latents(self.upscale_latents(latents, trace), trace)
+            finally:
+                self.release_latents(latents)
+            return [
+                self._collect_frames(video, out, crop_height, trace)
+                for video, out in zip(frames, output_paths)
+            ]
+
+        # The official pipeline renders one clip per call; running the batch
+        # back to back still avoids re-specializing between shapes
+        if len(prompts) == 1 or self._is_official_pipeline() or any(resume_from):
+            total = num_inference_steps * len(prompts)
+            return [
+                self.generate(
+                    prompt=p,
+                    negative_prompt=n,
+                    seed=seed,
+                    output_path=out,
+                    progress=offset_progress(progress, i * num_inference_steps, total),
+                    checkpoint_path=checkpoint,
+                    resume_from=resume,
+                    **shared,
+                )
+                for i, (p, n, seed, out, checkpoint, resume) in enumerate(
+                    zip(prompts, negative_prompts, seeds, output_paths, checkpoint_paths, resume_from)
+                )
+            ]
+
+        output = self._render_batch(
+            prompts,
+            negative_prompts,
+            seeds,
+            width=width,
+            height=height,
+            num_frames=num_frames,
+            num_inference_steps=num_inference_steps,
+            guidance_scale=guidance_scale,
+            enhance_prompt=enhance_prompt,
+            use_film_template=use_film_template,
+            trace=trace,
+            output_type="np",
+            **self._progress_kwargs(
+                progress, num_inference_steps, should_stop=should_stop, checkpoint_paths=checkpoint_paths
+            ),
+        )
+
+        return [
+            self._collect_frames(frames, out, crop_height, trace)
+            for frames, out in zip(output.frames, output_paths)
+        ]
+
+    def supports_stages(self) -> bool:
+        """Whether the active pipeline can stop at latents for `denoise_batch`
+
+        The official pipeline decodes and encodes inside its own call.
+        """
+        return self.pipeline is not None and not self._is_official_pipeline()
+
+    def denoise_batch(
+        self,
+        prompts: list,
+        negative_prompts: list = None,
+        seeds: list = None,
+        width: int = 768,
+        height: int = 512,
+        num_frames: int = 121,
+        num_inference_steps: int = 30,
+        guidance_scale: float = 7.5,
+        enhance_prompt: bool = True,
+        use_film_template: bool = False,
+        model: Optional[str] = None,
+        trace: StageTimer = None,
+        progress: Callable = None,
+        should_stop: Callable = None,
+        checkpoint_paths: list = None,
+        resume_from: list = None,
+    ) -> LatentBatch:
+        """First stage of a staged render: denoise a batch and stop at the latents
+
+        A staged render is `denoise_batch`, then optionally `upscale_latents`,
+        then `decode_latents`, then `encode_frames` per prompt; each can run on
+        its own thread, so a server can denoise the next batch while this one
+        is upscaled, decoded and encoded. Arguments are as for
+        `generate_batch`; a checkpoint is only resumed for a single prompt.
+        Needs `supports_stages()`.
+        """
+        negative_prompts = negative_prompts or [None] * len(prompts)
+        seeds = seeds or [None] * len(prompts)
+        resume_from = resume_from or [None] * len(prompts)
+        self._ensure_model(model)
+        check_stop(should_stop)
+        resume_kwargs = self._resume_kwargs(resume_from[0], num_inference_steps) if len(prompts) == 1 else {}
+        # Pinned until decoded, so no stage thread's model load evicts this pipeline meanwhile
+        model = self.active_model
+        self.registry.pin(model)
+        try:
+            output = self._render_batch(
+                prompts,
+                negative_prompts,
+                seeds,
+                width=width,
+                height=height,
+                num_frames=num_frames,
+                num_inference_steps=num_inference_steps,
+                guidance_scale=guidance_scale,
+                enhance_prompt=enhance_prompt,
+                use_film_template=use_film_template,
+                trace=trace,
+                output_type="latent",
+                **resume_kwargs,
+                **self._progress_kwargs(
+                    progress,
+                    num_inference_steps,
+                    should_stop=should_stop,
+                    checkpoint_paths=checkpoint_paths,
+                    first_step=num_inference_steps - len(resume_kwargs.get("timesteps", range(num_inference_steps))),
+                ),
+            )
+        except BaseException:
+            self.registry.unpin(model)
+            raise
+        return LatentBatch(output.frames, width, height, num_frames, model=model, pinned=True)
+
+    def upscale_latents(self, batch: LatentBatch, trace: StageTimer = None) -> LatentBatch:
+        """Double the latents' spatial size with the latent upscaler (recorded as `upscale`)
+
+        The returned batch takes over `batch`'s registry pin.
+        """
+        # Loading the upscaler must not evict the model the worker is rendering with
+        with self.registry.pinned(self.active_model):
+            upscaler = self.registry.get(self._upscaler_name(batch))
+        pipeline = self._batch_pipeline(batch)
+        vae = getattr(pipeline, "vae", None)
+        with maybe_stage(trace, "upscale"):
+            latents = self._unpacked(batch, pipeline)
+            # The upscaler works on raw VAE latents; the transformer's are normalized
+            if hasattr(pipeline, "_denormalize_latents"):
+                latents = pipeline._denormalize_latents(
+                    latents, vae.latents_mean, vae.latents_std, vae.config.scaling_factor
+                )
+            dtype = getattr(upscaler, "dtype", None)
+            latents = upscaler(latents.to(dtype) if dtype is not None else latents)
+            if hasattr(pipeline, "_normalize_latents"):
+                latents = pipeline._normalize_latents(
+                    latents, vae.latents_mean, vae.latents_std, vae.config.scaling_factor
+                )
+        upscaled = LatentBatch(latents, batch.width * 2, batch.height * 2, batch.num_frames, batch.model, batch.pinned)
+        batch.pinned = False
+        return upscaled
+
+    def decode_latents(self, batch: LatentBatch, trace: StageTimer = None) -> list:
+        """Decode latents to per-prompt uint8-ready float frames (recorded as `vae_decode`)
+
+        Releases the batch's registry pin.
+        """
+        try:
+            pipeline = self._batch_pipeline(batch)
+            vae = pipeline.vae
+            with maybe_stage(trace, "vae_decode"):
+                latents = self._unpacked(batch, pipeline)
+                if hasattr(pipeline, "_denormalize_latents"):
+                    latents = pipeline._denormalize_latents(
+                        latents, vae.latents_mean, vae.latents_std, vae.config.scaling_factor
+                    )
+                temb = None
+                if getattr(getattr(vae, "config", None), "timestep_conditioning", False):
+                    import torch
+
+                    temb = torch.zeros(latents.shape[0], device=latents.device, dtype=latents.dtype)
+                if hasattr(vae, "dtype"):
+                    latents = latents.to(vae.dtype)
+                video = vae.decode(latents, temb, return_dict=False)[0]
+                processor = getattr(pipeline, "video_processor", None)
+                if processor is not None:
+                    video = processor.postprocess_video(video, output_type="np")
+        finally:
+            self.release_latents(batch)
+        return list(video)
+
+    def release_latents(self, batch: LatentBatch):
+        """Unpin the model of latents that won't be decoded (decode_latents does this itself)"""
+        if batch.pinned:
+            batch.pinned = False
+            self.registry.unpin(batch.model)
+
+    def encode_frames(self, frames, output_path: str, crop_height: Optional[int] = None, trace: StageTimer = None):
+        """Last stage of a staged render: encode one prompt's decoded frames to `output_path`"""
+        return self._collect_frames(frames, output_path, crop_height, trace)
+
+    def _upscaler_name(self, batch: LatentBatch) -> str:
+        variant = self.registry.variants.get(batch.model or self.active_model)
+        return "fake-upscaler" if variant is not None and variant.kind == "fake" else UPSCALER_MODEL
+
+    def _batch_pipeline(self, batch: LatentBatch):
+        """The pipeline that denoised `batch`, which may no longer be the active one"""
+        if batch.model is None or batch.model == self.active_model:
+            return self.pipeline
+        return self.registry.get(batch.model)
+
+    def _unpacked(self, batch: LatentBatch, pipeline):
+        """Latents as (B, C, F, H, W); diffusers' text-to-video pipeline returns them packed"""
+        latents = batch.latents
+        if getattr(latents, "ndim", None) != 3 or not hasattr(pipeline, "_unpack_latents"):
+            return latents
+        return pipeline._unpack_latents(
+            latents,
+            (batch.num_frames - 1) // pipeline.vae_temporal_compression_ratio + 1,
+            batch.height // pipeline.vae_spatial_compression_ratio,
+            batch.width // pipeline.vae_spatial_compression_ratio,
+            pipeline.transformer_spatial_patch_size,
+            pipeline.transformer_temporal_patch_size,
+        )
+
+    def _render_batch(
+        self,
+        prompts: list,
+        negative_prompts: list,
+        seeds: list,
+        width: int,
+        height: int,
+        num_frames: int,
+        num_inference_steps: int,
+        guidance_scale: float,
+        enhance_prompt: bool,
+        use_film_template: bool,
+        trace: StageTimer = None,
+        **kwargs,
+    ):
+        """One batched diffusers call; `kwargs` go to the pipeline (output_type, callbacks)"""
+        import torch
+
+        self._validate_shape(width, height, num_frames)
+        prepared = self._prepare_prompts(prompts, negative_prompts, enhance_prompt, use_film_template, trace)
+
+        generators = []
+        for seed in seeds:
+            g = torch.Generator(device=self.device)
+            if seed is not None:
+                g.manual_seed(seed)
+            else:
+                g.seed()
+            generators.append(g)
+
+        print(f"\nGenerating batch of {len(prompts)} videos:")
+        print(f"  Resolution: {width}x{height}")
+        print(f"  Frames: {num_frames} (~{num_frames/24:.1f}s @ 24fps)")
+        print(f"  Steps: {num_inference_steps}")
+
+        return self._run_diffusers(
+            trace,
+            prompt=[p for p, _ in prepared],
+            negative_prompt=[n for _, n in prepared],
+            width=width,
+            height=height,
+            num_frames=num_frames,
+            num_inference_steps=num_inference_steps,
+            guidance_scale=guidance_scale,
+            generator=generators,
+            **kwargs,
         )
 
-        return output.frames[0]
+    def generate_long(
+        self,
+        prompt: str,
+        output_path: str,
+        negative_prompt: str = None,
+        width: int = 768,
+        height: int = 512,
+        num_frames: int = 481,
+        segment_frames: int = 121,
+        overlap_frames: int = 17,
+        num_inference_steps: int = 30,
+        guidance_scale: float = 7.5,
+        seed: Optional[int] = None,
+        enhance_prompt: bool = True,
+        use_film_template: bool = False,
+        crop_height: Optional[int] = None,
+        model: Optional[str] = None,
+        trace: StageTimer = None,
+        fps: int = 24,
+        progress: Callable = None,
+        should_stop: Callable = None,
+    ) -> GeneratedVideo:
+        """Generate a clip too long for one pipeline call as overlapping segments
+
+        Each segment of `segment_frames` frames is conditioned on the last
+        `overlap_frames` frames of the one before, the overlaps are crossfaded,
+        and finished frames are streamed to the encoder as each segment
+        completes. Only pipelines that take video conditions (diffusers' LTX
+        condition pipeline, the official ones) can condition; with the plain
+        text-to-video fallback each segment is an independent render of the
+        prompt, joined to the last by the crossfade alone, so motion can jump
+        at the seams. Peak memory therefore depends on `segment_frames`, not on
+        `num_frames`, which can be any length. Segment and overlap lengths must
+        be 8n+1; the prompt is templated and enhanced once for the whole clip.
+
+        Returns a GeneratedVideo for `output_path`. `trace` accumulates the
+        per-segment stages, and `progress` counts steps across all segments.
+        `should_stop` works as in `generate`; long videos aren't checkpointed.
+        """
+        from src.models.long_video import OverlapStitcher, plan_segments, segment_seed
+
+        self._ensure_model(model)
+        segments = plan_segments(num_frames, segment_frames, overlap_frames)
+        for length in segments:
+            self._validate_shape(width, height, length)
+        prompt, negative_prompt = self._prepare_prompt(
+            prompt, negative_prompt, enhance_prompt, use_film_template, trace
+        )
+
+        print(f"\nGenerating long video:")
+        print(f"  Frames: {num_frames} (~{num_frames/fps:.1f}s @ {fps}fps)")
+        print(f"  Segments: {len(segments)} x up to {segment_frames} frames, {overlap_frames} overlap")
+        if len(segments) > 1 and self._conditioning_param() is None:
+            print("  Pipeline can't condition on video; segments are joined by crossfade only")
+
+        writer = None
+        stitcher = None
+        try:
+            for i, length in enumerate(segments):
+                print(f"  Segment {i + 1}/{len(segments)} ({length} frames)")
+                result = self.generate(
+                    prompt=prompt,
+                    negative_prompt=negative_prompt,
+                    width=width,
+                    height=height,
+                    num_frames=length,
+                    num_inference_steps=num_inference_steps,
+                    guidance_scale=guidance_scale,
+                    seed=segment_seed(seed, i),
+                    enhance_prompt=False,
+                    crop_height=crop_height,
+                    trace=trace,
+                    condition_frames=stitcher.tail if stitcher else None,
+                    progress=offset_progress(
+                        progress, i * num_inference_steps, len(segments) * num_inference_steps
+                    ),
+                    should_stop=should_stop,
+                )
+                if isinstance(result, GeneratedVideo):
+                    # Official pipeline: decode the segment, then drop its temp file
+                    frames = FrameBuffer.from_frames(result.frames)
+                    result.discard()
+                else:
+                    frames = result
+
+                if writer is None:
+                    _, frame_height, frame_width, _ = frames.shape
+                    writer = StreamingVideoWriter(output_path, frame_width, frame_height, fps=fps)
+                    stitcher = OverlapStitcher(writer, overlap_frames, num_frames)
+                with maybe_stage(trace, "encode"):
+                    stitcher.add(frames.array)
+                del result, frames
+
+            with maybe_stage(trace, "encode"):
+                written = stitcher.finish()
+            writer.close()
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+
+        print(f"Video saved to {output_path} ({written} frames)")
+        return GeneratedVideo(output_path, fps=fps)
+
+    def release_memory(self):
+        """Return device memory an interrupted render left cached"""
+        self.registry.release_memory()
+
+    def _progress_kwargs(
+        self,
+        progress: Optional[Callable],
+        num_inference_steps: int,
+        should_stop: Optional[Callable] = None,
+        checkpoint_paths: list = None,
+        first_step: int = 0,
+    ) -> dict:
+        """Pipeline kwargs that report every finished denoising step to `progress`
+
+        The same callback polls `should_stop`, and is where a preempted render
+        writes its checkpoints. `first_step` is the step a resumed render
+        starts from. Empty when the pipeline can't report steps.
+        """
+        import inspect
+
+        if self.pipeline is None:
+            return {}
+        params = inspect.signature(self.pipeline.__call__).parameters
+        if "callback_on_step_end" not in params:
+            return {}
+
+        def on_step_end(pipeline, step, timestep, callback_kwargs):
+            # Two-stage pipelines keep counting through the refinement pass
+            done = min(first_step + step + 1, num_inference_steps)
+            latents = callback_kwargs.get("latents")
+            if progress is not None:
+                progress(done, num_inference_steps, latents)
+            stop = should_stop() if should_stop is not None else None
+            if stop == "preempt" and any(checkpoint_paths or []) and done < num_inference_steps:
+                self._save_checkpoints(pipeline, step, num_inference_steps, latents, checkpoint_paths)
+            check_stop(should_stop)
+            return callback_kwargs
+
+        kwargs = {"callback_on_step_end": on_step_end}
+        if "callback_on_step_end_tensor_inputs" in params:
+            kwargs["callback_on_step_end_tensor_inputs"] = ["latents"]
+        return kwargs
+
+    def _save_checkpoints(self, pipeline, step: int, num_inference_steps: int, latents, paths: list):
+        """Write each prompt's latents and remaining timesteps, so its render can resume"""
+        import os
+
+        import torch
+
+        timesteps = getattr(getattr(pipeline, "scheduler", None), "timesteps", None)
+        if latents is None or timesteps is None:
+            return
+        remaining = [float(t) for t in list(timesteps)[step + 1:]]
+        latents = torch.as_tensor(latents).detach().cpu()
+        for i, path in enumerate(paths):
+            if path is None:
+                continue
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            tmp = f"{path}.tmp"
+            torch.save({
+                "num_inference_steps": num_inference_steps,
+                "timesteps": remaining,
+                "latents": latents[i:i + 1].clone(),
+            }, tmp)
+            os.replace(tmp, path)
+
+    def _resume_kwargs(self, resume_from: Optional[str], num_inference_steps: int) -> dict:
+        """Pipeline kwargs continuing from a checkpoint, or {} to start from noise"""
+        import inspect
+
+        import torch
+
+        if not resume_from or not Path(resume_from).exists() or self._is_official_pipeline():
+            return {}
+        params = inspect.signature(self.pipeline.__call__).parameters
+        if "latents" not in params or "timesteps" not in params:
+            print("  Pipeline can't resume from latents; starting over")
+            return {}
+        state = torch.load(resume_from, map_location="cpu")
+        if state["num_inference_steps"] != num_inference_steps:
+            print("  Checkpoint was taken with a different step count; starting over")
+            return {}
+        print(f"  Resuming at step {num_inference_steps - len(state['timesteps'])}/{num_inference_steps}")
+        return {"latents": state["latents"].to(self.device), "timesteps": state["timesteps"]}
+
+    def _conditioning_param(self) -> Optional[str]:
+        """Name of the pipeline argument that takes conditioning frames, if any"""
+        import inspect
+
+        if self.pipeline is None:
+            return None
+        params = inspect.signature(self.pipeline.__call__).parameters
+        if "conditions" in params:
+            return "conditions"
+        if "images" in params and self._is_official_pipeline():
+            return "images"
+        return None
+
+    def _conditioning_kwargs(self, condition_frames, workdir: str = None) -> dict:
+        """Pipeline kwargs that make a clip continue from `condition_frames`
+
+        diffusers' LTX condition pipeline takes them as a video condition at
+        frame 0; the official pipelines take (image path, frame index, strength)
+        keyframes, written to `workdir`.
+        """
+        if condition_frames is None or len(condition_frames) == 0:
+            return {}
+
+        param = self._conditioning_param()
+        if param == "conditions":
+            from PIL import Image
+
+            try:
+                from diffusers.pipelines.ltx.pipeline_ltx_condition import LTXVideoCondition
+            except ImportError:
+                from types import SimpleNamespace as LTXVideoCondition
+
+            video = [Image.fromarray(frame) for frame in condition_frames]
+            return {"conditions": [LTXVideoCondition(video=video, frame_index=0, strength=1.0)]}
+
+        if param == "images" and workdir is not None:
+            import imageio
+
+            images = []
+            for i, frame in enumerate(condition_frames):
+                path = str(Path(workdir) / f"condition_{i:03d}.png")
+                imageio.imwrite(path, frame)
+                images.append((path, i, 1.0))
+            return {"images": images}
+
+        return {}
+
+    def _run_diffusers(self, trace: Optional[StageTimer], **kwargs):
+        """Call the diffusers pipeline, splitting its time into denoise and VAE decode
+
+        Text prompts are swapped for cached text-encoder outputs where the
+        pipeline allows it; encoding cache misses is timed as `text_encode`.
+        """
+        import time
+
+        kwargs.update(self._prompt_embeds(
+            kwargs["prompt"], kwargs.get("negative_prompt"), kwargs.get("guidance_scale", 1.0), trace
+        ))
+        if trace is None:
+            return self.pipeline(**kwargs)
+
+        decode_before = trace.get("vae_decode")
+        start = time.perf_counter()
+        # Latent output skips the decode; staged renders time it in decode_latents
+        vae = None if kwargs.get("output_type") == "latent" else getattr(self.pipeline, "vae", None)
+        with timed_calls(vae, "decode", trace, "vae_decode"):
+            output = self.pipeline(**kwargs)
+        decode = trace.get("vae_decode") - decode_before
+        trace.record("denoise", time.perf_counter() - start - decode)
+        return output
+
+    def _prompt_embeds(self, prompts, negative_prompts, guidance_scale: float, trace=None) -> dict:
+        """Pipeline kwargs replacing text prompts with cached embeddings, or {}
+
+        Only texts missing from the cache go through the text encoder, in one
+        batch, so the usual repeat of DEFAULT_NEGATIVE_PROMPT never does.
+        Pipelines without `encode_prompt` (the official one) get {} and keep
+        encoding text themselves, as does any pipeline the cache fails on.
+        """
+        encode = getattr(self.pipeline, "encode_prompt", None)
+        if not self.use_embedding_cache or encode is None:
+            return {}
+        import torch
+
+        prompts = [prompts] if isinstance(prompts, str) else list(prompts)
+        negative_prompts = [negative_prompts] if isinstance(negative_prompts, str) else list(negative_prompts or [])
+        # Diffusers only encodes the negative prompt under classifier-free guidance
+        guided = guidance_scale > 1.0 and len(negative_prompts) == len(prompts)
+
+        try:
+            if self.embedding_cache is None:
+                from src.models.embedding_cache import EmbeddingCache
+
+                self.embedding_cache = EmbeddingCache(self.embedding_cache_path, device=self.device)
+            max_length = self._max_sequence_length()
+            encoder_id = str(self.registry.variants[self.active_model].checkpoint_path)
+
+            entries, missing = {}, {}
+            for text in dict.fromkeys(prompts + (negative_prompts if guided else [])):
+                key = self.embedding_cache.make_key(text, encoder_id, max_length)
+                entries[text] = self.embedding_cache.get(key)
+                if entries[text] is None:
+                    missing[text] = key
+
+            if missing:
+                with maybe_stage(trace, "text_encode"):
+                    embeds, mask, _, _ = encode(
+                        prompt=list(missing),
+                        do_classifier_free_guidance=False,
+                        num_videos_per_prompt=1,
+                        max_sequence_length=max_length,
+                        device=self.device,
+                    )
+                for i, (text, key) in enumerate(missing.items()):
+                    entries[text] = {"embeds": embeds[i:i + 1], "mask": mask[i:i + 1]}
+                    self.embedding_cache.put(key, entries[text])
+        except Exception as e:
+            print(f"Warning: embedding cache disabled, encoding text in the pipeline: {e}")
+            self.use_embedding_cache = False
+            return {}
+
+        def stack(texts: list, name: str):
+            return torch.cat([entries[text][name] for text in texts])
+
+        kwargs = {
+            "prompt": None,
+            "prompt_embeds": stack(prompts, "embeds"),
+            "prompt_attention_mask": stack(prompts, "mask"),
+        }
+        if guided:
+            kwargs.update(
+                negative_prompt=None,
+                negative_prompt_embeds=stack(negative_prompts, "embeds"),
+                negative_prompt_attention_mask=stack(negative_prompts, "mask"),
+            )
+        return kwargs
+
+    def _max_sequence_length(self) -> int:
+        """The pipeline's own default token length, which cached embeddings must match"""
+        import inspect
+
+        parameter = inspect.signature(self.pipeline.__call__).parameters.get("max_sequence_length")
+        if parameter is None or parameter.default is inspect.Parameter.empty:
+            return 128
+        return parameter.default
+
+    def _collect_frames(
+        self,
+        frames,
+        output_path: Optional[str],
+        crop_height: Optional[int],
+        trace: StageTimer = None,
+    ):
+        """Pack diffusers frames into a FrameBuffer, encoding them as they are packed"""
+        if not output_path:
+            return FrameBuffer.from_frames(frames, crop_height=crop_height)
+
+        height, width = frames[0].shape[:2]
+        with maybe_stage(trace, "encode"):
+            with StreamingVideoWriter(output_path, width, crop_height or height) as writer:
+                buffer = FrameBuffer.from_frames(frames, crop_height=crop_height, writer=writer)
+        print(f"Video saved to {output_path}")
+        return GeneratedVideo(output_path, frames=buffer)
+
+    def _validate_shape(self, width: int, height: int, num_frames: int):
+        if width % 32 != 0 or height % 32 != 0:
+            raise ValueError(f"Width ({width}) and height ({height}) must be divisible by 32")
+        if (num_frames - 1) % 8 != 0:
+            raise ValueError(f"num_frames ({num_frames}) must be (8 × n) + 1")
+
+    def _prepare_prompt(
+        self,
+        prompt: str,
+        negative_prompt: Optional[str],
+        enhance_prompt: bool,
+        use_film_template: bool,
+        trace: StageTimer = None,
+    ) -> tuple:
+        """Apply the film template, Gemma enhancement and default negative prompt"""
+        return self._prepare_prompts([prompt], [negative_prompt], enhance_prompt, use_film_template, trace)[0]
+
+    def _prepare_prompts(
+        self,
+        prompts: list,
+        negative_prompts: list,
+        enhance_prompt: bool,
+        use_film_template: bool,
+        trace: StageTimer = None,
+    ) -> list:
+        """`_prepare_prompt` for a batch, enhancing all prompts in one Gemma call"""
+        # Apply film template if requested
+        if use_film_template:
+            with maybe_stage(trace, "template"):
+                prompts = [FILM_PROMPT_TEMPLATE.format(scene=prompt) for prompt in prompts]
+
+        # Enhance prompts if enabled
+        if enhance_prompt and self.prompt_enhancer and self.prompt_enhancer.model:
+            with maybe_stage(trace, "enhance"):
+                prompts = self.prompt_enhancer.enhance_many(prompts)
+
+        # Use the default negative prompt where none was given
+        negative_prompts = [DEFAULT_NEGATIVE_PROMPT if n is None else n for n in negative_prompts]
+
+        return list(zip(prompts, negative_prompts))
+
+    def _is_official_pipeline(self) -> bool:
+        try:
+            from ltx_pipelines.t2vid import T2VidPipeline
+        except ImportError:
+            return False
+        return isinstance(self.pipeline, T2VidPipeline)
 
     def save_video(self, frames: list, output_path: str, fps: int = 24):
-        """Save frames as video"""
+        """Save frames as video
+
+        A GeneratedVideo is moved into place as-is instead of being re-encoded,
+        and a FrameBuffer is streamed to ffmpeg frame by frame.
+        """
         import imageio
 
+        if isinstance(frames, GeneratedVideo):
+            # Videos encoded straight to their output path were already reported
+            if Path(frames.path).resolve() != Path(output_path).resolve():
+                frames.save(output_path)
+                print(f"Video saved to {output_path}")
+            return output_path
+
+        if isinstance(frames, FrameBuffer):
+            _, height, width, _ = frames.shape
+            with StreamingVideoWriter(output_path, width, height, fps=fps) as writer:
+                for frame in frames:
+                    writer.write(frame)
+            print(f"Video saved to {output_path}")
+            return output_path
+
         Path(output_path).parent.mkdir(parents=True, exist_ok=True)
         imageio.mimsave(output_path, frames, fps=fps)
         print(f"Video saved to {output_path}")
@@ -280,6 +1423,7 @@ PRESETS = {
         "guidance_scale": 7.5,
         "enhance_prompt": True,
         "use_film_template": True,
+        "model": "ltx-2-19b-dev",
     },
     "kids-720p-5sec": {
         "width": 1280,
@@ -289,6 +1433,31 @@ PRESETS = {
         "guidance_scale": 7.5,
         "enhance_prompt": True,
         "use_film_template": True,
+        "model": "ltx-2-19b-dev",
+    },
+    # Best config from docs/LTX2-EXPERIMENTS.md; the distilled model always runs 8 steps
+    "kids-distilled-9sec": {
+        "width": 768,
+        "height": 512,
+        "num_frames": 217,
+        "num_inference_steps": 8,
+        "guidance_scale": 7.5,
+        "enhance_prompt": True,
+        "use_film_template": True,
+        "model": "ltx-2-19b-distilled-fp8",
+    },
+    # 20s clip as overlapping 9s segments, each within the 4090's memory limit
+    "kids-distilled-20sec": {
+        "width": 768,
+        "height": 512,
+        "num_frames": 481,
+        "segment_frames": 217,
+        "overlap_frames": 17,
+        "num_inference_steps": 8,
+        "guidance_scale": 7.5,
+        "enhance_prompt": True,
+        "use_film_template": True,
+        "model": "ltx-2-19b-distilled-fp8",
     },
     "fast-test": {
         "width": 512,
@@ -298,5 +1467,6 @@ PRESETS = {
         "guidance_scale": 7.5,
         "enhance_prompt": False,
         "use_film_template": False,
+        "model": "ltx-2-19b-dev",
     },
 }
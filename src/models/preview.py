@@ -0,0 +1,58 @@
+"""Cheap low-resolution previews decoded from intermediate latents"""
+import io
+
+
+def latent_dims(width: int, height: int, num_frames: int) -> tuple:
+    """(frames, height, width) of the LTX latent grid for a video shape"""
+    return (num_frames - 1) // 8 + 1, height // 32, width // 32
+
+
+def preview_latents(latents, width: int, height: int, num_frames: int):
+    """Reduce latents to what a preview needs: (B, 3, 1, H, W) float32
+
+    Keeps the middle latent frame with its channels averaged into three
+    groups. The result is small enough to send between processes and is
+    itself valid input to `latent_preview`. Accepts torch tensors or numpy
+    arrays, either unpacked (B, C, F, H, W) or packed as (B, tokens, C) the
+    way the diffusers LTX pipelines carry them.
+    """
+    import numpy as np
+
+    if hasattr(latents, "detach"):
+        latents = latents.detach().float().cpu().numpy()
+    latents = np.asarray(latents, dtype=np.float32)
+
+    if latents.ndim == 3:
+        # Packed tokens: (B, F * H * W, C) -> (B, C, F, H, W)
+        frames, rows, cols = latent_dims(width, height, num_frames)
+        latents = latents.reshape(len(latents), frames, rows, cols, -1).transpose(0, 4, 1, 2, 3)
+
+    frame = latents[:, :, latents.shape[2] // 2]  # (B, C, H, W)
+    channels = frame.shape[1]
+    groups = np.array_split(frame, 3, axis=1) if channels >= 3 else [frame] * 3
+    rgb = np.stack([group.mean(axis=1) for group in groups], axis=1)
+    return rgb[:, :, None]
+
+
+def latent_preview(latents, width: int, height: int, num_frames: int, index: int = 0, scale: int = 8):
+    """Middle latent frame of batch item `index` as an (H, W, 3) uint8 image
+
+    No VAE decode: channel groups are min-max normalized into RGB, which shows
+    composition and motion at 1/32 resolution for the cost of a reshape.
+    `scale` upsamples with nearest neighbour.
+    """
+    import numpy as np
+
+    rgb = preview_latents(latents, width, height, num_frames)[index, :, 0].transpose(1, 2, 0)
+    low, high = rgb.min(axis=(0, 1)), rgb.max(axis=(0, 1))
+    rgb = (rgb - low) / np.maximum(high - low, 1e-6)
+    image = (rgb * 255 + 0.5).astype(np.uint8)
+    return image.repeat(scale, axis=0).repeat(scale, axis=1)
+
+
+def encode_jpeg(image, quality: int = 70) -> bytes:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
@@ -0,0 +1,112 @@
+"""Persistent cache for Gemma-enhanced prompts"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_PROMPT_CACHE_PATH = Path(__file__).parent.parent.parent / "cache" / "prompts.sqlite"
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so trivially different spellings share a cache entry
+
+    Case is kept on purpose: "letter A" and "letter a" are different requests.
+    """
+    return " ".join(prompt.split())
+
+
+class PromptCache:
+    """In-process LRU in front of a size-bounded SQLite store"""
+
+    def __init__(
+        self,
+        path: str = None,
+        max_memory_entries: int = 1024,
+        max_disk_entries: int = 100_000,
+    ):
+        self.path = Path(path or DEFAULT_PROMPT_CACHE_PATH)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS prompts ("
+            " key TEXT PRIMARY KEY,"
+            " enhanced TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS prompts_last_used ON prompts (last_used)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(prompt: str, model_id: str, **params) -> str:
+        """Hash of the normalized prompt, enhancer model and sampling params"""
+        payload = json.dumps(
+            {"prompt": normalize_prompt(prompt), "model": model_id, "params": params},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+            row = self._db.execute(
+                "SELECT enhanced FROM prompts WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._db.execute(
+                "UPDATE prompts SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self._db.commit()
+            self._remember(key, row[0])
+            self.hits += 1
+            self.disk_hits += 1
+            return row[0]
+
+    def put(self, key: str, enhanced: str):
+        with self._lock:
+            self._remember(key, enhanced)
+            self._db.execute(
+                "INSERT OR REPLACE INTO prompts (key, enhanced, last_used) VALUES (?, ?, ?)",
+                (key, enhanced, time.time()),
+            )
+            # Trim the least recently used rows once over the size bound
+            self._db.execute(
+                "DELETE FROM prompts WHERE key IN ("
+                " SELECT key FROM prompts ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,),
+            )
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "memory_entries": len(self._memory),
+            }
+
+    def _remember(self, key: str, enhanced: str):
+        self._memory[key] = enhanced
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
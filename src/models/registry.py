@@ -0,0 +1,190 @@
+"""Registry of named model variants with budgeted, least-recently-used residency"""
+import gc
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+
+@dataclass(frozen=True)
+class ModelVariant:
+    """A loadable checkpoint and the memory it needs once resident"""
+
+    name: str
+    checkpoint_path: str
+    vram_gb: float
+    kind: str = "t2vid"
+    precision: str = "bf16"
+
+
+def total_host_memory_gb() -> float:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024**3
+    except (ValueError, OSError, AttributeError):
+        return 64.0
+
+
+def total_vram_gb(device: str = "cuda") -> float:
+    try:
+        import torch
+
+        if torch.cuda.is_available():
+            return torch.cuda.get_device_properties(device).total_memory / 1024**3
+    except Exception:
+        pass
+    return 0.0
+
+
+class ModelRegistry:
+    """Loads variants on first use and keeps as many on the GPU as the budget allows
+
+    When a variant is requested and the VRAM budget is exhausted, the least
+    recently used variants are offloaded to host RAM (if they fit in the host
+    budget and the pipeline supports `.to()`) or dropped entirely. Switching
+    back to an offloaded variant is a host-to-device copy instead of a reload
+    from disk.
+
+    `loader(variant, device)` builds a pipeline for a variant. Budgets are in GB
+    and should leave room for activations and the prompt enhancer.
+
+    Pinned variants are never evicted, so one thread loading a model can't
+    pull a pipeline out from under another thread still using it; when only
+    pinned variants are left the new one loads over budget.
+    """
+
+    def __init__(
+        self,
+        variants: dict,
+        loader: Callable[[ModelVariant, str], object],
+        vram_budget_gb: float = None,
+        host_budget_gb: float = None,
+        device: str = "cuda",
+    ):
+        self.variants = dict(variants)
+        self.loader = loader
+        self.device = device
+        self._vram_budget_gb = vram_budget_gb
+        self._host_budget_gb = host_budget_gb
+        self._on_device = OrderedDict()  # name -> pipeline, least recently used first
+        self._offloaded = OrderedDict()
+        self._pins = {}  # name -> pin count
+        self._lock = threading.RLock()
+
+    @property
+    def vram_budget_gb(self) -> float:
+        # Resolved on first use so constructing a registry doesn't import torch
+        if self._vram_budget_gb is None:
+            self._vram_budget_gb = total_vram_gb(self.device)
+        return self._vram_budget_gb
+
+    @property
+    def host_budget_gb(self) -> float:
+        if self._host_budget_gb is None:
+            self._host_budget_gb = total_host_memory_gb() / 2
+        return self._host_budget_gb
+
+    def register(self, variant: ModelVariant):
+        self.variants[variant.name] = variant
+
+    def get(self, name: str):
+        """Pipeline for `name` on the device, loading or restoring it if needed"""
+        if name not in self.variants:
+            raise KeyError(f"Unknown model variant: {name} (known: {', '.join(self.variants)})")
+
+        with self._lock:
+            if name in self._on_device:
+                self._on_device.move_to_end(name)
+                return self._on_device[name]
+
+            variant = self.variants[name]
+            self._make_room(variant.vram_gb)
+
+            if name in self._offloaded:
+                print(f"Restoring {name} from host memory...")
+                pipeline = self._offloaded.pop(name).to(self.device)
+            else:
+                print(f"Loading model variant {name}...")
+                pipeline = self.loader(variant, self.device)
+
+            self._on_device[name] = pipeline
+            return pipeline
+
+    def pin(self, name: str):
+        """Keep `name` on the device until a matching `unpin`; pins nest"""
+        with self._lock:
+            self._pins[name] = self._pins.get(name, 0) + 1
+
+    def unpin(self, name: str):
+        with self._lock:
+            count = self._pins.pop(name, 0) - 1
+            if count > 0:
+                self._pins[name] = count
+
+    @contextmanager
+    def pinned(self, *names: str):
+        """Pin `names` for the duration of the block"""
+        names = [name for name in names if name is not None]
+        for name in names:
+            self.pin(name)
+        try:
+            yield
+        finally:
+            for name in names:
+                self.unpin(name)
+
+    def resident(self) -> dict:
+        """Where each loaded variant currently lives"""
+        with self._lock:
+            return {
+                **{name: "host" for name in self._offloaded},
+                **{name: "device" for name in self._on_device},
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "vram_budget_gb": self.vram_budget_gb,
+                "vram_used_gb": self._used(self._on_device),
+                "host_budget_gb": self.host_budget_gb,
+                "host_used_gb": self._used(self._offloaded),
+                "resident": self.resident(),
+                "pinned": sorted(self._pins),
+            }
+
+    def _used(self, pipelines: dict) -> float:
+        return sum(self.variants[name].vram_gb for name in pipelines)
+
+    def _make_room(self, needed_gb: float):
+        while self._used(self._on_device) + needed_gb > self.vram_budget_gb:
+            name = next((n for n in self._on_device if n not in self._pins), None)
+            if name is None:
+                if self._on_device:
+                    print(f"Warning: loading over the VRAM budget; in use: {', '.join(self._on_device)}")
+                return
+            self._evict(name, self._on_device.pop(name))
+
+    def _evict(self, name: str, pipeline):
+        size = self.variants[name].vram_gb
+        while self._offloaded and self._used(self._offloaded) + size > self.host_budget_gb:
+            self._offloaded.popitem(last=False)
+
+        if hasattr(pipeline, "to") and size <= self.host_budget_gb:
+            print(f"Offloading {name} to host memory")
+            self._offloaded[name] = pipeline.to("cpu")
+        else:
+            print(f"Unloading {name}")
+        del pipeline
+        self.release_memory()
+
+    def release_memory(self):
+        """Collect garbage and return cached, unused device memory"""
+        gc.collect()
+        try:
+            import torch
+
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
@@ -0,0 +1,286 @@
+"""Staging of model weights from the network volume onto local disk
+
+Usage:
+    python -m src.models.staging                 # stage every checkpoint present under models/
+    python -m src.models.staging models/gemma --workers 16 --verify
+"""
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+# Where staged copies live; "off" disables staging
+STAGING_DIR_ENV = "MAGIMA_STAGING_DIR"
+DEFAULT_STAGING_DIR = Path.home() / ".cache" / "magima" / "weights"
+
+# RunPod mounts the network volume here; weights under it are staged by default
+NETWORK_VOLUME = Path("/workspace")
+
+CHUNK_BYTES = 32 * 1024 * 1024
+SIDECAR = ".staged.json"
+
+
+def default_stager() -> Optional["WeightStager"]:
+    """The stager MAGIMA_STAGING_DIR asks for, or one for a RunPod network volume
+
+    Without the variable, staging is on only when /workspace is a separate
+    mount, i.e. weights would otherwise be read over the network.
+    """
+    value = os.environ.get(STAGING_DIR_ENV)
+    if value is not None:
+        return None if value.lower() in ("", "0", "off", "none") else WeightStager(value)
+    if os.path.ismount(NETWORK_VOLUME):
+        return WeightStager(DEFAULT_STAGING_DIR, only_under=NETWORK_VOLUME)
+    return None
+
+
+class WeightStager:
+    """Copies checkpoints (files or directories) to a local cache and serves them from there
+
+    The first `stage` of a path copies it with `workers` parallel chunked
+    reads, hashes every chunk as it is read, and re-reads the copy to check
+    those hashes before publishing it. Later calls only compare the source's
+    size and mtime against the record, so a warm start costs a few stat()s
+    and the loaders memory-map the local file. Whole staged entries are
+    evicted least recently used when the cache would exceed `max_bytes` or
+    leave less than `reserve_bytes` free on the disk. Paths that don't exist
+    (hub model IDs, the fake model) are returned unchanged.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int = None,
+        reserve_bytes: int = 10 * 1024**3,
+        workers: int = 8,
+        chunk_bytes: int = CHUNK_BYTES,
+        verify: bool = False,
+        only_under: Path = None,
+    ):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.reserve_bytes = reserve_bytes
+        self.workers = workers
+        self.chunk_bytes = chunk_bytes
+        self.verify = verify
+        self.only_under = Path(only_under).resolve() if only_under else None
+        self.reports = []
+
+    def stage(self, source: str) -> str:
+        """Local path to use instead of `source`, copying it there first if needed"""
+        source = Path(source)
+        if not source.exists():
+            return str(source)
+        source = source.resolve()
+        if self.only_under is not None and self.only_under not in source.parents:
+            return str(source)
+
+        entry = self.root / hashlib.sha256(str(source).encode("utf-8")).hexdigest()[:16]
+        target = entry / source.name if source.is_file() else entry
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Several workers may start at once; one copies, the others wait and reuse it
+        with open(self.root / f"{entry.name}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                report = self._stage_locked(source, entry, target)
+            except OSError as e:
+                print(f"Warning: could not stage {source} ({e}); reading it in place")
+                return str(source)
+        self.reports.append(report)
+        if report["bytes_copied"]:
+            print(
+                f"Staged {source.name}: {report['bytes_copied'] / 1024**3:.2f} GB in "
+                f"{report['seconds']:.1f}s ({report['mb_per_s']:.0f} MB/s, {self.workers} workers)"
+            )
+        return str(target)
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            "root": str(self.root),
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "reports": self.reports,
+        }
+
+    def _stage_locked(self, source: Path, entry: Path, target: Path) -> dict:
+        files = [source] if source.is_file() else sorted(p for p in source.rglob("*") if p.is_file())
+        relative = {path: (path.name if source.is_file() else path.relative_to(source).as_posix()) for path in files}
+        record = self._read_sidecar(entry)
+        known = record.get("files", {})
+
+        stale = []
+        for path in files:
+            stat = path.stat()
+            name = relative[path]
+            staged = entry / name
+            meta = known.get(name)
+            fresh = (
+                meta is not None
+                and meta["size"] == stat.st_size
+                and meta["mtime_ns"] == stat.st_mtime_ns
+                and staged.exists()
+                and staged.stat().st_size == stat.st_size
+            )
+            if fresh and self.verify and self._digest(staged) != meta["digest"]:
+                fresh = False
+            if not fresh:
+                stale.append(path)
+
+        needed = sum(path.stat().st_size for path in stale)
+        if needed:
+            self._make_room(needed, keep=entry)
+
+        started = time.perf_counter()
+        for path in stale:
+            name = relative[path]
+            stat = path.stat()
+            digest = self._copy(path, entry / name)
+            known[name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "digest": digest}
+        seconds = time.perf_counter() - started
+
+        names = set(relative.values())
+        record = {"source": str(source), "files": {k: v for k, v in known.items() if k in names}}
+        self._write_sidecar(entry, record)
+        return {
+            "source": str(source),
+            "target": str(target),
+            "bytes": sum(path.stat().st_size for path in files),
+            "bytes_copied": needed,
+            "seconds": round(seconds, 3),
+            "mb_per_s": round(needed / 1024**2 / seconds, 1) if needed and seconds > 0 else None,
+        }
+
+    def _copy(self, source: Path, dest: Path) -> str:
+        """Parallel chunked copy verified chunk by chunk; returns the chunked SHA-256"""
+        size = source.stat().st_size
+        chunks = [(offset, min(self.chunk_bytes, size - offset)) for offset in range(0, size, self.chunk_bytes)]
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        partial = dest.with_name(dest.name + ".partial")
+
+        with open(source, "rb") as src, open(partial, "w+b") as dst:
+            os.ftruncate(dst.fileno(), size)
+
+            def copy(chunk) -> bytes:
+                offset, length = chunk
+                data = os.pread(src.fileno(), length, offset)
+                if len(data) != length:
+                    raise OSError(f"{source} changed size while staging")
+                os.pwrite(dst.fileno(), data, offset)
+                return hashlib.sha256(data).digest()
+
+            def check(chunk) -> bytes:
+                offset, length = chunk
+                return hashlib.sha256(os.pread(dst.fileno(), length, offset)).digest()
+
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stage") as pool:
+                expected = list(pool.map(copy, chunks))
+                dst.flush()
+                os.fsync(dst.fileno())
+                actual = list(pool.map(check, chunks))
+
+        if actual != expected:
+            partial.unlink(missing_ok=True)
+            raise OSError(f"Checksum mismatch staging {source}")
+        os.replace(partial, dest)
+        return hashlib.sha256(b"".join(expected)).hexdigest()
+
+    def _digest(self, path: Path) -> str:
+        """Chunked SHA-256 of a staged file, the same way `_copy` computes it"""
+        size = path.stat().st_size
+        with open(path, "rb") as f:
+            def chunk_hash(offset: int) -> bytes:
+                return hashlib.sha256(os.pread(f.fileno(), min(self.chunk_bytes, size - offset), offset)).digest()
+
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stage") as pool:
+                hashes = list(pool.map(chunk_hash, range(0, size, self.chunk_bytes)))
+        return hashlib.sha256(b"".join(hashes)).hexdigest()
+
+    def _entries(self) -> list:
+        """(last_used, bytes, path) of every staged entry"""
+        entries = []
+        if not self.root.exists():
+            return entries
+        for entry in self.root.iterdir():
+            if not entry.is_dir():
+                continue
+            sidecar = entry / SIDECAR
+            last_used = (sidecar if sidecar.exists() else entry).stat().st_mtime
+            size = sum(p.stat().st_size for p in entry.rglob("*") if p.is_file())
+            entries.append((last_used, size, entry))
+        return entries
+
+    def _make_room(self, needed: int, keep: Path):
+        entries = sorted(e for e in self._entries() if e[2] != keep)
+        total = sum(size for _, size, _ in entries)
+        while entries:
+            free = shutil.disk_usage(self.root).free
+            over_budget = self.max_bytes is not None and total + needed > self.max_bytes
+            if free - needed >= self.reserve_bytes and not over_budget:
+                return
+            _, size, entry = entries.pop(0)
+            # Processes that already mapped these files keep their pages until they exit
+            print(f"Evicting staged weights {entry.name} ({size / 1024**3:.1f} GB)")
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+        if shutil.disk_usage(self.root).free - needed < self.reserve_bytes:
+            raise OSError(f"not enough local disk for {needed / 1024**3:.1f} GB")
+
+    def _read_sidecar(self, entry: Path) -> dict:
+        try:
+            return json.loads((entry / SIDECAR).read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_sidecar(self, entry: Path, record: dict):
+        entry.mkdir(parents=True, exist_ok=True)
+        tmp = entry / f"{SIDECAR}.tmp"
+        tmp.write_text(json.dumps(record, indent=2))
+        # Also refreshes the entry's LRU position
+        os.replace(tmp, entry / SIDECAR)
+
+
+def main():
+    from src.models.ltx import DEFAULT_GEMMA_PATH, DEFAULT_UPSCALER_PATH, MODEL_VARIANTS
+
+    parser = argparse.ArgumentParser(description="Copy model weights to local disk ahead of loading")
+    parser.add_argument("paths", nargs="*", help="Checkpoints or directories (default: every known model present)")
+    parser.add_argument("--dir", default=None, help=f"Staging directory (default ${STAGING_DIR_ENV} or {DEFAULT_STAGING_DIR})")
+    parser.add_argument("--workers", type=int, default=8, help="Parallel chunk readers")
+    parser.add_argument("--max-gb", type=float, default=None, help="Evict down to this size")
+    parser.add_argument("--verify", action="store_true", help="Re-hash copies that are already staged")
+    args = parser.parse_args()
+
+    paths = args.paths or [
+        str(p) for p in [
+            *(v.checkpoint_path for v in MODEL_VARIANTS.values()),
+            DEFAULT_GEMMA_PATH,
+            DEFAULT_UPSCALER_PATH,
+        ]
+        if Path(p).exists()
+    ]
+    stager = WeightStager(
+        args.dir or os.environ.get(STAGING_DIR_ENV) or DEFAULT_STAGING_DIR,
+        max_bytes=int(args.max_gb * 1024**3) if args.max_gb else None,
+        workers=args.workers,
+        verify=args.verify,
+    )
+    for path in dict.fromkeys(paths):
+        print(f"{path} -> {stager.stage(path)}")
+
+    copied = sum(r["bytes_copied"] for r in stager.reports)
+    seconds = sum(r["seconds"] for r in stager.reports)
+    if copied:
+        print(f"Copied {copied / 1024**3:.2f} GB in {seconds:.1f}s ({copied / 1024**2 / seconds:.0f} MB/s)")
+    else:
+        print("Everything was already staged")
+
+
+if __name__ == "__main__":
+    main()
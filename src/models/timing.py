@@ -0,0 +1,105 @@
+"""Wall-clock timing of named stages"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Accumulates seconds spent in named stages
+
+    Safe to record into from several threads, e.g. components loading in
+    parallel. Repeated stages add up; `counts` says how often each ran.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.stages = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def get(self, name: str, default: float = 0.0) -> float:
+        with self._lock:
+            return self.stages.get(name, default)
+
+    def to_dict(self) -> dict:
+        """Stage name -> seconds, rounded for logs and JSON"""
+        with self._lock:
+            return {name: round(seconds, 4) for name, seconds in self.stages.items()}
+
+
+@contextmanager
+def maybe_stage(timer, name: str):
+    """`timer.stage(name)` when a timer is given, otherwise a no-op"""
+    if timer is None:
+        yield
+    else:
+        with timer.stage(name):
+            yield
+
+
+@contextmanager
+def timed_calls(obj, method_name: str, timer, name: str):
+    """Record every call to `obj.method_name` this thread makes inside the block as stage `name`
+
+    Used to time sub-steps of third-party pipelines, such as the VAE decode
+    inside a diffusers call, without changing the pipeline itself. Calls
+    from other threads sharing `obj` meanwhile pass through untimed, so they
+    aren't charged to this block's timer.
+    """
+    if timer is None or obj is None or not hasattr(obj, method_name):
+        yield
+        return
+
+    original = getattr(obj, method_name)
+    patched_instance = method_name in vars(obj)
+    owner = threading.get_ident()
+
+    def timed(*args, **kwargs):
+        if threading.get_ident() != owner:
+            return original(*args, **kwargs)
+        with timer.stage(name):
+            return original(*args, **kwargs)
+
+    setattr(obj, method_name, timed)
+    try:
+        yield
+    finally:
+        if patched_instance:
+            setattr(obj, method_name, original)
+        else:
+            delattr(obj, method_name)
+
+
+def reset_peak_memory():
+    """Start a new peak-VRAM measurement window (no-op without CUDA)"""
+    import sys
+
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.reset_peak_memory_stats()
+
+
+def peak_memory() -> dict:
+    """Peak VRAM since the last reset and the process's peak resident set size"""
+    import resource
+    import sys
+
+    # ru_maxrss is KiB on Linux
+    peak = {"peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        peak["peak_vram_bytes"] = torch.cuda.max_memory_allocated()
+    return peak
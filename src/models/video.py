@@ -0,0 +1,236 @@
+"""Video outputs: lazy on-disk videos, contiguous frame buffers and streaming encode"""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Iterator, Optional
+
+# Clips larger than this are buffered in a memory-mapped temp file
+MEMMAP_THRESHOLD_BYTES = 2 * 1024**3
+
+
+def atomic_move(src: str, dst: str) -> str:
+    """Move a file so `dst` never holds a partial video
+
+    Same-filesystem moves are a rename; across filesystems the file is copied
+    next to `dst` first and then renamed over it.
+    """
+    dst_path = Path(dst)
+    dst_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.replace(src, dst_path)
+    except OSError:
+        fd, tmp = tempfile.mkstemp(suffix=".partial", dir=dst_path.parent)
+        os.close(fd)
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst_path)
+        os.unlink(src)
+    return str(dst_path)
+
+
+class GeneratedVideo:
+    """An encoded video file that behaves like a lazy sequence of frames
+
+    Pipelines that write MP4s themselves return this instead of a decoded frame
+    list, so saving is a file move rather than a decode and second lossy encode.
+    Frames are decoded only when a caller iterates or indexes the video.
+    """
+
+    def __init__(self, path: str, fps: int = 24, temporary: bool = False, frames=None):
+        self.path = str(path)
+        self.fps = fps
+        self.temporary = temporary
+        # Frames already in memory (e.g. the ones just encoded) skip the decode
+        self._frames = frames
+
+    def iter_frames(self) -> Iterator:
+        """Decode frames one at a time without holding the whole clip"""
+        import imageio
+
+        reader = imageio.get_reader(self.path)
+        try:
+            for frame in reader:
+                yield frame
+        finally:
+            reader.close()
+
+    @property
+    def frames(self):
+        """All frames, decoded on first access"""
+        if self._frames is None:
+            self._frames = list(self.iter_frames())
+        return self._frames
+
+    def __iter__(self):
+        if self._frames is not None:
+            return iter(self._frames)
+        return self.iter_frames()
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+    def save(self, output_path: str) -> str:
+        """Move (or copy, for non-temporary files) the video to `output_path`"""
+        if Path(output_path).resolve() == Path(self.path).resolve():
+            return self.path
+        if self.temporary:
+            self.path = atomic_move(self.path, output_path)
+            self.temporary = False
+        else:
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(self.path, output_path)
+            self.path = str(output_path)
+        return self.path
+
+    def discard(self):
+        """Delete the file if it is still a temporary"""
+        if self.temporary:
+            Path(self.path).unlink(missing_ok=True)
+
+
+class FrameBuffer:
+    """Preallocated contiguous (T, H, W, 3) uint8 frame store
+
+    Long clips are backed by a memory-mapped temp file so they don't have to fit
+    in host RAM. Indexing and iteration yield per-frame views, never copies.
+    """
+
+    def __init__(
+        self,
+        num_frames: int,
+        height: int,
+        width: int,
+        memmap_threshold: int = MEMMAP_THRESHOLD_BYTES,
+    ):
+        import numpy as np
+
+        shape = (num_frames, height, width, 3)
+        self._memmap_path = None
+        if num_frames * height * width * 3 > memmap_threshold:
+            fd, self._memmap_path = tempfile.mkstemp(suffix=".frames")
+            os.close(fd)
+            self.array = np.memmap(self._memmap_path, dtype=np.uint8, mode="w+", shape=shape)
+        else:
+            self.array = np.empty(shape, dtype=np.uint8)
+
+    @classmethod
+    def from_frames(
+        cls,
+        frames,
+        crop_height: int = None,
+        writer=None,
+        memmap_threshold: int = MEMMAP_THRESHOLD_BYTES,
+    ) -> "FrameBuffer":
+        """Pack pipeline frames into a buffer, streaming each one to `writer`
+
+        Accepts a float array in [0, 1] or uint8 array of shape (T, H, W, 3)
+        (diffusers `output_type="np"`), or a list of PIL images / arrays. With
+        `crop_height`, the returned buffer is the center-cropped view.
+        """
+        import numpy as np
+
+        first = np.asarray(frames[0])
+        buffer = cls(len(frames), first.shape[0], first.shape[1], memmap_threshold)
+        view = buffer.crop(height=crop_height) if crop_height else buffer
+        for i, frame in enumerate(frames):
+            buffer.write(i, frame)
+            if writer is not None:
+                writer.write(view.array[i])
+        return view
+
+    def write(self, index: int, frame):
+        """Store one frame in place, scaling floats in [0, 1] to uint8"""
+        import numpy as np
+
+        frame = np.asarray(frame)
+        if frame.dtype == np.uint8:
+            self.array[index] = frame
+        else:
+            # Round and clip straight into the slot without a full-size temporary
+            np.clip(frame * 255.0 + 0.5, 0, 255, out=self.array[index], casting="unsafe")
+
+    def crop(self, height: int = None, width: int = None) -> "FrameBuffer":
+        """Center-crop every frame at once as a view (e.g. 1088 -> 1080 letterbox)
+
+        Height-only crops keep each frame contiguous, so encoding stays copy-free.
+        """
+        _, h, w, _ = self.array.shape
+        top = (h - height) // 2 if height else 0
+        left = (w - width) // 2 if width else 0
+        view = FrameBuffer.__new__(FrameBuffer)
+        view._memmap_path = None
+        view._parent = self
+        view.array = self.array[:, top:top + (height or h), left:left + (width or w)]
+        return view
+
+    @property
+    def shape(self) -> tuple:
+        return self.array.shape
+
+    def __len__(self) -> int:
+        return self.array.shape[0]
+
+    def __iter__(self):
+        return iter(self.array)
+
+    def __getitem__(self, index):
+        return self.array[index]
+
+    def __del__(self):
+        if getattr(self, "_memmap_path", None):
+            del self.array
+            Path(self._memmap_path).unlink(missing_ok=True)
+
+
+class StreamingVideoWriter:
+    """Encodes frames by piping them to ffmpeg as they arrive
+
+    The MP4 is written to a temp file beside `output_path` and renamed into
+    place on a clean close, so readers never see a partial video.
+    """
+
+    def __init__(self, output_path: str, width: int, height: int, fps: int = 24, quality: int = 8):
+        import imageio_ffmpeg
+
+        self.output_path = str(output_path)
+        Path(self.output_path).parent.mkdir(parents=True, exist_ok=True)
+        # Not named *.mp4, so the output manifest never lists it
+        fd, self._temp_path = tempfile.mkstemp(suffix=".mp4.partial", dir=Path(self.output_path).parent)
+        os.close(fd)
+        self.frames_written = 0
+        self._gen = imageio_ffmpeg.write_frames(
+            self._temp_path,
+            (width, height),
+            fps=fps,
+            quality=quality,
+            macro_block_size=1,
+            output_params=["-f", "mp4"],
+        )
+        self._gen.send(None)
+
+    def write(self, frame):
+        """Send one (H, W, 3) uint8 frame to the encoder"""
+        import numpy as np
+
+        self._gen.send(np.ascontiguousarray(frame))
+        self.frames_written += 1
+
+    def close(self):
+        self._gen.close()
+        os.replace(self._temp_path, self.output_path)
+
+    def abort(self):
+        self._gen.close()
+        Path(self._temp_path).unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,267 @@
+"""Bulk rendering of a JSONL/CSV prompt list with one model load and a resumable manifest"""
+import csv
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+from src.models.cost_model import CostModel
+from src.models.ltx import MODEL_VARIANTS, LTXVideoGenerator
+from src.models.timing import StageTimer
+from src.pipelines.generate import (
+    RenderRejected,
+    build_config,
+    generate_video,
+    render_frames,
+)
+
+# Per-row keys, as generate_video arguments, and how to parse them from CSV text
+FIELD_TYPES = {
+    "prompt": str,
+    "negative_prompt": str,
+    "preset": str,
+    "model": str,
+    "width": int,
+    "height": int,
+    "num_frames": int,
+    "steps": int,
+    "guidance": float,
+    "seed": int,
+    "enhance_prompt": bool,
+    "film_template": bool,
+    "no_enhance": bool,
+    "segment_frames": int,
+    "overlap_frames": int,
+}
+
+# Column names people reach for that mean the same thing
+ALIASES = {
+    "frames": "num_frames",
+    "num_inference_steps": "steps",
+    "guidance_scale": "guidance",
+    "use_film_template": "film_template",
+}
+
+# Keys of build_config; the rest of a row is passed straight to generate_video
+CONFIG_KEYS = (
+    "preset", "width", "height", "num_frames", "steps", "guidance", "enhance_prompt",
+    "film_template", "no_enhance", "model", "segment_frames", "overlap_frames",
+)
+
+
+def parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+def load_items(path: str) -> list:
+    """Rows of a .jsonl or .csv file as generate_video overrides, each with an `id`
+
+    Rows without an `id` are numbered by position; `output` names the file
+    (default `<id>.mp4`). Empty CSV cells fall back to the preset.
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    items = []
+    for index, row in enumerate(rows):
+        item = {"id": str(row.get("id") or f"item_{index:04d}")}
+        item["output"] = row.get("output") or f"{item['id']}.mp4"
+        for key, value in row.items():
+            key = ALIASES.get(key, key)
+            if key not in FIELD_TYPES or value is None or value == "":
+                continue
+            parse = parse_bool if FIELD_TYPES[key] is bool else FIELD_TYPES[key]
+            item[key] = parse(value)
+        if not item.get("prompt"):
+            raise ValueError(f"{path}: row {index + 1} has no prompt")
+        items.append(item)
+
+    ids = [item["id"] for item in items]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"{path}: item ids must be unique")
+    return items
+
+
+def item_hash(item: dict) -> str:
+    """Fingerprint of everything that affects an item's output"""
+    payload = json.dumps(item, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class Manifest:
+    """Per-item progress, rewritten atomically after every item
+
+    Lets a preempted spot pod pick up where it stopped: items recorded as
+    completed, whose video still exists and whose settings are unchanged,
+    are skipped on the next run.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.items = {}
+        if self.path.exists():
+            self.items = json.loads(self.path.read_text()).get("items", {})
+
+    def is_done(self, item_id: str, fingerprint: str) -> bool:
+        entry = self.items.get(item_id)
+        return (
+            entry is not None
+            and entry.get("status") == "completed"
+            and entry.get("hash") == fingerprint
+            and Path(entry.get("video_path") or "").exists()
+        )
+
+    def update(self, item_id: str, **fields):
+        self.items.setdefault(item_id, {}).update(fields)
+        self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps({"items": self.items}, indent=2))
+        os.replace(temp_path, self.path)
+
+
+def bucket_key(item: dict, defaults: dict) -> tuple:
+    """Model and render shape; items in the same bucket reuse the same specialization"""
+    config = build_config(**{k: v for k, v in {**defaults, **item}.items() if k in CONFIG_KEYS})
+    return (
+        config["model"],
+        config["width"],
+        config["height"],
+        render_frames(config),
+        config["num_inference_steps"],
+    )
+
+
+def run_batch(
+    batch_path: str,
+    output_dir: str = "outputs",
+    defaults: dict = None,
+    manifest_path: str = None,
+    admission: str = "reject",
+    deterministic_enhance: bool = False,
+    generator: LTXVideoGenerator = None,
+    cost_model: CostModel = None,
+) -> dict:
+    """Render every row of `batch_path`, loading the models once
+
+    `defaults` are generate_video overrides applied to every row (rows win).
+    A `generator` that is already loaded (the daemon's) is used as is.
+    Work is ordered by bucket (model, then shape) so the pipeline switches
+    model and re-specializes as rarely as possible. Returns the summary that
+    is also written to `batch_summary.json` in the output directory.
+    """
+    defaults = defaults or {}
+    output_dir = Path(output_dir)
+    manifest = Manifest(manifest_path or output_dir / "manifest.json")
+
+    items = load_items(batch_path)
+    buckets = {item["id"]: bucket_key(item, defaults) for item in items}
+    hashes = {item["id"]: item_hash({**defaults, **item}) for item in items}
+    # Stable sort: rows keep their file order within a bucket
+    items.sort(key=lambda item: buckets[item["id"]])
+
+    pending = [item for item in items if not manifest.is_done(item["id"], hashes[item["id"]])]
+    print(f"Batch: {len(items)} items, {len(items) - len(pending)} already done, "
+          f"{len(set(buckets[i['id']] for i in pending))} shape buckets to render")
+
+    if pending:
+        configs = [
+            build_config(**{k: v for k, v in {**defaults, **item}.items() if k in CONFIG_KEYS})
+            for item in pending
+        ]
+        if generator is None:
+            generator = LTXVideoGenerator(
+                use_prompt_enhancement=any(c.get("enhance_prompt", True) for c in configs),
+                deterministic_enhancement=deterministic_enhance,
+                model=configs[0]["model"],
+            )
+            generator.load()
+        cost_model = cost_model or CostModel(MODEL_VARIANTS)
+
+    for n, item in enumerate(pending, 1):
+        print(f"\n[{n}/{len(pending)}] {item['id']}")
+        trace = StageTimer()
+        manifest.update(item["id"], status="processing", hash=hashes[item["id"]],
+                        bucket=list(buckets[item["id"]]), started_at=time.time())
+        kwargs = {k: v for k, v in {**defaults, **item}.items() if k not in ("id", "output")}
+        started = time.perf_counter()
+        try:
+            video_path = generate_video(
+                output_dir=str(output_dir),
+                output_name=item["output"],
+                admission=admission,
+                generator=generator,
+                cost_model=cost_model,
+                trace=trace,
+                **kwargs,
+            )
+        except RenderRejected as e:
+            manifest.update(item["id"], status="rejected", error=str(e), finished_at=time.time())
+            continue
+        except Exception as e:
+            manifest.update(item["id"], status="failed", error=str(e),
+                            seconds=round(time.perf_counter() - started, 3),
+                            stages=trace.to_dict(), finished_at=time.time())
+            continue
+        manifest.update(
+            item["id"],
+            status="completed",
+            error=None,
+            video_path=video_path,
+            seconds=round(time.perf_counter() - started, 3),
+            stages=trace.to_dict(),
+            finished_at=time.time(),
+        )
+
+    summary = summarize(items, manifest)
+    summary_path = output_dir / "batch_summary.json"
+    summary_path.write_text(json.dumps(summary, indent=2))
+    print_summary(summary)
+    print(f"\nSummary written to {summary_path}")
+    return summary
+
+
+def summarize(items: list, manifest: Manifest) -> dict:
+    rows = []
+    for item in items:
+        entry = manifest.items.get(item["id"], {})
+        rows.append({
+            "id": item["id"],
+            "status": entry.get("status", "pending"),
+            "bucket": entry.get("bucket"),
+            "seconds": entry.get("seconds"),
+            "stages": entry.get("stages", {}),
+            "video_path": entry.get("video_path"),
+            "error": entry.get("error"),
+        })
+    timed = [row["seconds"] for row in rows if row["status"] == "completed" and row["seconds"]]
+    counts = {}
+    for row in rows:
+        counts[row["status"]] = counts.get(row["status"], 0) + 1
+    return {
+        "items": rows,
+        "counts": counts,
+        "total_seconds": round(sum(timed), 3),
+        "mean_seconds": round(sum(timed) / len(timed), 3) if timed else None,
+    }
+
+
+def print_summary(summary: dict):
+    print(f"\n{'id':<24} {'status':<10} {'seconds':>9}  slowest stages")
+    for row in summary["items"]:
+        stages = sorted(row["stages"].items(), key=lambda kv: kv[1], reverse=True)[:3]
+        stage_text = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in stages)
+        seconds = f"{row['seconds']:.1f}" if row["seconds"] is not None else "-"
+        print(f"{row['id']:<24} {row['status']:<10} {seconds:>9}  {stage_text}")
+    counts = ", ".join(f"{count} {status}" for status, count in sorted(summary["counts"].items()))
+    print(f"\n{counts}; {summary['total_seconds']:.1f}s rendering in total")
@@ -0,0 +1,211 @@
+"""Resident generation daemon: keeps the models loaded and renders for CLI clients
+
+Usage:
+    python -m src.pipelines.daemon                         # load the default model and serve
+    python -m src.pipelines.daemon --model fake --no-enhance
+    python -m src.pipelines.daemon --status
+    python -m src.pipelines.daemon --stop
+
+`python -m src.pipelines.generate` submits to a running daemon instead of
+loading the models itself (pass --local to render in-process anyway).
+"""
+import argparse
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+
+# Where the daemon listens; override with MAGIMA_DAEMON_SOCKET or --socket
+SOCKET_ENV = "MAGIMA_DAEMON_SOCKET"
+DEFAULT_SOCKET = Path.home() / ".cache" / "magima" / "generate.sock"
+
+
+def socket_path(path: str = None) -> Path:
+    return Path(path or os.environ.get(SOCKET_ENV) or DEFAULT_SOCKET)
+
+
+def connect(path: str = None):
+    """Connection to a running daemon, or None if none is listening"""
+    path = socket_path(path)
+    if not path.exists():
+        return None
+    try:
+        return Client(str(path), family="AF_UNIX")
+    except (ConnectionRefusedError, FileNotFoundError):
+        return None
+
+
+def request(conn, message: tuple, echo=print):
+    """Send one request and wait for its answer, echoing the daemon's log lines
+
+    Messages are ("generate", kwargs), ("batch", kwargs), ("status",) and
+    ("stop",). Replies are any number of ("log", text) followed by
+    ("result", value) or ("error", type_name, message).
+    """
+    conn.send(message)
+    while True:
+        reply = conn.recv()
+        if reply[0] == "log":
+            echo(reply[1], end="")
+        elif reply[0] == "result":
+            return reply[1]
+        else:
+            raise DaemonError(reply[1], reply[2])
+
+
+class DaemonError(Exception):
+    """An exception raised by the daemon while handling a request"""
+
+    def __init__(self, type_name: str, message: str):
+        super().__init__(message)
+        self.type_name = type_name
+
+
+class _LogRelay:
+    """stdout replacement that copies each write to the daemon's own stdout and to the client"""
+
+    def __init__(self, conn, stream):
+        self.conn = conn
+        self.stream = stream
+        self.attached = True
+
+    def write(self, text: str) -> int:
+        self.stream.write(text)
+        if self.attached and text:
+            try:
+                self.conn.send(("log", text))
+            except (BrokenPipeError, OSError):
+                # The client went away; the render still finishes
+                self.attached = False
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class GenerationDaemon:
+    """Serves render requests on a Unix socket from one warm LTXVideoGenerator
+
+    Requests run one at a time, in the order clients connect; a client that
+    connects while a render runs waits for its turn. The socket's directory
+    is private to the user, as requests are pickled.
+    """
+
+    def __init__(self, generator, path: str = None):
+        from src.models.cost_model import CostModel
+        from src.models.ltx import MODEL_VARIANTS
+
+        self.generator = generator
+        self.path = socket_path(path)
+        self.cost_model = CostModel(MODEL_VARIANTS)
+        self.started_at = time.time()
+        self.requests = 0
+        self._running = False
+
+    def serve(self):
+        if connect(self.path) is not None:
+            raise SystemExit(f"A daemon is already listening on {self.path}")
+        self.path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        # Left behind by a daemon that didn't shut down cleanly
+        self.path.unlink(missing_ok=True)
+        listener = Listener(str(self.path), family="AF_UNIX", backlog=16)
+        os.chmod(self.path, 0o600)
+        print(f"Daemon ready on {self.path} (pid {os.getpid()})")
+        self._running = True
+        try:
+            while self._running:
+                with listener.accept() as conn:
+                    self._handle(conn)
+        finally:
+            listener.close()
+
+    def status(self) -> dict:
+        generator = self.generator
+        return {
+            "pid": os.getpid(),
+            "socket": str(self.path),
+            "model": generator.active_model,
+            "uptime": round(time.time() - self.started_at, 1),
+            "requests": self.requests,
+            "models": generator.registry.stats(),
+            "prompt_enhancement": generator.prompt_enhancer is not None,
+        }
+
+    def _handle(self, conn):
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        kind = message[0]
+        try:
+            if kind == "status":
+                result = self.status()
+            elif kind == "stop":
+                self._running = False
+                result = "stopping"
+            elif kind in ("generate", "batch"):
+                self.requests += 1
+                with redirect_stdout(_LogRelay(conn, sys.stdout)):
+                    result = self._render(kind, dict(message[1]))
+            else:
+                raise ValueError(f"Unknown request: {kind}")
+        except Exception as e:
+            self._reply(conn, ("error", type(e).__name__, str(e)))
+            return
+        self._reply(conn, ("result", result))
+
+    def _render(self, kind: str, kwargs: dict):
+        from src.pipelines.generate import generate_video
+
+        enhancer = self.generator.prompt_enhancer
+        if enhancer is not None:
+            # Per request, like the flag of an in-process run
+            enhancer.deterministic = kwargs.get("deterministic_enhance", False)
+        if kind == "batch":
+            from src.pipelines.batch import run_batch
+
+            return run_batch(generator=self.generator, cost_model=self.cost_model, **kwargs)
+        return generate_video(generator=self.generator, cost_model=self.cost_model, **kwargs)
+
+    @staticmethod
+    def _reply(conn, message: tuple):
+        try:
+            conn.send(message)
+        except (BrokenPipeError, OSError):
+            pass
+
+
+def main():
+    from src.models.ltx import DEFAULT_MODEL, GENERATION_KINDS, MODEL_VARIANTS
+
+    parser = argparse.ArgumentParser(description="Keep the generation models loaded for CLI renders")
+    parser.add_argument("--socket", help=f"Unix socket path (default ${SOCKET_ENV} or {DEFAULT_SOCKET})")
+    parser.add_argument("--model", "-m", default=DEFAULT_MODEL,
+                        choices=[n for n, v in MODEL_VARIANTS.items() if v.kind in GENERATION_KINDS],
+                        help="Model to load at startup (others load on first use)")
+    parser.add_argument("--device", default="cuda", help="Device to render on")
+    parser.add_argument("--no-enhance", action="store_true", help="Don't load Gemma")
+    parser.add_argument("--status", action="store_true", help="Print the running daemon's status and exit")
+    parser.add_argument("--stop", action="store_true", help="Stop the running daemon after its current request")
+    args = parser.parse_args()
+
+    if args.status or args.stop:
+        conn = connect(args.socket)
+        if conn is None:
+            raise SystemExit(f"No daemon listening on {socket_path(args.socket)}")
+        with conn:
+            print(request(conn, ("stop",) if args.stop else ("status",)))
+        return
+
+    from src.models.ltx import LTXVideoGenerator
+
+    generator = LTXVideoGenerator(model=args.model, device=args.device, use_prompt_enhancement=not args.no_enhance)
+    generator.load()
+    print(f"Startup profile: {generator.startup_profile.to_dict()}")
+    GenerationDaemon(generator, args.socket).serve()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,45 @@
 """Video generation pipeline with presets and prompt enhancement"""
 import argparse
+import time
+from functools import partial
 from pathlib import Path
 from datetime import datetime
 
-from src.models.ltx import LTXVideoGenerator, PRESETS
+from src.models.cost_model import CostModel, is_out_of_memory, parse_policy
+from src.models.long_video import fit_overlap
+from src.models.ltx import (
+    DEFAULT_MODEL,
+    GENERATION_KINDS,
+    MODEL_VARIANTS,
+    LTXVideoGenerator,
+    PRESETS,
+)
+from src.models.timing import StageTimer, peak_memory, reset_peak_memory
 
 
-def generate_video(
-    prompt: str,
-    output_dir: str = "outputs",
+class RenderRejected(Exception):
+    """The cost model predicts a render won't fit and no admission fallback applies"""
+
+
+def build_config(
     preset: str = None,
     width: int = None,
     height: int = None,
     num_frames: int = None,
     steps: int = None,
     guidance: float = None,
-    seed: int = None,
     enhance_prompt: bool = None,
     film_template: bool = None,
-    negative_prompt: str = None,
     no_enhance: bool = False,
-):
-    """Generate a video from a text prompt
-
-    Args:
-        prompt: Text description of the video
-        output_dir: Directory to save output
-        preset: Use a preset configuration (kids-1080p-5sec, kids-720p-5sec, fast-test)
-        width: Video width (overrides preset)
-        height: Video height (overrides preset)
-        num_frames: Number of frames (overrides preset)
-        steps: Inference steps (overrides preset)
-        guidance: Guidance scale (overrides preset)
-        seed: Random seed
-        enhance_prompt: Use Gemma to enhance prompt (overrides preset)
-        film_template: Wrap prompt in film-style template (overrides preset)
-        negative_prompt: Custom negative prompt
-        no_enhance: Disable prompt enhancement
-    """
+    model: str = None,
+    segment_frames: int = None,
+    overlap_frames: int = None,
+) -> dict:
+    """Preset defaults (kids-1080p-5sec if none is given) with explicit overrides applied"""
     # Start with preset defaults
     config = {}
     if preset and preset in PRESETS:
         config = PRESETS[preset].copy()
-        print(f"Using preset: {preset}")
     else:
         # Default to kids-1080p-5sec
         config = PRESETS["kids-1080p-5sec"].copy()
@@ -64,46 +61,204 @@ def generate_video(
         config["use_film_template"] = film_template
     if no_enhance:
         config["enhance_prompt"] = False
+    if model is not None:
+        config["model"] = model
+    if segment_frames is not None:
+        config["segment_frames"] = segment_frames
+    if overlap_frames is not None:
+        config["overlap_frames"] = overlap_frames
+    config.setdefault("model", DEFAULT_MODEL)
+    return config
+
+
+def is_long_video(config: dict) -> bool:
+    return config["num_frames"] > config.get("segment_frames", config["num_frames"])
+
+
+def render_frames(config: dict) -> int:
+    """Frames in one pipeline call; long clips render one segment at a time"""
+    return config["segment_frames"] if is_long_video(config) else config["num_frames"]
+
+
+def admit_config(config: dict, cost_model: CostModel, admission: str = "reject"):
+    """Check `config` against the cost model before loading anything
+
+    Adjusts `config` in place when the policy reroutes or downgrades, and
+    raises RenderRejected when nothing fits. Returns the cost estimate.
+    """
+    estimate = cost_model.estimate(
+        config["model"], config["width"], config["height"],
+        render_frames(config), config["num_inference_steps"],
+    )
+    if admission == "off":
+        return estimate
+
+    decision = cost_model.admit(
+        config["model"], config["width"], config["height"],
+        render_frames(config), config["num_inference_steps"],
+        policy=parse_policy(admission),
+        candidates=tuple(n for n, v in MODEL_VARIANTS.items() if v.kind == "t2vid"),
+    )
+    if not decision.admitted:
+        raise RenderRejected(
+            f"Refusing to render: {decision.reason}. Use --admission off to try anyway."
+        )
+    if decision.action != "accept":
+        print(f"Admission: {decision.reason}")
+        config["model"] = decision.estimate.model
+        if is_long_video(config):
+            config["segment_frames"] = decision.estimate.num_frames
+            config["overlap_frames"] = fit_overlap(decision.estimate.num_frames, config.get("overlap_frames", 17))
+        else:
+            config["num_frames"] = decision.estimate.num_frames
+    return decision.estimate
+
+
+def generate_video(
+    prompt: str,
+    output_dir: str = "outputs",
+    preset: str = None,
+    width: int = None,
+    height: int = None,
+    num_frames: int = None,
+    steps: int = None,
+    guidance: float = None,
+    seed: int = None,
+    enhance_prompt: bool = None,
+    film_template: bool = None,
+    negative_prompt: str = None,
+    no_enhance: bool = False,
+    deterministic_enhance: bool = False,
+    model: str = None,
+    admission: str = "reject",
+    segment_frames: int = None,
+    overlap_frames: int = None,
+    generator: LTXVideoGenerator = None,
+    output_name: str = None,
+    trace: StageTimer = None,
+    cost_model: CostModel = None,
+):
+    """Generate a video from a text prompt
+
+    Args:
+        prompt: Text description of the video
+        output_dir: Directory to save output
+        preset: Use a preset configuration (kids-1080p-5sec, kids-720p-5sec, fast-test)
+        width: Video width (overrides preset)
+        height: Video height (overrides preset)
+        num_frames: Number of frames (overrides preset)
+        steps: Inference steps (overrides preset)
+        guidance: Guidance scale (overrides preset)
+        seed: Random seed
+        enhance_prompt: Use Gemma to enhance prompt (overrides preset)
+        film_template: Wrap prompt in film-style template (overrides preset)
+        negative_prompt: Custom negative prompt
+        no_enhance: Disable prompt enhancement
+        deterministic_enhance: Decode Gemma greedily so cached enhancements are reproducible
+        model: Model variant to render with (overrides preset)
+        admission: What to do if the render is predicted to run out of VRAM:
+            "reject", "reroute", "downgrade" (comma-separated to combine) or "off"
+        segment_frames: Render clips longer than this as overlapping segments
+        overlap_frames: Frames shared by consecutive segments (8n+1)
+        generator: Already loaded generator to reuse (one is built and loaded if omitted)
+        output_name: File name inside output_dir (defaults to a timestamp)
+        trace: Records per-stage seconds of the render
+        cost_model: Cost model to check and record against (defaults to the shared one)
+    """
+    config = build_config(
+        preset=preset,
+        width=width,
+        height=height,
+        num_frames=num_frames,
+        steps=steps,
+        guidance=guidance,
+        enhance_prompt=enhance_prompt,
+        film_template=film_template,
+        no_enhance=no_enhance,
+        model=model,
+        segment_frames=segment_frames,
+        overlap_frames=overlap_frames,
+    )
+    if preset in PRESETS:
+        print(f"Using preset: {preset}")
+
+    # Refuse (or adjust) renders the cost model predicts won't fit, before loading anything
+    cost_model = cost_model or CostModel(MODEL_VARIANTS)
+    estimate = admit_config(config, cost_model, admission)
+    long_video = is_long_video(config)
 
     # Setup output directory
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
 
     # Generate filename from timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    video_file = output_path / f"video_{timestamp}.mp4"
+    if output_name is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_name = f"video_{timestamp}.mp4"
+    video_file = output_path / output_name
 
     # Initialize generator
-    generator = LTXVideoGenerator(
-        use_prompt_enhancement=config.get("enhance_prompt", True)
-    )
-    generator.load()
+    if generator is None:
+        generator = LTXVideoGenerator(
+            use_prompt_enhancement=config.get("enhance_prompt", True),
+            deterministic_enhancement=deterministic_enhance,
+            model=config["model"],
+        )
+        generator.load()
 
     print(f"\n{'='*50}")
     print(f"Generating video")
     print(f"{'='*50}")
     print(f"Prompt: {prompt}")
+    print(f"Model: {config['model']}")
     print(f"Resolution: {config['width']}x{config['height']}")
     print(f"Frames: {config['num_frames']} (~{config['num_frames']/24:.1f}s)")
+    if long_video:
+        print(f"Segments: {config['segment_frames']} frames, {config.get('overlap_frames', 17)} overlap")
     print(f"Steps: {config['num_inference_steps']}")
     print(f"Enhance prompt: {config.get('enhance_prompt', True)}")
     print(f"Film template: {config.get('use_film_template', False)}")
+    print(f"Predicted: ~{estimate.vram_gb:.1f} GB VRAM, ~{estimate.seconds:.0f}s ({estimate.source})")
     print(f"{'='*50}\n")
 
-    frames = generator.generate(
-        prompt=prompt,
-        negative_prompt=negative_prompt,
-        width=config["width"],
-        height=config["height"],
-        num_frames=config["num_frames"],
-        num_inference_steps=config["num_inference_steps"],
-        guidance_scale=config["guidance_scale"],
-        seed=seed,
-        enhance_prompt=config.get("enhance_prompt", True),
-        use_film_template=config.get("use_film_template", False),
-    )
+    reset_peak_memory()
+    started = time.perf_counter()
+    try:
+        render = generator.generate
+        if long_video:
+            render = partial(
+                generator.generate_long,
+                segment_frames=config["segment_frames"],
+                overlap_frames=config.get("overlap_frames", 17),
+            )
+        render(
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            width=config["width"],
+            height=config["height"],
+            num_frames=config["num_frames"],
+            num_inference_steps=config["num_inference_steps"],
+            guidance_scale=config["guidance_scale"],
+            seed=seed,
+            enhance_prompt=config.get("enhance_prompt", True),
+            use_film_template=config.get("use_film_template", False),
+            output_path=str(video_file),
+            model=config["model"],
+            trace=trace,
+        )
+    except Exception as e:
+        if is_out_of_memory(e):
+            cost_model.record(estimate, oom=True)
+        raise
 
-    generator.save_video(frames, str(video_file))
+    # A long clip's runtime spans many segments; only its peak VRAM matches the estimate
+    seconds = None if long_video else time.perf_counter() - started
+    vram_bytes = peak_memory().get("peak_vram_bytes")
+    cost_model.record(
+        estimate,
+        actual_vram_gb=vram_bytes / 1024**3 if vram_bytes else None,
+        actual_seconds=seconds,
+    )
 
     return str(video_file)
 
@@ -116,6 +271,8 @@ def main():
 Presets:
   kids-1080p-5sec  1920x1088, 121 frames, 40 steps, enhanced (default)
   kids-720p-5sec   1280x736, 121 frames, 30 steps, enhanced
+  kids-distilled-9sec  768x512, 217 frames, 8 steps, distilled fp8 model, enhanced
+  kids-distilled-20sec 768x512, 481 frames as 217-frame segments, distilled fp8 model
   fast-test        512x512, 25 frames, 20 steps, no enhancement
 
 Examples:
@@ -127,25 +284,88 @@ Examples:
 
   # Custom settings
   python -m src.pipelines.generate -p "A dancing robot" -W 1280 -H 736 -s 30
+
+  # Many prompts with one model load (JSONL or CSV; columns override the flags)
+  python -m src.pipelines.generate --batch prompts.jsonl --preset kids-distilled-9sec
+
+  # Keep the models loaded between runs; later invocations submit to it
+  python -m src.pipelines.daemon &
         """
     )
-    parser.add_argument("--prompt", "-p", required=True, help="Text prompt for video generation")
+    parser.add_argument("--prompt", "-p", help="Text prompt for video generation")
+    parser.add_argument("--batch", help="JSONL/CSV of prompts with per-row overrides")
+    parser.add_argument("--manifest",
+                        help="Batch progress file, for resuming (default: <output>/manifest.json)")
     parser.add_argument("--output", "-o", default="outputs", help="Output directory")
     parser.add_argument("--preset", choices=list(PRESETS.keys()), help="Use preset configuration")
+    parser.add_argument("--model", "-m",
+                        choices=[n for n, v in MODEL_VARIANTS.items() if v.kind in GENERATION_KINDS],
+                        help="Model variant (overrides preset)")
     parser.add_argument("--width", "-W", type=int, help="Video width (divisible by 32)")
     parser.add_argument("--height", "-H", type=int, help="Video height (divisible by 32)")
-    parser.add_argument("--frames", "-f", type=int, help="Number of frames (8n+1)")
+    parser.add_argument("--frames", "-f", type=int,
+                        help="Number of frames (8n+1, or any count with --segment-frames)")
+    parser.add_argument("--segment-frames", type=int,
+                        help="Render longer clips as overlapping segments of this many frames (8n+1)")
+    parser.add_argument("--overlap-frames", type=int,
+                        help="Frames shared by consecutive segments (8n+1, default 17)")
     parser.add_argument("--steps", "-s", type=int, help="Inference steps (20-50)")
     parser.add_argument("--guidance", "-g", type=float, help="Guidance scale")
     parser.add_argument("--seed", type=int, help="Random seed")
     parser.add_argument("--enhance-prompt", action="store_true", help="Enable prompt enhancement")
     parser.add_argument("--no-enhance", action="store_true", help="Disable prompt enhancement")
+    parser.add_argument("--deterministic-enhance", action="store_true",
+                        help="Greedy Gemma decoding (reproducible, cache-friendly)")
     parser.add_argument("--film-template", action="store_true", help="Wrap in film-style template")
     parser.add_argument("--negative-prompt", "-n", help="Custom negative prompt")
+    parser.add_argument("--admission", default="reject",
+                        help="If predicted to run out of VRAM: reject, reroute, downgrade "
+                             "(comma-separated to combine) or off")
+    parser.add_argument("--local", action="store_true",
+                        help="Load the models in this process even if a daemon is running")
+    parser.add_argument("--socket", help="Daemon socket (default $MAGIMA_DAEMON_SOCKET or ~/.cache/magima/generate.sock)")
 
     args = parser.parse_args()
+    if not args.prompt and not args.batch:
+        parser.error("one of --prompt or --batch is required")
+
+    if args.batch:
+        overrides = {
+            "preset": args.preset,
+            "model": args.model,
+            "width": args.width,
+            "height": args.height,
+            "num_frames": args.frames,
+            "steps": args.steps,
+            "guidance": args.guidance,
+            "seed": args.seed,
+            "enhance_prompt": True if args.enhance_prompt else None,
+            "film_template": True if args.film_template else None,
+            "no_enhance": args.no_enhance or None,
+            "negative_prompt": args.negative_prompt,
+            "segment_frames": args.segment_frames,
+            "overlap_frames": args.overlap_frames,
+        }
+        kwargs = dict(
+            batch_path=args.batch,
+            output_dir=args.output,
+            defaults={k: v for k, v in overrides.items() if v is not None},
+            manifest_path=args.manifest,
+            admission=args.admission,
+            deterministic_enhance=args.deterministic_enhance,
+        )
+        daemon_summary = None if args.local else submit_to_daemon("batch", kwargs, args.socket)
+        if daemon_summary is not None:
+            summary = daemon_summary
+        else:
+            from src.pipelines.batch import run_batch
+
+            summary = run_batch(**kwargs)
+        if summary["counts"].get("failed"):
+            raise SystemExit(1)
+        return
 
-    video_path = generate_video(
+    kwargs = dict(
         prompt=args.prompt,
         output_dir=args.output,
         preset=args.preset,
@@ -159,10 +379,47 @@ Examples:
         film_template=args.film_template,
         negative_prompt=args.negative_prompt,
         no_enhance=args.no_enhance,
+        deterministic_enhance=args.deterministic_enhance,
+        model=args.model,
+        admission=args.admission,
+        segment_frames=args.segment_frames,
+        overlap_frames=args.overlap_frames,
     )
+    video_path = None if args.local else submit_to_daemon("generate", kwargs, args.socket)
+    if video_path is None:
+        try:
+            video_path = generate_video(**kwargs)
+        except RenderRejected as e:
+            raise SystemExit(str(e))
 
     print(f"\nDone! Video saved to: {video_path}")
 
 
+def submit_to_daemon(kind: str, kwargs: dict, socket: str = None):
+    """Run a render on the resident daemon; None when no daemon is listening
+
+    Paths are made absolute first, since the daemon has its own working
+    directory. The daemon's log is echoed here as it renders.
+    """
+    from src.pipelines.daemon import DaemonError, connect, request, socket_path
+
+    conn = connect(socket)
+    if conn is None:
+        return None
+    for key in ("output_dir", "batch_path", "manifest_path"):
+        if kwargs.get(key):
+            kwargs = {**kwargs, key: str(Path(kwargs[key]).resolve())}
+    print(f"Submitting to the generation daemon on {socket_path(socket)}")
+    try:
+        with conn:
+            return request(conn, (kind, kwargs))
+    except DaemonError as e:
+        if e.type_name == RenderRejected.__name__:
+            raise SystemExit(str(e))
+        raise SystemExit(f"Render failed in the daemon: {e.type_name}: {e}")
+    except (EOFError, OSError):
+        raise SystemExit("Lost the connection to the generation daemon")
+
+
 if __name__ == "__main__":
     main()
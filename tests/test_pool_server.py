@@ -0,0 +1,74 @@
+"""API round trip through a pool worker process running the CPU fake pipeline"""
+import importlib
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+REQUEST = {"prompt": "a red kite", "width": 64, "height": 64, "num_frames": 9, "num_inference_steps": 2, "seed": 7}
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    root = tmp_path_factory.mktemp("server")
+    cwd = os.getcwd()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("MAGIMA_DEVICES", "cpu=fake")
+        mp.setenv("MAGIMA_DEFAULT_MODEL", "fake")
+        mp.setenv("MAGIMA_DEVICE_VRAM_GB", "24")
+        mp.setenv("MAGIMA_JOB_DB", "memory")
+        mp.setenv("MAGIMA_COST_DB", str(root / "cost.sqlite"))
+        mp.setenv("MAGIMA_BATCH_WINDOW", "0")
+        mp.delenv("MAGIMA_RENDITIONS", raising=False)
+        # The server keeps its outputs relative to the working directory
+        os.chdir(root)
+        try:
+            server = importlib.import_module("src.api.server")
+            with TestClient(server.app) as client:
+                yield client
+        finally:
+            os.chdir(cwd)
+
+
+def wait_for(client, job_id, timeout=300.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/job/{job_id}").json()
+        if job["status"] not in ("queued", "processing"):
+            return job
+        time.sleep(0.2)
+    raise AssertionError(f"job {job_id} still {job['status']} after {timeout}s")
+
+
+def test_render_then_cache_hit_then_range(client):
+    job = client.post("/generate", json=REQUEST).json()
+    job = wait_for(client, job["job_id"])
+    assert job["status"] == "completed", job["error"]
+    assert not job["cached"]
+    # Written once, by the worker process
+    assert job["timings"]["disk_write"] >= 0
+    assert os.path.isfile(job["video_path"])
+
+    hit = client.post("/generate", json=REQUEST).json()
+    assert hit["status"] == "completed"
+    assert hit["cached"]
+    assert hit["cache_key"] == job["cache_key"]
+    assert hit["job_id"] != job["job_id"]
+    assert hit["video_path"] != job["video_path"]
+
+    full = client.get(f"/video/{hit['job_id']}")
+    assert full.status_code == 200
+    size = len(full.content)
+    assert size > 100
+
+    partial = client.get(f"/video/{hit['job_id']}", headers={"Range": "bytes=10-109"})
+    assert partial.status_code == 206
+    assert partial.headers["content-range"] == f"bytes 10-109/{size}"
+    assert partial.content == full.content[10:110]
+
+
+def test_manifest_lists_outputs_only(client):
+    names = [entry["name"] for entry in client.get("/outputs/manifest").json()["files"]]
+    assert names
+    assert all("/" not in name for name in names)
@@ -0,0 +1,87 @@
+"""Fair-share ordering and priority aging of the job queue"""
+from types import SimpleNamespace
+
+from src.api.scheduling import FairScheduler
+from src.api.worker import JobQueue
+
+
+def job(priority="standard", client="a", deadline_at=None):
+    return SimpleNamespace(priority=priority, client_id=client, deadline_at=deadline_at)
+
+
+def make_scheduler(aging_seconds=0.0):
+    return FairScheduler(
+        priority_of=lambda request: request.priority,
+        deadline_of=lambda request: request.deadline_at,
+        client_of=lambda request: request.client_id,
+        half_life=600.0,
+        aging_seconds=aging_seconds,
+    )
+
+
+def drain(queue):
+    order = []
+    while len(queue):
+        order.append(queue.get(timeout=0)[0])
+    return order
+
+
+def test_priority_class_then_deadline():
+    queue = JobQueue(scheduler=make_scheduler())
+    queue.put("batch", job("batch"))
+    queue.put("standard", job("standard"))
+    queue.put("late", job("standard", deadline_at=2000.0))
+    queue.put("soon", job("standard", deadline_at=1000.0))
+    queue.put("interactive", job("interactive"))
+    assert drain(queue) == ["interactive", "soon", "late", "standard", "batch"]
+
+
+def test_least_recent_usage_goes_first():
+    scheduler = make_scheduler()
+    scheduler.charge("heavy", 300.0)
+    scheduler.charge("light", 10.0)
+    queue = JobQueue(scheduler=scheduler)
+    queue.put("heavy-1", job(client="heavy"))
+    queue.put("light-1", job(client="light"))
+    queue.put("new-1", job(client="new"))
+    queue.put("heavy-2", job(client="heavy"))
+    assert drain(queue) == ["new-1", "light-1", "heavy-1", "heavy-2"]
+
+
+def test_usage_decays_with_half_life():
+    scheduler = make_scheduler()
+    scheduler.charge("a", 100.0)
+    seconds, as_of = scheduler._usage["a"]
+    scheduler._usage["a"] = (seconds, as_of - scheduler.half_life)
+    assert abs(scheduler.usage("a") - 50.0) < 0.1
+
+
+def test_ties_stay_fifo():
+    queue = JobQueue(scheduler=make_scheduler())
+    for i in range(5):
+        queue.put(f"job-{i}", job())
+    assert drain(queue) == [f"job-{i}" for i in range(5)]
+
+
+def test_waiting_jobs_age_into_higher_classes():
+    scheduler = make_scheduler(aging_seconds=60.0)
+    assert scheduler.key(job("batch"), waited=0.0)[0][0] == 2
+    assert scheduler.key(job("batch"), waited=61.0)[0][0] == 1
+    assert scheduler.key(job("batch"), waited=1000.0)[0][0] == 0
+
+    queue = JobQueue(scheduler=scheduler)
+    queue.put("old-batch", job("batch"))
+    queue.put("standard", job("standard"))
+    # Waited two aging periods: now level with interactive work, and ahead of standard
+    queue._enqueued["old-batch"] -= 121.0
+    queue.put("interactive", job("interactive"))
+    assert drain(queue) == ["old-batch", "interactive", "standard"]
+
+
+def test_rank_of_matches_submission_position():
+    queue = JobQueue(scheduler=make_scheduler())
+    queue.put("standard", job("standard"))
+    queue.put("batch", job("batch"))
+    assert queue.rank_of(job("interactive")) == 1
+    assert queue.rank_of(job("standard")) == 2
+    assert queue.position("batch") == 2
@@ -0,0 +1,124 @@
+"""StagePipeline ordering, overlap and error propagation"""
+import threading
+import time
+
+from src.api.stages import StagePipeline
+
+
+def test_items_pass_every_stage_in_order():
+    done = []
+    pipeline = StagePipeline(
+        [
+            ("double", lambda item: item * 2),
+            ("inc", lambda item: item + 1),
+            ("collect", done.append),
+        ],
+        queue_size=1,
+    ).start()
+    for i in range(20):
+        pipeline.submit(i)
+    pipeline.stop(timeout=5)
+    assert done == [i * 2 + 1 for i in range(20)]
+    stats = pipeline.stats()
+    assert [stats[name]["items"] for name in ("double", "inc", "collect")] == [20, 20, 20]
+
+
+def test_stages_overlap():
+    active = set()
+    overlapped = threading.Event()
+    lock = threading.Lock()
+
+    def stage(name):
+        def run(item):
+            with lock:
+                active.add(name)
+                if len(active) > 1:
+                    overlapped.set()
+            time.sleep(0.02)
+            with lock:
+                active.discard(name)
+            return item
+        return run
+
+    pipeline = StagePipeline([("a", stage("a")), ("b", stage("b"))]).start()
+    for i in range(10):
+        pipeline.submit(i)
+    pipeline.stop(timeout=5)
+    assert overlapped.is_set()
+
+
+def test_failed_item_goes_to_on_error_and_the_rest_carry_on():
+    done, failed = [], []
+
+    def check(item):
+        if item == 3:
+            raise ValueError("bad item")
+        return item
+
+    pipeline = StagePipeline(
+        [("check", check), ("collect", done.append)],
+        on_error=lambda name, item, error: failed.append((name, item, str(error))),
+    ).start()
+    for i in range(6):
+        pipeline.submit(i)
+    pipeline.stop(timeout=5)
+    assert done == [0, 1, 2, 4, 5]
+    assert failed == [("check", 3, "bad item")]
+
+
+def test_raising_error_handler_does_not_stop_the_stage():
+    done = []
+
+    def on_error(name, item, error):
+        raise RuntimeError("handler broke")
+
+    pipeline = StagePipeline(
+        [("check", lambda item: 1 / item), ("collect", done.append)],
+        on_error=on_error,
+    ).start()
+    for i in (1, 0, 2):
+        pipeline.submit(i)
+    pipeline.stop(timeout=5)
+    assert done == [1.0, 0.5]
+
+
+def test_staged_fake_render_matches_whole_render(tmp_path):
+    from src.models.ltx import LTXVideoGenerator
+    from src.models.video import GeneratedVideo
+
+    generator = LTXVideoGenerator(
+        model="fake",
+        device="cpu",
+        use_prompt_enhancement=False,
+        use_embedding_cache=False,
+    )
+    generator.load()
+    assert generator.supports_stages()
+    shape = dict(width=64, height=64, num_frames=9, num_inference_steps=2)
+
+    finished = []
+
+    def encode(item):
+        name, frames = item
+        finished.append(name)
+        return generator.encode_frames(frames[0], str(tmp_path / f"{name}.mp4"))
+
+    pipeline = StagePipeline(
+        [
+            ("upscale", lambda item: (item[0], generator.upscale_latents(item[1]))),
+            ("decode", lambda item: (item[0], generator.decode_latents(item[1]))),
+            ("encode", encode),
+        ],
+        queue_size=1,
+    ).start()
+    for seed in range(3):
+        pipeline.submit((f"staged-{seed}", generator.denoise_batch(["a boat"], seeds=[seed], **shape)))
+    pipeline.stop(timeout=30)
+    assert finished == ["staged-0", "staged-1", "staged-2"]
+    assert generator.registry.stats()["pinned"] == []
+
+    whole = generator.generate_batch(
+        ["a boat"], seeds=[1], upscale=True, output_paths=[str(tmp_path / "whole.mp4")], **shape
+    )[0]
+    staged = GeneratedVideo(str(tmp_path / "staged-1.mp4"))
+    assert staged.frames[0].shape == whole.frames[0].shape == (128, 128, 3)